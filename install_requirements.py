@@ -5,7 +5,8 @@ def install_requirements():
     print("Installing required packages...")
     requirements = [
         'selenium==4.16.0',
-        'psutil==5.9.8'
+        'psutil==5.9.8',
+        'numpy>=1.24'
     ]
     
     for package in requirements:
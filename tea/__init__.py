@@ -0,0 +1 @@
+"""Support modules for the TikTok Engagement Analyzer (TEA)"""
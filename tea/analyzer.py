@@ -0,0 +1,430 @@
+"""Profile scraping and metrics, usable without the GUI.
+
+This is the core the Tk app and the batch CLI share; nothing here imports
+tkinter. ProfileAnalyzer.scrape_profile reports progress as (kind, payload)
+messages through an emit callback:
+
+    ('status', text)       what the scrape is doing
+    ('post', post_data)    a finished post, from the network or the cache
+    ('skipped', position)  a post that failed (1-based position on the grid)
+    ('total', count)       how many videos were found, once the crawl ends
+
+and raises if the profile can't be scraped at all.
+
+Selenium is only imported when a browser is first needed, so HTTP-only
+runs and the GUI's startup never load it.
+"""
+import functools
+import os
+import threading
+import time
+
+import numpy as np
+
+from tea.browser_pool import BrowserPool
+from tea.browser_sessions import BrowserSessionManager, LazySession
+from tea.crawler import crawl_video_links
+from tea.extract import extract_video_metrics
+from tea.history import HistoryStore
+from tea.http_engine import HttpFetcher
+from tea.metrics import engagement_rates, estimate_views, parse_counts
+from tea.pacing import BROWSER_PAGE_COST, PacingCancelled
+from tea.post_cache import PostCache
+from tea.telemetry import METRICS
+
+FETCH_MODE_NAMES = ('auto', 'http', 'browser')
+
+# Your specific profile path
+CHROME_USER_DATA_DIR = r"C:\Users\xlkay\AppData\Local\Google\Chrome\User Data"
+CHROME_PROFILE_DIRECTORY = "Default"  # This is your Person 1 profile
+
+# Lean pages drop these at the network layer: we only read counters, so video
+# streams, images and fonts are pure overhead
+LEAN_BLOCKED_URLS = [
+    '*.mp4', '*.m4s', '*.m3u8', '*.webm', '*mime_type=video*', '*/video/tos/*',
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.heic', '*.image*',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+]
+
+
+def setup_browser(headless=False, session_index=0, user_data_dir=CHROME_USER_DATA_DIR, lean=False,
+                  log_network=False):
+    """Launch Chrome; lean=True blocks media and returns from get() at DOMContentLoaded"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless=new')  # Updated headless argument
+    if lean:
+        # Callers wait for the elements they need rather than the load event
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+        chrome_options.add_argument('--mute-audio')
+    if log_network:
+        # Network events in the performance log, for measuring page weight
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    # Chrome locks a user data dir to one instance, so extra pool
+    # sessions each get their own persistent profile
+    if session_index > 0:
+        user_data_dir = os.path.join(os.path.expanduser("~"), ".tea", "chrome-profiles", f"session-{session_index}")
+
+    # Add profile arguments
+    chrome_options.add_argument(f'--user-data-dir={user_data_dir}')
+    chrome_options.add_argument(f'--profile-directory={CHROME_PROFILE_DIRECTORY}')
+
+    # Anti-detection measures
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
+    chrome_options.add_argument('--disable-site-isolation-trials')
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+
+    # Additional preferences to maintain login state
+    prefs = {
+        "profile.default_content_setting_values.notifications": 2,
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+        "profile.default_content_settings.popups": 0,
+    }
+    if lean:
+        prefs["profile.managed_default_content_settings.images"] = 2
+    chrome_options.add_experimental_option("prefs", prefs)
+
+    try:
+        with METRICS.timer('browser.launch'):
+            driver = webdriver.Chrome(options=chrome_options)
+        stealth_started = time.perf_counter()
+
+        # Execute CDP commands to prevent detection
+        driver.execute_cdp_cmd('Network.setUserAgentOverride', {
+            "userAgent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        })
+
+        if lean:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
+
+        # Additional stealth scripts
+        driver.execute_script("""
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            });
+
+            // Overwrite the `plugins` property to use a custom getter.
+            Object.defineProperty(navigator, 'plugins', {
+                get: () => [1, 2, 3, 4, 5]
+            });
+
+            // Overwrite the `languages` property to use a custom getter.
+            Object.defineProperty(navigator, 'languages', {
+                get: () => ['en-US', 'en']
+            });
+
+            // Pass the Permissions Test.
+            const originalQuery = window.navigator.permissions.query;
+            window.navigator.permissions.query = (parameters) => (
+                parameters.name === 'notifications' ?
+                    Promise.resolve({ state: Notification.permission }) :
+                    originalQuery(parameters)
+            );
+        """)
+        METRICS.observe('browser.stealth', time.perf_counter() - stealth_started)
+
+        return driver
+
+    except Exception as e:
+        METRICS.count('browser.launch_errors')
+        print(f"Error setting up browser: {str(e)}")
+        raise e
+
+
+def build_post_data(video_url, metrics):
+    """Turn raw metrics from either fetch engine into a post_data dict"""
+    # Convert metrics - missing or unreadable counts come back as NaN
+    count_fields = ('likes', 'comments', 'shares', 'saves', 'views')
+    counts = parse_counts([metrics[field] for field in count_fields])
+    likes, comments, shares, saves, views = counts
+    missing = [field for field in metrics['missing'] if field not in count_fields]
+    missing += [field for field, count in zip(count_fields, counts) if np.isnan(count)]
+    if missing:
+        print(f"Missing fields for {video_url}: {', '.join(missing)}")
+    views_count = estimate_views([likes], [views])[0]
+
+    # Calculate engagement
+    engagement = float(engagement_rates([likes], [comments], [shares], [views])[0])
+
+    # Create post data dictionary
+    return {
+        'url': video_url,
+        'caption': metrics['caption'] or '',
+        'views': int(views_count),
+        'likes': int(np.nan_to_num(likes)),
+        'comments': int(np.nan_to_num(comments)),
+        'saves': int(np.nan_to_num(saves)),
+        'shares': int(np.nan_to_num(shares)),
+        'er_rate': engagement,
+        'comments_data': [],  # Will be populated when viewing comments
+        'missing_fields': missing,
+        'fetched_at': time.time()
+    }
+
+
+class ProfileAnalyzer:
+    """Scrapes profiles into post_data dicts.
+
+    Owns the warm browser sessions, the pooled HTTP client, the post cache,
+    the engagement history and the pacer every request goes through, so one
+    analyzer can work through many profiles and should be closed when done.
+    """
+
+    def __init__(self, driver_factory=None, http_fetcher=None, post_cache=None, lean=True, pacer=None,
+                 history=None):
+        self._factories = {}
+        self.browser_sessions = BrowserSessionManager(driver_factory or self._lean_factory(lean))
+        self.http_fetcher = http_fetcher or HttpFetcher(pacer=pacer)
+        # Browser and HTTP requests share one budget per host
+        self.pacer = self.http_fetcher.pacer
+        METRICS.add_collector(self.pacer.gauges)
+        self.post_cache = post_cache or PostCache()
+        # Every fetched post is also kept as a snapshot, so repeated runs build up a trend
+        self.history = history or HistoryStore()
+
+    def _lean_factory(self, lean):
+        # One factory per setting, so flipping back and forth doesn't retire sessions needlessly
+        if lean not in self._factories:
+            self._factories[lean] = functools.partial(setup_browser, lean=lean)
+        return self._factories[lean]
+
+    def set_lean(self, lean):
+        """Switch lean page loading; browsers launched the other way are retired once idle"""
+        self.browser_sessions.driver_factory = self._lean_factory(lean)
+
+    def scrape_profile(self, username, posts_to_analyze, emit, cancel_event=None, headless=False,
+                       browser_sessions=1, fetch_mode='auto', checkpoint=None):
+        """Scrape a profile, emitting each post as it finishes.
+
+        With a tea.runs.RunCheckpoint every link, post and failure is recorded
+        as it happens, and posts the checkpoint already has are not fetched again.
+        """
+        cancel_event = cancel_event or threading.Event()
+        METRICS.count('scrape.profiles')
+        if checkpoint is None:
+            with METRICS.timer('scrape.profile'):
+                self._scrape_profile(username, posts_to_analyze, emit, cancel_event, headless,
+                                     browser_sessions, fetch_mode, None)
+            return
+        checkpoint.mark_running()
+        try:
+            with METRICS.timer('scrape.profile'):
+                self._scrape_profile(username, posts_to_analyze, emit, cancel_event, headless,
+                                     browser_sessions, fetch_mode, checkpoint)
+        except Exception as e:
+            checkpoint.finish('failed', str(e))
+            raise
+        if cancel_event.is_set():
+            checkpoint.finish('cancelled')
+        else:
+            # Failed posts are retried if the run is resumed
+            checkpoint.finish('partial' if checkpoint.failures else 'complete')
+
+    def _scrape_profile(self, username, posts_to_analyze, emit, cancel_event, headless, browser_sessions,
+                        fetch_mode, checkpoint):
+        # Browsers are only borrowed if the browser path is actually needed;
+        # the grid crawler gets its own so it can scroll while the pool works
+        sessions = [LazySession(self.browser_sessions, headless) for _ in range(browser_sessions)]
+        crawl_session = LazySession(self.browser_sessions, headless)
+        seen_links = []
+        positions = {}
+        snapshot_at = time.time()  # every post fetched in this run shares one snapshot time
+        from_cache = [0]
+
+        def all_links():
+            # A resumed run replays the links it already has and only crawls on
+            # if the earlier crawl never finished
+            known = list(checkpoint.links) if checkpoint else []
+            yield from known
+            if checkpoint and checkpoint.meta['crawl_complete']:
+                return
+            for video_url in self.iter_video_links(username, posts_to_analyze, fetch_mode, crawl_session,
+                                                   emit, cancel_event, seen=known):
+                if checkpoint:
+                    checkpoint.add_link(video_url)
+                yield video_url
+            if checkpoint and not cancel_event.is_set():
+                checkpoint.mark_crawled()
+
+        def links_to_fetch():
+            # Serve checkpointed and fresh cached posts, and only fetch new or stale ones
+            for video_url in all_links():
+                position = positions[video_url] = len(seen_links)
+                seen_links.append(video_url)
+                if checkpoint and position in checkpoint.posts:
+                    METRICS.count('posts.from_checkpoint')
+                    emit('post', dict(checkpoint.posts[position], comments_data=[]))
+                    continue
+                cached = self.post_cache.get_many([video_url]).get(video_url)
+                if cached and self.post_cache.is_fresh(cached):
+                    METRICS.count('cache.hits')
+                    from_cache[0] += 1
+                    if checkpoint:
+                        checkpoint.add_post(position, cached)
+                    emit('post', cached)
+                else:
+                    METRICS.count('cache.misses')
+                    yield video_url
+
+        try:
+            emit('status', f"Analyzing @{username} with {len(sessions)} workers...")
+
+            pool = BrowserPool(sessions)
+
+            # Videos are fetched while the crawl continues; results come back in post order
+            fetch = lambda session, video_url: self.fetch_post(session, video_url, fetch_mode, cancel_event)
+            for idx, video_url, post_data, error in pool.map_ordered(fetch, links_to_fetch(), cancel_event):
+                if cancel_event.is_set():
+                    return
+                if error is not None:
+                    METRICS.count('posts.failed')
+                    print(f"Error analyzing post {positions[video_url] + 1}: {str(error)}")
+                    if checkpoint:
+                        checkpoint.add_failure(positions[video_url], video_url, error)
+                    emit('skipped', positions[video_url] + 1)
+                else:
+                    METRICS.count('posts.fetched')
+                    self.post_cache.put(username, post_data, positions[video_url])
+                    self.history.record(username, [post_data], snapshot_at)
+                    if checkpoint:
+                        checkpoint.add_post(positions[video_url], post_data)
+                    emit('post', post_data)
+
+            self.post_cache.set_profile_order(username, seen_links)
+            emit('total', len(seen_links))
+            if from_cache[0]:
+                print(f"Served {from_cache[0]} of {len(seen_links)} posts from the cache")
+        finally:
+            crawl_session.release()
+            for session in sessions:
+                session.release()
+
+    def analyze_profile(self, username, posts_to_analyze, **options):
+        """Scrape a profile and return its posts; options as for scrape_profile"""
+        posts = []
+        def collect(kind, payload):
+            if kind == 'post':
+                posts.append(payload)
+        self.scrape_profile(username, posts_to_analyze, collect, **options)
+        return posts
+
+    def iter_video_links(self, username, posts_to_analyze, fetch_mode, crawl_session, emit, cancel_event,
+                         seen=()):
+        """Yield up to posts_to_analyze distinct video links for a profile.
+
+        The HTTP page data only lists the first screen of videos, so in auto
+        mode the browser crawler takes over when more are wanted. Links in
+        `seen` count towards the limit but aren't yielded again.
+        """
+        seen = set(seen)
+        if fetch_mode != 'browser':
+            emit('status', f"Fetching @{username} over HTTP...")
+            try:
+                with METRICS.timer('profile.links_http'):
+                    links = self.http_fetcher.fetch_profile_links(username, posts_to_analyze, cancel_event)
+                for video_url in links:
+                    if video_url in seen:
+                        continue
+                    seen.add(video_url)
+                    yield video_url
+            except PacingCancelled:
+                return
+            except Exception as e:
+                if fetch_mode == 'http':
+                    raise
+                METRICS.count('profile.http_fallbacks')
+                print(f"HTTP profile fetch failed, falling back to browser: {str(e)}")
+            if fetch_mode == 'http':
+                if not seen:
+                    raise Exception(f"No videos found in the page data for @{username}")
+                return
+            if len(seen) >= posts_to_analyze:
+                return
+
+        emit('status', "Preparing browser sessions...")
+        try:
+            driver = crawl_session.driver
+            if not self.open_profile_grid(driver, username, emit, cancel_event):
+                return
+            emit('status', f"Crawling @{username}'s videos...")
+            for video_url in crawl_video_links(driver, posts_to_analyze, cancel_event, seen):
+                METRICS.count('profile.links_crawled')
+                yield video_url
+        finally:
+            # Hand the crawler's browser back as soon as the crawl is over
+            crawl_session.release()
+
+    def open_profile_grid(self, driver, username, emit, cancel_event):
+        """Load a profile and wait for its video grid; False if cancelled"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        profile_url = f"https://www.tiktok.com/@{username}"
+
+        # A failed load makes the pacer back off, which spaces out the retries
+        max_retries = 3
+        for attempt in range(max_retries):
+            if attempt:
+                METRICS.count('profile.grid_retries')
+            try:
+                with self.pacer.request(profile_url, cancel_event, BROWSER_PAGE_COST):
+                    emit('status', f"Loading @{username}...")
+                    with METRICS.timer('profile.navigate'):
+                        driver.get(profile_url)
+                    with METRICS.timer('profile.wait_for_grid'):
+                        WebDriverWait(driver, 10).until(
+                            EC.presence_of_all_elements_located((By.CSS_SELECTOR, '[data-e2e="user-post-item"]'))
+                        )
+                return True
+            except PacingCancelled:
+                return False
+            except Exception:
+                if attempt == max_retries - 1:
+                    raise
+
+    def fetch_post(self, session, video_url, fetch_mode='auto', cancel_event=None):
+        """Build one post's post_data, trying the HTTP fast path first unless in browser mode"""
+        with METRICS.timer('post.fetch'):
+            if fetch_mode != 'browser':
+                try:
+                    metrics = self.http_fetcher.fetch_video_metrics(video_url, cancel_event)
+                    return build_post_data(video_url, metrics)
+                except PacingCancelled:
+                    raise
+                except Exception as e:
+                    if fetch_mode == 'http':
+                        raise
+                    METRICS.count('post.http_fallbacks')
+                    print(f"HTTP fetch failed for {video_url}, falling back to browser: {str(e)}")
+            return self.fetch_post_metrics(session.driver, video_url, cancel_event)
+
+    def fetch_post_metrics(self, driver, video_url, cancel_event=None):
+        """Load one video page on the given driver and build its post_data"""
+        with self.pacer.request(video_url, cancel_event, BROWSER_PAGE_COST):
+            # Navigate directly to video URL
+            with METRICS.timer('post.navigate'):
+                driver.get(video_url)
+
+            # One wait for the metrics container, one script call for every counter
+            with METRICS.timer('post.extract'):
+                metrics = extract_video_metrics(driver)
+        return build_post_data(video_url, metrics)
+
+    def close(self):
+        METRICS.remove_collector(self.pacer.gauges)
+        self.browser_sessions.shutdown()
+        self.http_fetcher.close()
+        self.post_cache.close()
+        self.history.close()
@@ -0,0 +1,87 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Markers the feeder thread puts on the futures queue
+_FEED_DONE = object()
+_FEED_ERROR = object()
+
+
+class BrowserPool:
+    """Processes URLs concurrently over a bounded set of browser sessions.
+
+    Each session (a driver or a tea.browser_sessions.LazySession) is owned
+    by one worker at a time. The pool only bounds concurrency: how fast
+    requests go out is up to the tea.pacing.Pacer that func fetches
+    through. The pool does not own the sessions; they come from and go
+    back to a BrowserSessionManager.
+    """
+
+    def __init__(self, sessions):
+        self.sessions = list(sessions)
+        self._slots = queue.Queue()
+        for session in self.sessions:
+            self._slots.put(session)
+
+    def _run(self, func, item, cancel_event):
+        session = self._slots.get()
+        try:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            return func(session, item)
+        finally:
+            self._slots.put(session)
+
+    def map_ordered(self, func, items, cancel_event=None):
+        """Run func(session, item) across the pool.
+
+        items may be a generator that is still producing (e.g. a crawler);
+        it is consumed on a feeder thread so work starts on the first item
+        straight away. Yields (index, item, result, error) tuples in the
+        original order of items, as soon as each one and everything before
+        it has finished. An exception raised by items is re-raised here.
+        """
+        submitted = queue.Queue()
+        stop = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=len(self.sessions) or 1) as executor:
+            def feed():
+                try:
+                    for item in items:
+                        if stop.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                            break
+                        submitted.put((item, executor.submit(self._run, func, item, cancel_event)))
+                except Exception as e:
+                    submitted.put((_FEED_ERROR, e))
+                    return
+                finally:
+                    # Let a generator run its cleanup on the thread that drove it
+                    if hasattr(items, 'close'):
+                        items.close()
+                submitted.put((_FEED_DONE, None))
+
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+            try:
+                index = 0
+                while True:
+                    item, future = submitted.get()
+                    if item is _FEED_DONE:
+                        break
+                    if item is _FEED_ERROR:
+                        raise future
+                    if cancel_event is not None and cancel_event.is_set():
+                        future.cancel()
+                        break
+                    try:
+                        yield index, item, future.result(), None
+                    except Exception as e:
+                        yield index, item, None, e
+                    index += 1
+            finally:
+                stop.set()
+                feeder.join()
+                while not submitted.empty():
+                    item, future = submitted.get_nowait()
+                    if item is not _FEED_DONE and item is not _FEED_ERROR:
+                        future.cancel()
@@ -0,0 +1,183 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tea.telemetry import METRICS
+
+
+class BrowserSession:
+    """A WebDriver plus the processes it spawned"""
+
+    def __init__(self, driver, headless, index, factory=None):
+        self.driver = driver
+        self.headless = headless
+        self.index = index
+        self.factory = factory  # what launched it; sessions from a replaced factory are retired
+        self.processes = {}
+        self.track_processes()
+
+    def track_processes(self):
+        """Record chromedriver and every Chrome process started under it"""
+        # psutil is only needed once a browser exists, so it isn't imported at startup
+        import psutil
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            for proc in [root] + root.children(recursive=True):
+                try:
+                    self.processes[proc.pid] = proc.create_time()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        except Exception:
+            pass
+
+    def is_healthy(self):
+        """True if the browser still answers a trivial script"""
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def close(self):
+        """Quit the driver and kill any of our processes it left behind"""
+        import psutil
+        self.track_processes()
+        with METRICS.timer('browser.quit'):
+            try:
+                self.driver.quit()
+            except:
+                pass
+        with METRICS.timer('browser.kill_processes'):
+            for pid, create_time in self.processes.items():
+                try:
+                    proc = psutil.Process(pid)
+                    # Skip PIDs that have been reused by an unrelated process
+                    if proc.create_time() == create_time:
+                        proc.kill()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        self.processes = {}
+
+
+class BrowserSessionManager:
+    """Owns the app's browser sessions and keeps them warm between runs.
+
+    driver_factory(headless, index) launches a new driver. Sessions are
+    launched on demand, handed out with acquire(), returned with
+    release() and only shut down by shutdown() or when they stop
+    responding. Assigning a new driver_factory retires the old sessions
+    as they go idle. Only processes the manager spawned are ever killed.
+    """
+
+    def __init__(self, driver_factory):
+        self.driver_factory = driver_factory
+        self.sessions = []
+        self.in_use = set()
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def acquire(self, count, headless=False):
+        """Return up to count ready drivers, reusing healthy warm sessions"""
+        count = max(1, int(count))
+        with self._lock:
+            idle = [s for s in self.sessions if s.index not in self.in_use]
+            stale = [s for s in idle if s.headless != headless or s.factory is not self.driver_factory]
+            candidates = [s for s in idle if s not in stale][:count]
+            for session in stale:
+                self.sessions.remove(session)
+
+        for session in stale:
+            session.close()
+
+        ready = []
+        for session in candidates:
+            if session.is_healthy():
+                ready.append(session)
+            else:
+                METRICS.count('browser.sessions_unhealthy')
+                with self._lock:
+                    self.sessions.remove(session)
+                session.close()
+        METRICS.count('browser.sessions_reused', len(ready))
+
+        with self._lock:
+            self.in_use.update(s.index for s in ready)
+            used_indexes = {s.index for s in self.sessions} | self.in_use
+            free_indexes = [i for i in range(len(used_indexes) + count) if i not in used_indexes]
+            to_launch = free_indexes[:count - len(ready)]
+            # Reserve the indexes while the browsers start
+            self.in_use.update(to_launch)
+
+        launched, errors = self._launch(to_launch, headless)
+        METRICS.count('browser.sessions_launched', len(launched))
+        with self._lock:
+            self.sessions.extend(launched)
+            self.in_use.difference_update(set(to_launch) - {s.index for s in launched})
+
+        ready.extend(launched)
+        if not ready and errors:
+            raise errors[0]
+        for e in errors:
+            print(f"Error starting browser session: {str(e)}")
+        ready.sort(key=lambda s: s.index)
+        return [s.driver for s in ready]
+
+    def _launch(self, indexes, headless):
+        launched, errors = [], []
+        if not indexes:
+            return launched, errors
+        factory = self.driver_factory
+        # Browsers start in parallel, so this is the wall time of the whole batch
+        with METRICS.timer('browser.start_sessions'), ThreadPoolExecutor(max_workers=len(indexes)) as executor:
+            futures = {index: executor.submit(factory, headless, index) for index in indexes}
+            for index, future in futures.items():
+                try:
+                    launched.append(BrowserSession(future.result(), headless, index, factory))
+                except Exception as e:
+                    errors.append(e)
+        return launched, errors
+
+    def release(self, drivers):
+        """Hand drivers back so the next run can reuse them"""
+        with self._lock:
+            for session in self.sessions:
+                if session.driver in drivers:
+                    session.track_processes()
+                    self.in_use.discard(session.index)
+        # Park the pages so idle sessions don't keep streaming video
+        for driver in drivers:
+            try:
+                driver.get("about:blank")
+            except Exception:
+                pass
+
+    def shutdown(self):
+        """Close every session the manager started"""
+        with self._lock:
+            sessions, self.sessions = self.sessions, []
+            self.in_use.clear()
+        for session in sessions:
+            session.close()
+
+
+class LazySession:
+    """A worker slot that only borrows a browser from the manager when first used"""
+
+    def __init__(self, manager, headless=False):
+        self.manager = manager
+        self.headless = headless
+        self._driver = None
+
+    @property
+    def started(self):
+        return self._driver is not None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.manager.acquire(1, self.headless)[0]
+        return self._driver
+
+    def release(self):
+        if self._driver is not None:
+            self.manager.release([self._driver])
+            self._driver = None
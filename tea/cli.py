@@ -0,0 +1,121 @@
+"""Batch analysis from the command line, without the GUI.
+
+    python -m tea.cli usernames.txt -o results.jsonl
+    python -m tea.cli usernames.txt -o results.csv --posts 50 --fetch-mode http
+    python -m tea.cli usernames.txt -o results.tcol
+
+The usernames file has one username per line (a leading @ is fine; blank
+lines and lines starting with # are skipped). Every analysed post is written
+as one row, tagged with its username, as soon as it arrives (see tea.export
+for the formats). Each profile is a checkpointed run (see tea.runs);
+--resume continues unfinished ones.
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+from tea.analyzer import FETCH_MODE_NAMES, ProfileAnalyzer
+from tea.export import FORMATS, open_writer
+from tea.pacing import Pacer
+from tea.telemetry import METRICS, profiled
+from tea.runs import RunCheckpoint, latest_unfinished_run
+
+
+def read_usernames(path):
+    usernames = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                usernames.append(line.lstrip('@'))
+    return list(dict.fromkeys(usernames))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tea.cli', description="Analyse many TikTok profiles in one batch")
+    parser.add_argument('usernames', help="file with one username per line")
+    parser.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    parser.add_argument('-f', '--format', choices=FORMATS,
+                        help="output format (default: from the output file's extension, else jsonl)")
+    parser.add_argument('-n', '--posts', type=int, default=20, help="posts to analyse per profile (default: 20)")
+    parser.add_argument('--fetch-mode', choices=FETCH_MODE_NAMES, default='auto',
+                        help="auto: HTTP with browser fallback; http: never start Chrome; browser: always render")
+    parser.add_argument('--sessions', type=int, default=1, help="browser sessions to fetch with (default: 1)")
+    parser.add_argument('--show-browser', action='store_true', help="run Chrome with a window instead of headless")
+    parser.add_argument('--full-pages', action='store_true',
+                        help="let Chrome load video, images and fonts (lean pages are the default)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue each profile's last run if it didn't finish, instead of starting over")
+    parser.add_argument('--rate', type=float, default=3.0,
+                        help="starting requests per second per host; adapts to how the site responds (default: 3)")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write timings and counters at the end: Prometheus text for .prom, else JSON")
+    parser.add_argument('--profile', action='store_true',
+                        help="cProfile each profile's run into profile.prof in its run directory")
+    parser.add_argument('--cache-hours', type=float, default=6,
+                        help="reuse cached posts fetched within this many hours (default: 6, 0 disables)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    usernames = read_usernames(args.usernames)
+    writer, out = open_writer(args.output, 'posts', args.format)
+    analyzer = ProfileAnalyzer(lean=not args.full_pages, pacer=Pacer(rate=args.rate))
+    analyzer.post_cache.ttl_seconds = args.cache_hours * 3600
+    failed = []
+    # Progress and per-post warnings go to stderr so stdout stays pure output
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            analyze_all(analyzer, usernames, args, writer, failed)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+    finally:
+        if args.metrics:
+            METRICS.write(args.metrics)
+        analyzer.close()
+        writer.close()
+        if args.output != '-':
+            out.close()
+        pacing = analyzer.pacer.describe()
+        if pacing:
+            print(f"Pacing: {pacing}", file=sys.stderr)
+
+    if failed:
+        print(f"{len(failed)} of {len(usernames)} profiles failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def analyze_all(analyzer, usernames, args, writer, failed):
+    """Analyse each profile in turn; a failed profile is reported and skipped"""
+    for number, username in enumerate(usernames, 1):
+        print(f"[{number}/{len(usernames)}] @{username}", file=sys.stderr)
+        def emit(kind, payload, username=username):
+            if kind == 'post':
+                writer.write(username, payload)
+            elif kind == 'status':
+                print(f"  {payload}", file=sys.stderr)
+        run = latest_unfinished_run(username) if args.resume else None
+        if run:
+            print(f"  Resuming run {run.run_id} ({len(run.posts)} of {len(run.links)} posts done)", file=sys.stderr)
+        else:
+            run = RunCheckpoint.create(username, args.posts, args.fetch_mode)
+        profiler = (profiled(os.path.join(run.directory, 'profile.prof'), top=0) if args.profile
+                    else contextlib.nullcontext())
+        try:
+            with profiler:
+                analyzer.scrape_profile(username, run.meta['posts_to_analyze'], emit,
+                                        headless=not args.show_browser, browser_sessions=max(1, args.sessions),
+                                        fetch_mode=run.meta.get('fetch_mode', args.fetch_mode), checkpoint=run)
+        except Exception as e:
+            print(f"Error analyzing @{username}: {str(e)}", file=sys.stderr)
+            failed.append(username)
+        if run.failures or run.meta['error']:
+            print(run.report(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Offline comment analytics: lexicon sentiment, keywords, emoji, questions and spam.
+
+Scoring runs over a spool's comments in batches on a process pool; workers
+read their slice of the spool straight from disk so only small summaries
+cross process boundaries. Each spool keeps a <video_id>.analytics.json
+next to it recording how far it has been scored, so later runs only score
+newly fetched comments. The summary only lists the top keywords/emoji; the
+full counts live in <video_id>.counts.json so increments stay exact, and a
+spool whose counts are missing or stale is rescored from the start.
+"""
+import json
+import os
+import re
+from collections import Counter
+
+from tea.comments import CommentSpool
+
+# Compact sentiment lexicon (word -> score in [-3, 3]); enough to rank
+# posts against each other, not a linguistic model
+LEXICON = {
+    'love': 3, 'loved': 3, 'loving': 2, 'amazing': 3, 'awesome': 3, 'best': 3, 'beautiful': 3,
+    'great': 2, 'good': 2, 'nice': 2, 'cool': 2, 'cute': 2, 'funny': 2, 'fun': 2, 'perfect': 3,
+    'wow': 2, 'omg': 1, 'lol': 1, 'lmao': 2, 'haha': 1, 'hahaha': 2, 'yes': 1, 'slay': 2,
+    'fire': 2, 'iconic': 2, 'legend': 2, 'queen': 2, 'king': 2, 'talented': 3, 'helpful': 2,
+    'thanks': 2, 'thank': 2, 'obsessed': 2, 'fav': 2, 'favorite': 2, 'favourite': 2, 'wholesome': 3,
+    'incredible': 3, 'genius': 3, 'underrated': 1, 'happy': 2, 'glad': 2, 'adorable': 3,
+    'bad': -2, 'worst': -3, 'hate': -3, 'hated': -3, 'awful': -3, 'terrible': -3, 'boring': -2,
+    'ugly': -3, 'stupid': -3, 'dumb': -2, 'cringe': -2, 'fake': -2, 'scam': -3, 'trash': -3,
+    'annoying': -2, 'sad': -2, 'disappointed': -2, 'disappointing': -2, 'wrong': -1, 'gross': -2,
+    'no': -1, 'not': -1, 'never': -1, 'overrated': -2, 'flop': -2, 'mid': -1, 'yikes': -2,
+    'unfollow': -2, 'unfollowing': -2, 'clickbait': -3, 'ratio': -1, 'weird': -1, 'mess': -2,
+}
+EMOJI_SCORES = {
+    '😂': 1, '🤣': 1, '❤': 3, '😍': 3, '🥰': 3, '😊': 2, '🔥': 2, '👏': 2, '💯': 2, '🙌': 2,
+    '😭': 0, '💀': 1, '👍': 2, '✨': 1, '🤩': 3, '😁': 2, '💕': 3, '💖': 3, '🥺': 1,
+    '😡': -3, '🤮': -3, '👎': -2, '😒': -2, '🙄': -2, '😤': -2, '💩': -2, '😢': -1, '😞': -2,
+}
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in is it its just me my of on
+or our she so that the their them they this to too u ur was we were what when who will with
+you your im its dont cant like get got can do does did all am been being how out up about
+""".split())
+QUESTION_WORDS = frozenset("who what when where why how which is are can does do did".split())
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+EMOJI_RE = re.compile('[\U0001F300-\U0001FAFF☀-➿]')
+# One pass catches links, follow/promo bait and long character runs
+SPAM_RE = re.compile(r"https?://|www\.|\.com\b|\.ly/"
+                     r"|(?:check|visit) (?:out )?my (?:profile|page|bio)|follow (?:me|back)|f4f|l4l|promo"
+                     r"|dm me|link in (?:my )?bio"
+                     r"|(?P<run>\S)(?P=run){5,}", re.I)
+
+TOP_N = 200
+
+
+def empty_summary():
+    return {'comments': 0, 'sentiment_total': 0.0, 'positive': 0, 'negative': 0, 'neutral': 0,
+            'questions': 0, 'spam': 0, 'keywords': Counter(), 'emoji': Counter()}
+
+
+def analyze_texts(texts):
+    """Summarise a batch of comment texts"""
+    summary = empty_summary()
+    keyword_words, emoji_found = [], []
+    positive = negative = questions = spam = 0
+    total = 0.0
+    lexicon_get, emoji_get = LEXICON.get, EMOJI_SCORES.get
+    find_words, find_emoji, spam_search = WORD_RE.findall, EMOJI_RE.findall, SPAM_RE.search
+    count = 0
+    for text in texts:
+        count += 1
+        words = find_words(text.lower())
+        emoji = find_emoji(text)
+        score = 0
+        for word in words:
+            score += lexicon_get(word, 0)
+        for symbol in emoji:
+            score += emoji_get(symbol, 0)
+        score = max(-1.0, min(1.0, score / 4.0))
+        total += score
+        if score > 0:
+            positive += 1
+        elif score < 0:
+            negative += 1
+        if text.rstrip().endswith('?') or (len(words) > 2 and words[0] in QUESTION_WORDS):
+            questions += 1
+        if spam_search(text):
+            spam += 1
+            continue  # keep spam out of the keyword counts
+        keyword_words.extend(words)
+        emoji_found.extend(emoji)
+    summary['comments'] = count
+    summary['sentiment_total'] = total
+    summary['positive'] = positive
+    summary['negative'] = negative
+    summary['neutral'] = count - positive - negative
+    summary['questions'] = questions
+    summary['spam'] = spam
+    keywords = Counter(keyword_words)
+    for word in list(keywords):
+        if len(word) < 3 or word in STOPWORDS:
+            del keywords[word]
+    summary['keywords'] = keywords
+    summary['emoji'] = Counter(emoji_found)
+    return summary
+
+
+def merge_summaries(total, part):
+    for key in ('comments', 'sentiment_total', 'positive', 'negative', 'neutral', 'questions', 'spam'):
+        total[key] += part[key]
+    total['keywords'].update(part['keywords'])
+    total['emoji'].update(part['emoji'])
+    return total
+
+
+def finish_summary(summary):
+    """A JSON-friendly summary with averages and the top keywords/emoji"""
+    comments = summary['comments']
+    return {
+        'comments': comments,
+        'sentiment_total': summary['sentiment_total'],
+        'sentiment': summary['sentiment_total'] / comments if comments else 0.0,
+        'positive': summary['positive'],
+        'negative': summary['negative'],
+        'neutral': summary['neutral'],
+        'questions': summary['questions'],
+        'spam': summary['spam'],
+        'keywords': summary['keywords'].most_common(TOP_N),
+        'emoji': summary['emoji'].most_common(TOP_N),
+    }
+
+
+def _summary_from_saved(saved, counts):
+    summary = empty_summary()
+    for key in ('comments', 'sentiment_total', 'positive', 'negative', 'neutral', 'questions', 'spam'):
+        summary[key] = saved.get(key, 0)
+    summary['keywords'] = Counter(counts['keywords'])
+    summary['emoji'] = Counter(counts['emoji'])
+    return summary
+
+
+def _analyze_range(directory, video_id, start, count):
+    # Runs in a worker process: read the slice from disk, return a summary
+    spool = CommentSpool(directory, video_id, recover=False)
+    return analyze_texts(comment['text'] for comment in spool.read(start, count))
+
+
+def analytics_path(spool):
+    return spool.meta_path[:-len('.json')] + '.analytics.json'
+
+
+def counts_path(spool):
+    return spool.meta_path[:-len('.json')] + '.counts.json'
+
+
+def _load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _dump_json(path, data):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def load_analytics(spool):
+    """The saved summary for a spool, or None if it has never been scored"""
+    return _load_json(analytics_path(spool))
+
+
+class CommentAnalyzer:
+    """Scores spooled comments incrementally across a process pool"""
+
+    def __init__(self, processes=None, batch_size=20000):
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # multiprocessing is slow to import and the pool is only needed once comments are scored
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    def analyze(self, spools, cancel_event=None):
+        """Bring every spool's analytics up to date; yields (spool, summary) as each finishes"""
+        jobs = []
+        for spool in spools:
+            saved = load_analytics(spool) or {}
+            start = saved.get('analyzed', 0)
+            total = len(spool)
+            if not total and not saved:
+                continue  # nothing fetched yet
+            counts = None
+            if start > total:
+                # Scored further than the spool goes: it was trimmed or fetched again
+                saved, start = {}, 0
+            if start < total:
+                counts = _load_json(counts_path(spool))
+                if not counts or counts.get('analyzed') != start:
+                    # The summary's keyword/emoji lists are truncated, so without
+                    # matching full counts only a rescore gives exact totals
+                    saved, start = {}, 0
+            directory = os.path.dirname(spool.data_path)
+            futures = [self.executor.submit(_analyze_range, directory, spool.video_id, offset,
+                                            min(self.batch_size, total - offset))
+                       for offset in range(start, total, self.batch_size)]
+            jobs.append((spool, saved, counts, total, futures))
+
+        for spool, saved, counts, total, futures in jobs:
+            if cancel_event is not None and cancel_event.is_set():
+                for _, _, _, _, pending in jobs:
+                    for future in pending:
+                        future.cancel()
+                return
+            if not futures and saved:
+                yield spool, saved
+                continue
+            summary = _summary_from_saved(saved, counts) if saved else empty_summary()
+            for future in futures:
+                merge_summaries(summary, future.result())
+            result = finish_summary(summary)
+            result['analyzed'] = total
+            self._save(spool, result, summary)
+            yield spool, result
+
+    def _save(self, spool, result, summary):
+        # Counts first: a summary ahead of its counts would be read as stale and rescored
+        _dump_json(counts_path(spool), {'analyzed': result['analyzed'], 'keywords': summary['keywords'],
+                                        'emoji': summary['emoji']})
+        _dump_json(analytics_path(spool), result)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
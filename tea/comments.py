@@ -0,0 +1,339 @@
+"""Paged comment collection spooled to disk.
+
+Each video's comments go to an append-only spool under ~/.tea/comments:
+
+    <video_id>.dat   packed records: RECORD header + UTF-8 author + UTF-8 text
+    <video_id>.idx   little-endian uint64 offset of each record in .dat
+    <video_id>.json  pagination state (cursor, has_more, pages fetched)
+
+so memory stays bounded however many comments a video has, any comment can
+be read by position without scanning, and pages already fetched are never
+fetched again.
+"""
+import json
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+
+import numpy as np
+
+from tea.metrics import parse_count
+from tea.pacing import BROWSER_PAGE_COST, Pacer
+
+DEFAULT_COMMENTS_DIR = os.path.join(os.path.expanduser("~"), ".tea", "comments")
+
+# comment id, create time, likes, author length, text length
+RECORD = struct.Struct('<qIIBH')
+OFFSET = np.dtype('<u8')
+
+VIDEO_ID_RE = re.compile(r'/video/(\d+)')
+TOKEN_RE = re.compile(r'\w+')
+
+
+def video_id_from_url(video_url):
+    match = VIDEO_ID_RE.search(video_url)
+    if not match:
+        raise ValueError(f"Not a video URL: {video_url}")
+    return match.group(1)
+
+
+class CommentSpool:
+    """Append-only on-disk list of one video's comments"""
+
+    def __init__(self, directory, video_id, recover=True):
+        self.video_id = video_id
+        base = os.path.join(directory, video_id)
+        self.data_path = base + '.dat'
+        self.index_path = base + '.idx'
+        self.meta_path = base + '.json'
+        self._lock = threading.Lock()
+        self.meta = {'cursor': 0, 'has_more': True, 'pages': 0, 'updated_at': 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.meta.update(json.load(f))
+        # Readers in other processes must not trim a write that is still in flight
+        if recover:
+            self._trim_partial_write()
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.index_path) // OFFSET.itemsize
+        except OSError:
+            return 0
+
+    @property
+    def complete(self):
+        return not self.meta['has_more']
+
+    def append_page(self, comments, cursor, has_more):
+        """Spool one fetched page and remember where pagination got to"""
+        with self._lock:
+            with open(self.data_path, 'ab') as data:
+                start = data.tell()
+                chunks, offsets = [], []
+                for comment in comments:
+                    author = (comment.get('author') or '').encode('utf-8')[:255]
+                    text = (comment.get('text') or '').encode('utf-8')[:65535]
+                    offsets.append(start)
+                    chunk = RECORD.pack(int(comment.get('id') or 0), int(comment.get('create_time') or 0),
+                                        min(int(comment.get('likes') or 0), 0xFFFFFFFF),
+                                        len(author), len(text)) + author + text
+                    chunks.append(chunk)
+                    start += len(chunk)
+                data.write(b''.join(chunks))
+                data.flush()
+            # Offsets land after the data, so readers never see a half-written record
+            with open(self.index_path, 'ab') as index:
+                index.write(np.asarray(offsets, dtype=OFFSET).tobytes())
+            self.meta.update(cursor=cursor, has_more=has_more, pages=self.meta['pages'] + 1,
+                             updated_at=time.time())
+            self._save_meta()
+
+    def read(self, start, count):
+        """Comments start .. start + count - 1 as dicts"""
+        total = len(self)
+        start = max(0, start)
+        stop = min(total, start + count)
+        if start >= stop:
+            return []
+        offsets = np.fromfile(self.index_path, dtype=OFFSET, count=stop - start,
+                              offset=start * OFFSET.itemsize)
+        with open(self.data_path, 'rb') as data:
+            data.seek(int(offsets[0]))
+            if stop < total:
+                end = int(np.fromfile(self.index_path, dtype=OFFSET, count=1, offset=stop * OFFSET.itemsize)[0])
+                blob = data.read(end - int(offsets[0]))
+            else:
+                blob = data.read()
+        return list(self._decode(blob, stop - start))
+
+    def read_at(self, positions):
+        """Comments at arbitrary positions (e.g. search hits), in the order given"""
+        positions = [int(p) for p in positions]
+        if not positions:
+            return []
+        offsets = np.memmap(self.index_path, dtype=OFFSET, mode='r', shape=(len(self),))
+        comments = []
+        with open(self.data_path, 'rb') as data:
+            for position in positions:
+                data.seek(int(offsets[position]))
+                header = data.read(RECORD.size)
+                _, _, _, author_len, text_len = RECORD.unpack(header)
+                blob = header + data.read(author_len + text_len)
+                comments.extend(self._decode(blob, 1))
+        del offsets
+        return comments
+
+    def __iter__(self, chunk_size=1000):
+        for start in range(0, len(self), chunk_size):
+            yield from self.read(start, chunk_size)
+
+    def _decode(self, blob, count):
+        position = 0
+        for _ in range(count):
+            comment_id, create_time, likes, author_len, text_len = RECORD.unpack_from(blob, position)
+            position += RECORD.size
+            author = blob[position:position + author_len].decode('utf-8', 'replace')
+            position += author_len
+            text = blob[position:position + text_len].decode('utf-8', 'replace')
+            position += text_len
+            yield {'id': comment_id, 'create_time': create_time, 'likes': likes, 'author': author, 'text': text}
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _trim_partial_write(self):
+        # A crash between the data and index writes leaves orphaned bytes;
+        # drop them so the next append lines up with the index again
+        if not os.path.exists(self.data_path):
+            return
+        count = len(self)
+        if count:
+            last = int(np.fromfile(self.index_path, dtype=OFFSET, count=1, offset=(count - 1) * OFFSET.itemsize)[0])
+            with open(self.data_path, 'rb') as data:
+                data.seek(last)
+                header = data.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            _, _, _, author_len, text_len = RECORD.unpack(header)
+            end = last + RECORD.size + author_len + text_len
+        else:
+            end = 0
+        if os.path.getsize(self.data_path) > end:
+            with open(self.data_path, 'r+b') as data:
+                data.truncate(end)
+
+
+class CommentIndex:
+    """Inverted index from lowercased word to the spool positions containing it.
+
+    Built incrementally: update() only reads comments spooled since the
+    last call. Postings are compact uint32 arrays.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.indexed = 0
+
+    def update(self, spool, chunk_size=5000):
+        total = len(spool)
+        for start in range(self.indexed, total, chunk_size):
+            for position, comment in enumerate(spool.read(start, chunk_size), start):
+                text = f"{comment['author']} {comment['text']}".lower()
+                for token in set(TOKEN_RE.findall(text)):
+                    postings = self.postings.get(token)
+                    if postings is None:
+                        postings = self.postings[token] = array('I')
+                    postings.append(position)
+        self.indexed = max(self.indexed, total)
+
+    def search(self, query):
+        """Positions of comments containing every word of the query, in spool order.
+
+        The last word also matches as a prefix, so partial words find results.
+        """
+        tokens = TOKEN_RE.findall(query.lower())
+        if not tokens:
+            return np.empty(0, dtype=np.uint32)
+        empty = array('I')
+        matches = None
+        for token in tokens[:-1]:
+            hits = np.frombuffer(self.postings.get(token, empty), dtype=np.uint32)
+            matches = hits if matches is None else np.intersect1d(matches, hits, assume_unique=True)
+        prefix = tokens[-1]
+        prefix_hits = [np.frombuffer(postings, dtype=np.uint32)
+                       for token, postings in self.postings.items() if token.startswith(prefix)]
+        hits = np.unique(np.concatenate(prefix_hits)) if prefix_hits else np.empty(0, dtype=np.uint32)
+        return hits if matches is None else np.intersect1d(matches, hits, assume_unique=True)
+
+
+class CommentStore:
+    """Hands out one spool per video, creating the directory on first use"""
+
+    def __init__(self, directory=DEFAULT_COMMENTS_DIR):
+        self.directory = directory
+        self._spools = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def spool_for(self, video_url):
+        video_id = video_id_from_url(video_url)
+        with self._lock:
+            if video_id not in self._spools:
+                os.makedirs(self.directory, exist_ok=True)
+                self._spools[video_id] = CommentSpool(self.directory, video_id)
+            return self._spools[video_id]
+
+    def video_ids(self):
+        """Ids of the videos with comments spooled on disk"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len('.idx')] for name in os.listdir(self.directory) if name.endswith('.idx'))
+
+    def index_for(self, spool):
+        """The spool's search index, brought up to date with what's on disk"""
+        with self._lock:
+            index = self._indexes.setdefault(spool.video_id, CommentIndex())
+        index.update(spool)
+        return index
+
+
+def iter_comment_pages_http(fetcher, video_url, cursor=0, page_size=50, cancel_event=None):
+    """Yield (comments, next_cursor, has_more) pages from the comment list API"""
+    video_id = video_id_from_url(video_url)
+    has_more = True
+    while has_more:
+        comments, cursor, has_more = fetcher.fetch_comment_page(video_id, cursor, page_size, cancel_event)
+        yield comments, cursor, has_more
+        if not comments:
+            break
+
+
+# Comments rendered after a given offset, read in one round trip
+READ_COMMENTS_SCRIPT = """
+const items = document.querySelectorAll('[data-e2e="comment-level-1"]');
+const comments = [];
+for (let i = arguments[0]; i < items.length; i++) {
+    const wrapper = items[i].closest('[class*="CommentItemContainer"], [class*="DivCommentItemWrapper"]') || items[i].parentElement;
+    const author = wrapper.querySelector('[data-e2e="comment-username-1"]');
+    const likes = wrapper.querySelector('[data-e2e="comment-like-count"]');
+    comments.push({
+        text: items[i].textContent.trim(),
+        author: author ? author.textContent.trim() : '',
+        likes: likes ? likes.textContent.trim() : '0'
+    });
+}
+if (items.length) items[items.length - 1].scrollIntoView();
+return {count: items.length, comments: comments};
+"""
+COUNT_COMMENTS_SCRIPT = """return document.querySelectorAll('[data-e2e="comment-level-1"]').length;"""
+
+
+def iter_comment_pages_browser(driver, video_url, cursor=0, stall_timeout=5, max_stalls=2, pacer=None,
+                               cancel_event=None):
+    """Yield (comments, next_cursor, has_more) pages by scrolling a video's comment list.
+
+    The cursor is the number of comments already read, so a later call can
+    resume where an earlier one stopped. Scrolling stays on the same page, so
+    only the initial load goes through the pacer.
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    with (pacer or Pacer(verbose=False)).request(video_url, cancel_event, BROWSER_PAGE_COST):
+        driver.get(video_url)
+        WebDriverWait(driver, 10).until(lambda d: d.execute_script(COUNT_COMMENTS_SCRIPT) > 0)
+    stalls = 0
+    while True:
+        result = driver.execute_script(READ_COMMENTS_SCRIPT, cursor)
+        # Skip straight past comments already spooled by an earlier run
+        if result['count'] < cursor:
+            comments = []
+        else:
+            comments = result['comments']
+            for comment in comments:
+                likes = parse_count(comment['likes'])
+                comment['likes'] = 0 if likes != likes else int(likes)
+            cursor = result['count']
+
+        try:
+            WebDriverWait(driver, stall_timeout, poll_frequency=0.25).until(
+                lambda d: d.execute_script(COUNT_COMMENTS_SCRIPT) > result['count']
+            )
+            stalls = 0
+            has_more = True
+        except TimeoutException:
+            stalls += 1
+            has_more = stalls < max_stalls
+        if comments or not has_more:
+            yield comments, cursor, has_more
+        if not has_more:
+            return
+
+
+def collect_comments(spool, pages, cancel_event=None, max_pages=None, on_page=None):
+    """Spool pages from a page generator until it runs out, max_pages, or cancel.
+
+    on_page(spool) is called after each page is on disk.
+    """
+    fetched = 0
+    for comments, cursor, has_more in pages:
+        spool.append_page(comments, cursor, has_more)
+        fetched += 1
+        if on_page is not None:
+            on_page(spool)
+        if not has_more:
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if max_pages is not None and fetched >= max_pages:
+            break
+    if hasattr(pages, 'close'):
+        pages.close()
+    return fetched
@@ -0,0 +1,49 @@
+# Grid links from a given offset on, so each round only ships the new ones
+READ_LINKS_SCRIPT = """
+const anchors = document.querySelectorAll('[data-e2e="user-post-item"] a');
+const links = [];
+for (let i = arguments[0]; i < anchors.length; i++) links.push(anchors[i].href);
+return {count: anchors.length, links: links};
+"""
+COUNT_SCRIPT = """return document.querySelectorAll('[data-e2e="user-post-item"] a').length;"""
+SCROLL_SCRIPT = """window.scrollTo(0, document.body.scrollHeight);"""
+
+
+def crawl_video_links(driver, limit, cancel_event=None, seen=None, stall_timeout=5, max_stalls=2):
+    """Yield a loaded profile grid's video links, scrolling for more as needed.
+
+    Stops once `limit` distinct links have been seen (including any already
+    in `seen`), when the grid stops growing for `max_stalls` scrolls in a
+    row, or when cancel_event is set.
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    seen = set() if seen is None else seen
+    offset = 0
+    stalls = 0
+    while len(seen) < limit:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+
+        result = driver.execute_script(READ_LINKS_SCRIPT, offset)
+        # If the grid recycled items, fall back to rereading it; seen dedups
+        offset = result['count'] if result['count'] >= offset else 0
+        for href in result['links']:
+            if href and href not in seen:
+                seen.add(href)
+                yield href
+                if len(seen) >= limit:
+                    return
+
+        # Scroll and wait for the grid to append more items
+        driver.execute_script(SCROLL_SCRIPT)
+        try:
+            WebDriverWait(driver, stall_timeout, poll_frequency=0.25).until(
+                lambda d: d.execute_script(COUNT_SCRIPT) > offset
+            )
+            stalls = 0
+        except TimeoutException:
+            stalls += 1
+            if stalls >= max_stalls:
+                return  # End of the grid
@@ -0,0 +1,535 @@
+"""Streaming export and import of posts and comments.
+
+    python -m tea.export posts -o posts.tcol --profile username
+    python -m tea.export comments -o comments.csv <video_url> ...
+    python -m tea.export convert results.jsonl results.tcol
+
+Three formats, picked from the file extension unless given:
+
+    .csv    one row per post (or comment) with a header
+    .jsonl  one JSON object per line
+    .tcol   columnar binary: blocks of up to BLOCK_ROWS rows, each column a
+            contiguous little-endian array, so a file can be memory-mapped
+            and its numeric columns used in place
+
+Writers stream: rows go out as they arrive, and the columnar writer only
+holds the block being filled. Readers stream the same way, a row or a
+block at a time, so multi-GB files load in constant memory.
+
+A .tcol file is an 8-byte magic, a length-prefixed JSON header (kind and
+columns) and then blocks. Each block is a length-prefixed JSON descriptor
+(rows, data size and where each column starts) padded to 8 bytes,
+followed by the block's data. Numeric columns are plain arrays; a text
+column is a uint64 array of rows + 1 end offsets into the UTF-8 bytes that
+follow it. Nothing is written after the last block, so a file can go to a
+pipe, and a truncated last block is simply ignored.
+
+Posts carry the comment sentiment score where one has been worked out: an
+empty CSV cell, a JSON null or NaN in .tcol when it hasn't.
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from tea.post_store import ANALYTICS_COLUMNS, COUNT_COLUMNS, FLOAT_COLUMNS, MISSING_FIELDS
+
+FORMATS = ('csv', 'jsonl', 'columnar')
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.tcol': 'columnar'}
+
+CSV_FIELDS = ('username', 'url', 'caption', 'views', 'likes', 'comments', 'saves', 'shares', 'er_rate',
+              'sentiment', 'missing_fields', 'fetched_at')
+COMMENT_FIELDS = ('video_id', 'id', 'create_time', 'likes', 'author', 'text')
+
+# Column types of each kind of row in a .tcol file; 'text' is offsets + UTF-8
+POST_COLUMNS = (('username', 'text'), ('url', 'text'), ('caption', 'text'),
+                ('views', '<i8'), ('likes', '<i8'), ('comments', '<i8'), ('saves', '<i8'), ('shares', '<i8'),
+                ('er_rate', '<f8'), ('fetched_at', '<f8'), ('sentiment', '<f8'), ('missing', 'u1'))
+COMMENT_COLUMNS = (('video_id', '<i8'), ('id', '<i8'), ('create_time', '<u4'), ('likes', '<u4'),
+                   ('author', 'text'), ('text', 'text'))
+KIND_COLUMNS = {'posts': POST_COLUMNS, 'comments': COMMENT_COLUMNS}
+
+MAGIC = b'TEACOL1\n'
+LENGTH = struct.Struct('<Q')
+BLOCK_ROWS = 16384
+OFFSET = np.dtype('<u8')
+
+
+def detect_format(path, default='jsonl'):
+    return EXTENSIONS.get(os.path.splitext(path.lower())[1], default)
+
+
+def missing_mask(missing_fields):
+    """MISSING_FIELDS bitmask of a post's missing_fields list"""
+    mask = 0
+    for bit, field in enumerate(MISSING_FIELDS):
+        if field in missing_fields:
+            mask |= 1 << bit
+    return mask
+
+
+def missing_fields(mask):
+    return [field for bit, field in enumerate(MISSING_FIELDS) if mask & (1 << bit)]
+
+
+def _unscored(value):
+    return value is None or value != value
+
+
+def _pad(length):
+    return b'\0' * (-length % 8)
+
+
+def _close_output(f):
+    if f is not sys.stdout and f is not getattr(sys.stdout, 'buffer', None):
+        f.close()
+
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, username, post_data):
+        row = dict({'username': username}, **post_data)
+        row.pop('comments_data', None)
+        # NaN isn't JSON
+        for name in ANALYTICS_COLUMNS:
+            if name in row and _unscored(row[name]):
+                row[name] = None
+        self.write_row(row)
+
+    def write_row(self, row):
+        self.f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class CsvWriter:
+    def __init__(self, f, fields=CSV_FIELDS):
+        self.f = f
+        self.writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, username, post_data):
+        row = dict(post_data, username=username)
+        row['missing_fields'] = ';'.join(post_data.get('missing_fields', ()))
+        for name in ANALYTICS_COLUMNS:
+            if _unscored(row.get(name)):
+                row[name] = ''
+        self.write_row(row)
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+        self.f.flush()
+
+    def close(self):
+        pass
+
+
+class ColumnarWriter:
+    """Writes rows to a binary file object as .tcol blocks of up to block_rows rows"""
+
+    def __init__(self, f, kind='posts', block_rows=BLOCK_ROWS):
+        self.f = f
+        self.kind = kind
+        self.columns = KIND_COLUMNS[kind]
+        self.block_rows = block_rows
+        self.rows = 0
+        self._pending = {name: [] for name, _ in self.columns}
+        header = json.dumps({'format': 1, 'kind': kind, 'columns': self.columns}).encode('utf-8')
+        f.write(MAGIC + LENGTH.pack(len(header)) + header + _pad(len(header)))
+
+    def write(self, username, post_data):
+        row = dict(post_data, username=username, missing=missing_mask(post_data.get('missing_fields', ())))
+        for name in ANALYTICS_COLUMNS:
+            if row.get(name) is None:
+                row[name] = np.nan
+        self.write_row(row)
+
+    def write_row(self, row):
+        for name, column_type in self.columns:
+            value = row.get(name)
+            self._pending[name].append((value or '') if column_type == 'text' else (value or 0))
+        if len(self._pending[self.columns[0][0]]) >= self.block_rows:
+            self.flush()
+
+    def write_columns(self, columns):
+        """Write whole columns (arrays, or lists of str for text) as blocks, skipping the per-row buffer"""
+        self.flush()
+        count = len(columns[self.columns[0][0]])
+        for start in range(0, count, self.block_rows):
+            self._write_block({name: values[start:start + self.block_rows] for name, values in columns.items()})
+
+    def flush(self):
+        if self._pending[self.columns[0][0]]:
+            self._write_block(self._pending)
+            self._pending = {name: [] for name, _ in self.columns}
+        self.f.flush()
+
+    def _write_block(self, columns):
+        count = len(columns[self.columns[0][0]])
+        parts, offsets, size = [], {}, 0
+        for name, column_type in self.columns:
+            offsets[name] = size
+            if column_type == 'text':
+                encoded = [value.encode('utf-8') for value in columns[name]]
+                ends = np.cumsum([len(value) for value in encoded], dtype=OFFSET)
+                data = np.concatenate(([0], ends)).astype(OFFSET).tobytes() + b''.join(encoded)
+            else:
+                data = np.asarray(columns[name]).astype(column_type).tobytes()
+            parts += [data, _pad(len(data))]
+            size += len(data) + len(_pad(len(data)))
+        descriptor = json.dumps({'rows': count, 'size': size, 'columns': offsets}).encode('utf-8')
+        self.f.write(LENGTH.pack(len(descriptor)) + descriptor + _pad(len(descriptor)) + b''.join(parts))
+        self.rows += count
+
+    def close(self):
+        self.flush()
+
+
+class ColumnarReader:
+    """Memory-mapped .tcol file; columns are read a block at a time"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a .tcol file")
+        (length,) = LENGTH.unpack_from(self._map, len(MAGIC))
+        start = len(MAGIC) + LENGTH.size
+        header = json.loads(bytes(self._map[start:start + length]))
+        self.kind = header['kind']
+        self.columns = [tuple(column) for column in header['columns']]
+        self.types = dict(self.columns)
+        # Walk the block descriptors; their data isn't touched until it's read
+        self.blocks = []
+        position = start + length + len(_pad(length))
+        while position + LENGTH.size <= size:
+            (length,) = LENGTH.unpack_from(self._map, position)
+            data_start = position + LENGTH.size + length + len(_pad(length))
+            if data_start > size:
+                break
+            descriptor = json.loads(bytes(self._map[position + LENGTH.size:position + LENGTH.size + length]))
+            if data_start + descriptor['size'] > size:
+                break  # cut off mid-write
+            self.blocks.append((data_start, descriptor))
+            position = data_start + descriptor['size']
+
+    def __len__(self):
+        return sum(descriptor['rows'] for _, descriptor in self.blocks)
+
+    def _array(self, offset, dtype, count):
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+
+    def read_block(self, index, names=None):
+        """One block's columns: read-only arrays straight off the map, lists of str for text"""
+        data_start, descriptor = self.blocks[index]
+        count = descriptor['rows']
+        columns = {}
+        for name in names or self.types:
+            offset = data_start + descriptor['columns'][name]
+            if self.types[name] == 'text':
+                ends = self._array(offset, OFFSET, count + 1).tolist()
+                blob = self._map[offset + (count + 1) * OFFSET.itemsize:
+                                 offset + (count + 1) * OFFSET.itemsize + ends[-1]]
+                columns[name] = [blob[ends[row]:ends[row + 1]].decode('utf-8', 'replace') for row in range(count)]
+            else:
+                columns[name] = self._array(offset, self.types[name], count)
+        return columns
+
+    def iter_blocks(self, names=None):
+        for index in range(len(self.blocks)):
+            yield self.read_block(index, names)
+
+    def __iter__(self):
+        """Rows as dicts"""
+        for columns in self.iter_blocks():
+            lists = {name: values if isinstance(values, list) else values.tolist() for name, values in columns.items()}
+            for row in range(len(lists[self.columns[0][0]])):
+                yield {name: values[row] for name, values in lists.items()}
+
+    def close(self):
+        # Views handed out by read_block keep the map alive until they're dropped
+        try:
+            if self._map:
+                self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(path, kind='posts', output_format=None):
+    """(writer, file) for path in the given or detected format; '-' is stdout"""
+    output_format = output_format or detect_format(path)
+    if output_format == 'columnar':
+        f = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        return ColumnarWriter(f, kind), f
+    f = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    if output_format == 'csv':
+        return CsvWriter(f, CSV_FIELDS if kind == 'posts' else COMMENT_FIELDS), f
+    return JsonlWriter(f), f
+
+
+def _typed_post(row):
+    """A post row from CSV or JSONL as post_data, counts and rates as numbers"""
+    if 'url' not in row:
+        raise ValueError("not a posts export")
+    post_data = {'url': row['url'], 'caption': row.get('caption') or ''}
+    for name in COUNT_COLUMNS:
+        post_data[name] = int(float(row.get(name) or 0))
+    for name in FLOAT_COLUMNS + ANALYTICS_COLUMNS:
+        if row.get(name) not in (None, ''):
+            post_data[name] = float(row[name])
+    fields = row.get('missing_fields') or []
+    post_data['missing_fields'] = fields.split(';') if isinstance(fields, str) else list(fields)
+    post_data['comments_data'] = []
+    return post_data
+
+
+def iter_rows(path, input_format=None):
+    """Rows of a CSV, JSONL or .tcol file as dicts, read as they're needed"""
+    input_format = input_format or detect_format(path)
+    if input_format == 'columnar':
+        with ColumnarReader(path) as reader:
+            yield from reader
+        return
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if input_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        lines = []
+        for line in f:
+            if line.strip():
+                lines.append(line)
+            if len(lines) >= BLOCK_ROWS:
+                yield from _parse_lines(lines)
+                lines = []
+        yield from _parse_lines(lines)
+
+
+def _parse_lines(lines):
+    # One json.loads over a block of lines skips most of the per-call overhead;
+    # a bad line is parsed on its own so the error points at it
+    try:
+        return json.loads('[' + ','.join(lines) + ']')
+    except ValueError:
+        return [json.loads(line) for line in lines]
+
+
+def iter_posts(path, input_format=None):
+    """(username, post_data) for each post saved in a file"""
+    for row in iter_rows(path, input_format):
+        if 'missing' in row and 'missing_fields' not in row:
+            row['missing_fields'] = missing_fields(row['missing'])
+        yield row.get('username') or '', _typed_post(row)
+
+
+def _post_columns(rows):
+    # Columns for PostStore.extend_columns straight from CSV or JSONL rows,
+    # without building a post_data dict for each
+    try:
+        urls = [row['url'] for row in rows]
+    except (KeyError, TypeError):
+        raise ValueError("not a posts export") from None
+    columns = {name: np.array([row.get(name) or 0 for row in rows], dtype=np.float64).astype(np.int64)
+               for name in COUNT_COLUMNS}
+    columns.update({name: np.array([row.get(name) or 0 for row in rows], dtype=np.float64)
+                    for name in FLOAT_COLUMNS})
+    columns.update({name: np.array([np.nan if row.get(name) in (None, '') else row[name] for row in rows],
+                                   dtype=np.float64)
+                    for name in ANALYTICS_COLUMNS})
+    missing = np.zeros(len(rows), dtype=np.uint8)
+    for index, row in enumerate(rows):
+        fields = row.get('missing_fields')
+        if fields:
+            missing[index] = missing_mask(fields.split(';') if isinstance(fields, str) else fields)
+    return urls, [row.get('caption') or '' for row in rows], columns, missing
+
+
+def load_posts(path, store, input_format=None, cancel_event=None):
+    """Load a saved run into a tea.post_store.PostStore a block at a time; returns the posts read.
+
+    A .tcol file goes straight from its mapped columns into the store;
+    CSV and JSONL rows are gathered into blocks and converted a column at a time.
+    """
+    input_format = input_format or detect_format(path)
+    loaded = 0
+    if input_format == 'columnar':
+        with ColumnarReader(path) as reader:
+            if reader.kind != 'posts':
+                raise ValueError(f"{path} holds {reader.kind}, not posts")
+            for columns in reader.iter_blocks():
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                # Files written before sentiment was exported just leave it unscored
+                store.extend_columns(columns['url'], columns['caption'],
+                                     {name: columns[name] for name in COUNT_COLUMNS + FLOAT_COLUMNS + ANALYTICS_COLUMNS
+                                      if name in columns},
+                                     columns['missing'])
+                loaded += len(columns['url'])
+                del columns  # release the views before the map closes
+        return loaded
+    block = []
+    for row in iter_rows(path, input_format):
+        block.append(row)
+        if len(block) >= BLOCK_ROWS:
+            store.extend_columns(*_post_columns(block))
+            loaded += len(block)
+            block = []
+            if cancel_event is not None and cancel_event.is_set():
+                return loaded
+    if block:
+        store.extend_columns(*_post_columns(block))
+        loaded += len(block)
+    return loaded
+
+
+def username_from_url(url):
+    start = url.find('/@')
+    return url[start + 2:].split('/', 1)[0] if start != -1 else ''
+
+
+def export_posts(store, path, output_format=None):
+    """Write every post in a PostStore to path; returns how many were written"""
+    output_format = output_format or detect_format(path)
+    writer, f = open_writer(path, 'posts', output_format)
+    try:
+        if output_format == 'columnar':
+            # Straight from the store's columns, a block at a time
+            for start in range(0, len(store), BLOCK_ROWS):
+                rows = range(start, min(len(store), start + BLOCK_ROWS))
+                urls = [store.url(row) for row in rows]
+                columns = {name: store.column(name)[start:rows.stop]
+                           for name in COUNT_COLUMNS + FLOAT_COLUMNS + ANALYTICS_COLUMNS}
+                columns.update(username=[username_from_url(url) for url in urls], url=urls,
+                               caption=store.captions()[start:rows.stop],
+                               missing=store.column('missing')[start:rows.stop])
+                writer.write_columns(columns)
+        else:
+            for post_data in store:
+                writer.write(username_from_url(post_data['url']), post_data)
+        writer.close()
+    finally:
+        _close_output(f)
+    return len(store)
+
+
+def export_comments(spools, path, output_format=None, cancel_event=None, chunk_size=10000):
+    """Stream every comment in the given tea.comments.CommentSpools to path; returns how many were written"""
+    writer, f = open_writer(path, 'comments', output_format)
+    written = 0
+    try:
+        for spool in spools:
+            video_id = int(spool.video_id)
+            for start in range(0, len(spool), chunk_size):
+                if cancel_event is not None and cancel_event.is_set():
+                    return written
+                for comment in spool.read(start, chunk_size):
+                    comment['video_id'] = video_id
+                    writer.write_row(comment)
+                    written += 1
+        writer.close()
+    finally:
+        _close_output(f)
+    return written
+
+
+def convert(source, destination, input_format=None, output_format=None):
+    """Copy a file's rows to another format; returns how many were copied"""
+    input_format = input_format or detect_format(source)
+    if input_format == 'columnar':
+        with ColumnarReader(source) as reader:
+            kind = reader.kind
+    else:
+        with open(source, 'r', encoding='utf-8', newline='') as f:
+            first = next(csv.DictReader(f), None) if input_format == 'csv' else json.loads(f.readline() or '{}')
+        kind = 'comments' if first and 'video_id' in first else 'posts'
+    writer, f = open_writer(destination, kind, output_format)
+    copied = 0
+    try:
+        rows = iter_posts(source, input_format) if kind == 'posts' else iter_rows(source, input_format)
+        for row in rows:
+            if kind == 'posts':
+                writer.write(*row)
+            else:
+                if input_format == 'csv':
+                    row = dict(row, **{name: int(row[name] or 0) for name in COMMENT_FIELDS[:4]})
+                writer.write_row(row)
+            copied += 1
+        writer.close()
+    finally:
+        _close_output(f)
+    return copied
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tea.export',
+                                     description="Export and convert saved posts and comments")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    posts = commands.add_parser('posts', help="export cached posts")
+    posts.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    posts.add_argument('-f', '--format', choices=FORMATS, help="default: from the output file's extension, else jsonl")
+    posts.add_argument('--profile', action='append', help="only this profile's posts (repeatable; default: all)")
+
+    comments = commands.add_parser('comments', help="export spooled comments")
+    comments.add_argument('urls', nargs='*', help="video URLs (default: every spooled video)")
+    comments.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    comments.add_argument('-f', '--format', choices=FORMATS)
+
+    conversion = commands.add_parser('convert', help="rewrite an exported file in another format")
+    conversion.add_argument('source')
+    conversion.add_argument('destination')
+    conversion.add_argument('--from', dest='input_format', choices=FORMATS)
+    conversion.add_argument('-f', '--format', choices=FORMATS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'posts':
+        from tea.post_cache import PostCache
+        post_cache = PostCache()
+        writer, f = open_writer(args.output, 'posts', args.format)
+        written = 0
+        try:
+            for username in [username.lstrip('@') for username in args.profile or post_cache.profiles()]:
+                for post_data in post_cache.load_profile(username):
+                    writer.write(username, post_data)
+                    written += 1
+            writer.close()
+        finally:
+            post_cache.close()
+            _close_output(f)
+    elif args.command == 'comments':
+        from tea.comments import CommentSpool, CommentStore
+        store = CommentStore()
+        if args.urls:
+            spools = [store.spool_for(url) for url in args.urls]
+        else:
+            spools = (CommentSpool(store.directory, video_id, recover=False) for video_id in store.video_ids())
+        written = export_comments(spools, args.output, args.format)
+    else:
+        written = convert(args.source, args.destination, args.input_format, args.format)
+    print(f"Wrote {written} rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# Reads every counter on a video page in one round trip. Returns null until
+# the metrics container (the action bar holding the like counter) exists.
+METRICS_SCRIPT = """
+const pick = (selectors) => {
+    for (const selector of selectors) {
+        const el = document.querySelector(selector);
+        if (el) return el.textContent.trim();
+    }
+    return null;
+};
+const likes = pick(['[data-e2e="like-count"]', '[data-e2e="browse-like-count"]']);
+if (likes === null) return null;
+return {
+    likes: likes,
+    comments: pick(['[data-e2e="comment-count"]', '[data-e2e="browse-comment-count"]']),
+    shares: pick(['[data-e2e="share-count"]']),
+    saves: pick(['[data-e2e="undefined-count"]', '[data-e2e="collect-count"]']),
+    views: pick(['[data-e2e="video-views"]', '[data-e2e="browse-video-views"]']),
+    caption: pick(['[data-e2e="browse-video-desc"]', '[data-e2e="video-desc"]'])
+};
+"""
+
+METRIC_FIELDS = ('likes', 'comments', 'shares', 'saves', 'views', 'caption')
+
+
+def extract_video_metrics(driver, timeout=10, poll_frequency=0.25):
+    """Wait once for the metrics container and read all counters together.
+
+    Returns a dict with the raw text of each field in METRIC_FIELDS (None
+    when the page doesn't show it) and a 'missing' list naming those
+    fields. Raises TimeoutException if the container never appears.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    raw = WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(
+        lambda d: d.execute_script(METRICS_SCRIPT),
+        message="metrics container not found"
+    )
+    metrics = {field: raw.get(field) or None for field in METRIC_FIELDS}
+    metrics['missing'] = [field for field in METRIC_FIELDS if metrics[field] is None]
+    return metrics
@@ -0,0 +1,396 @@
+"""Engagement history: every fetch of a post kept as a timestamped snapshot.
+
+Each profile gets two files under ~/.tea/history:
+
+    <username>.hist   append-only packed RECORD rows, oldest first
+    <username>.snap   one SNAPSHOT entry per snapshot time: rows so far and
+                      the profile's running totals, rebuilt from .hist if lost
+
+A row holds how much a post's counts changed since it was last recorded,
+not the counts themselves. A post's counts at any time are the running sum
+of its rows and the profile's totals are the running sum of all its rows,
+so both files can be memory-mapped and queried with a few vectorised
+passes: a profile trend only reads the small .snap, and a time range of
+rows is found by binary search over it. Rows that wouldn't change anything
+are not written.
+
+    python -m tea.history profiles
+    python -m tea.history trend <username>
+    python -m tea.history post <video_url>
+    python -m tea.history top [<username> ...] --days 7
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+from tea.metrics import engagement_rates
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".tea", "history")
+
+COUNT_FIELDS = ('views', 'likes', 'comments', 'saves', 'shares')
+# Count deltas, the snapshot time (epoch seconds) and flags; 48 bytes a row
+RECORD = np.dtype([('video_id', '<i8'), ('views', '<i8'), ('likes', '<i8'), ('comments', '<i8'),
+                   ('time', '<u4'), ('saves', '<i4'), ('shares', '<i4'), ('flags', '<u4')])
+# The post's first row: its deltas are the whole counts, which isn't growth
+FIRST_SEEN = 1
+# Row count and profile totals (posts = posts seen) as of each snapshot; 64 bytes an entry
+SNAPSHOT = np.dtype([('time', '<f8'), ('rows', '<i8'), ('views', '<i8'), ('likes', '<i8'), ('comments', '<i8'),
+                     ('saves', '<i8'), ('shares', '<i8'), ('posts', '<i8')])
+
+# Profiles whose rows and index stay open between queries; scanning hundreds
+# of profiles for a top-k shouldn't pin all of them in memory
+CACHED_PROFILES = 32
+
+POST_URL_RE = re.compile(r'/@([^/?#]+)/video/(\d{1,19})(?!\d)')
+
+
+def parse_video_url(video_url):
+    """(username, video id) for a video URL"""
+    match = POST_URL_RE.search(video_url)
+    if not match or int(match.group(2)) >= 1 << 63:
+        raise ValueError(f"Not a video URL: {video_url}")
+    return match.group(1), int(match.group(2))
+
+
+def video_url(username, video_id):
+    return f"https://www.tiktok.com/@{username}/video/{video_id}"
+
+
+def _trend(times, counts):
+    """Series dict with the times as floats and ER worked out from the counts"""
+    trend = {'time': np.asarray(times, dtype=np.float64)}
+    trend.update(counts)
+    trend['er_rate'] = engagement_rates(counts['likes'], counts['comments'], counts['shares'], counts['views'])
+    return trend
+
+
+def build_index(rows):
+    """The SNAPSHOT entries for a profile's rows"""
+    if not len(rows):
+        return np.zeros(0, dtype=SNAPSHOT)
+    times = rows['time']
+    ends = np.append(np.flatnonzero(np.diff(times)), len(times) - 1)
+    index = np.zeros(len(ends), dtype=SNAPSHOT)
+    index['time'] = times[ends]
+    index['rows'] = ends + 1
+    for field in COUNT_FIELDS:
+        index[field] = np.cumsum(rows[field], dtype=np.int64)[ends]
+    index['posts'] = np.cumsum(rows['flags'] & FIRST_SEEN, dtype=np.int64)[ends]
+    return index
+
+
+class HistoryStore:
+    """Per-profile engagement history; safe to share between threads.
+
+    Several processes can append to the same profile: a writer folds in
+    rows other writers added before it appends its own.
+    """
+
+    def __init__(self, directory=DEFAULT_HISTORY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._writers = {}  # .hist path -> latest counts per video and running totals
+        self._maps = {}  # .hist path -> (rows, memmap) of the last read
+        self._indexes = {}  # .snap path -> (bytes, entries) of the last read
+
+    def path(self, username, suffix='.hist'):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', username.lower()) + suffix)
+
+    def profiles(self):
+        """Usernames (as stored) with any history"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return []
+        return [name[:-len('.hist')] for name in names if name.endswith('.hist')]
+
+    def record(self, username, posts, at=None):
+        """Append a snapshot of posts (post_data dicts) taken at `at`; returns the rows written"""
+        at = int(time.time() if at is None else at)
+        with self._lock:
+            writer = self._writer(username)
+            # Keep rows in time order even if the clock steps back
+            at = max(at, writer['last_time'])
+            latest, pending = writer['latest'], {}
+            rows = []
+            for post_data in posts:
+                try:
+                    _, video_id = parse_video_url(post_data['url'])
+                except ValueError:
+                    continue
+                counts = tuple(int(post_data.get(field) or 0) for field in COUNT_FIELDS)
+                previous = pending.get(video_id, latest.get(video_id))
+                if previous is None:
+                    rows.append((video_id, counts, FIRST_SEEN))
+                elif counts != previous:
+                    rows.append((video_id, tuple(now - then for now, then in zip(counts, previous)), 0))
+                pending[video_id] = counts
+            if not rows:
+                return 0
+            packed = np.zeros(len(rows), dtype=RECORD)
+            packed['video_id'] = [video_id for video_id, _, _ in rows]
+            for index, field in enumerate(COUNT_FIELDS):
+                packed[field] = [deltas[index] for _, deltas, _ in rows]
+            packed['time'] = at
+            packed['flags'] = [flags for _, _, flags in rows]
+            # Rows first: an index that ends short of them is rebuilt, never trusted
+            with open(self.path(username), 'ab') as f:
+                f.write(packed.tobytes())
+            self._fold(writer, packed)
+            self._write_snapshot(username, writer)
+        return len(rows)
+
+    def rows(self, username):
+        """A profile's rows as a read-only memory-mapped record array"""
+        path = self.path(username)
+        try:
+            count = os.path.getsize(path) // RECORD.itemsize
+        except OSError:
+            count = 0
+        if not count:
+            return np.zeros(0, dtype=RECORD)
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached is None or cached[0] != count:
+                cached = self._remember(self._maps, path,
+                                        (count, np.memmap(path, dtype=RECORD, mode='r', shape=(count,))))
+        return cached[1]
+
+    def snapshot_index(self, username):
+        """A profile's SNAPSHOT entries, oldest first"""
+        return self._load(username)[1]
+
+    def snapshots(self, username):
+        """Distinct snapshot times of a profile, oldest first"""
+        return self.snapshot_index(username)['time'].copy()
+
+    def post_trend(self, video_url):
+        """A post's counts and ER at each snapshot it changed in"""
+        username, video_id = parse_video_url(video_url)
+        rows = self.rows(username)
+        rows = rows[rows['video_id'] == video_id]
+        return _trend(rows['time'], {field: np.cumsum(rows[field], dtype=np.int64) for field in COUNT_FIELDS})
+
+    def profile_trend(self, username):
+        """A profile's total counts, ER and number of posts known at each snapshot"""
+        index = self.snapshot_index(username)
+        trend = _trend(index['time'], {field: index[field].copy() for field in COUNT_FIELDS})
+        trend['posts'] = index['posts'].copy()
+        return trend
+
+    def growth(self, username, start, end=None):
+        """How much each post's counts grew after `start` up to and including `end`.
+
+        Returns parallel arrays: video_id, one delta per count field, and the
+        hours each post was watched for (from `start`, or from when it was
+        first seen if that was later).
+        """
+        end = time.time() if end is None else end
+        rows, index = self._load(username)
+        first_row, last_row = (int(index['rows'][position - 1]) if position else 0
+                               for position in np.searchsorted(index['time'], [start, end], 'right'))
+        window = rows[first_row:last_row]
+        ids, inverse = np.unique(window['video_id'], return_inverse=True)
+        first = (window['flags'] & FIRST_SEEN) != 0
+        growth = {'video_id': ids}
+        for field in COUNT_FIELDS:
+            deltas = np.where(first, 0, window[field])
+            growth[field] = np.rint(np.bincount(inverse, weights=deltas, minlength=len(ids))).astype(np.int64)
+        began = np.full(len(ids), float(start))
+        np.maximum.at(began, inverse[first], window['time'][first].astype(np.float64))
+        growth['hours'] = np.maximum(end - began, 0.0) / 3600
+        return growth
+
+    def top_growth(self, usernames=None, start=None, end=None, k=10, by='views'):
+        """The k fastest-growing posts across profiles, by `by` gained per hour"""
+        end = time.time() if end is None else end
+        start = end - 7 * 24 * 3600 if start is None else start
+        found = []
+        for username in self.profiles() if usernames is None else usernames:
+            growth = self.growth(username, start, end)
+            hours = growth['hours']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rates = np.where(hours > 0, growth[by] / hours, 0.0)
+            # Only each profile's own top k can make the overall top k
+            best = np.argpartition(-rates, k)[:k] if len(rates) > k else np.arange(len(rates))
+            for index in best.tolist():
+                if growth[by][index] <= 0:
+                    continue
+                video_id = int(growth['video_id'][index])
+                found.append({'username': username, 'video_id': video_id, 'url': video_url(username, video_id),
+                              'gained': int(growth[by][index]), 'per_hour': float(rates[index]),
+                              'hours': float(hours[index])})
+        found.sort(key=lambda post: post['per_hour'], reverse=True)
+        return found[:k]
+
+    def close(self):
+        with self._lock:
+            self._maps.clear()
+            self._indexes.clear()
+            self._writers.clear()
+
+    def _load(self, username):
+        # Rows and the index entries that cover exactly those rows
+        rows = self.rows(username)
+        path = self.path(username, '.snap')
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            cached = self._indexes.get(path)
+            if cached is None or cached[0] != size:
+                entries = np.fromfile(path, dtype=SNAPSHOT, count=size // SNAPSHOT.itemsize) if size else \
+                    np.zeros(0, dtype=SNAPSHOT)
+                cached = self._remember(self._indexes, path, (size, entries))
+        index = cached[1]
+        # A writer caught between the two files (or one that crashed there)
+        # leaves them out of step; work the index out from the rows instead
+        if (int(index['rows'][-1]) if len(index) else 0) != len(rows):
+            index = build_index(rows)
+        return rows, index
+
+    def _remember(self, cache, key, value):
+        cache.pop(key, None)
+        cache[key] = value
+        while len(cache) > CACHED_PROFILES:
+            del cache[next(iter(cache))]
+        return value
+
+    def _writer(self, username):
+        path = self.path(username)
+        writer = self._writers.get(path)
+        if writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._trim_partial_write(path, RECORD.itemsize)
+            self._trim_partial_write(self.path(username, '.snap'), SNAPSHOT.itemsize)
+            writer = self._writers[path] = {'latest': {}, 'totals': [0] * len(COUNT_FIELDS), 'posts': 0,
+                                            'rows': 0, 'last_time': 0}
+        # Fold in whatever other writers appended since we last looked
+        try:
+            count = os.path.getsize(path) // RECORD.itemsize
+        except OSError:
+            count = 0
+        if count > writer['rows']:
+            self._fold(writer, np.fromfile(path, dtype=RECORD, count=count - writer['rows'],
+                                           offset=writer['rows'] * RECORD.itemsize))
+        last = self._last_snapshot(username)
+        if (int(last['rows']) if last is not None else 0) != writer['rows']:
+            self._rewrite_index(username, writer['rows'])
+        return writer
+
+    def _fold(self, writer, rows):
+        if not len(rows):
+            return
+        ids, inverse = np.unique(rows['video_id'], return_inverse=True)
+        latest, totals = writer['latest'], writer['totals']
+        sums = []
+        for position, field in enumerate(COUNT_FIELDS):
+            column = np.rint(np.bincount(inverse, weights=rows[field], minlength=len(ids))).astype(np.int64)
+            totals[position] += int(column.sum())
+            sums.append(column.tolist())
+        for position, video_id in enumerate(ids.tolist()):
+            previous = latest.get(video_id, (0,) * len(COUNT_FIELDS))
+            latest[video_id] = tuple(then + column[position] for then, column in zip(previous, sums))
+        writer['posts'] += int(np.count_nonzero(rows['flags'] & FIRST_SEEN))
+        writer['rows'] += len(rows)
+        writer['last_time'] = max(writer['last_time'], int(rows['time'][-1]))
+
+    def _last_snapshot(self, username):
+        path = self.path(username, '.snap')
+        try:
+            count = os.path.getsize(path) // SNAPSHOT.itemsize
+        except OSError:
+            return None
+        if not count:
+            return None
+        return np.fromfile(path, dtype=SNAPSHOT, count=1, offset=(count - 1) * SNAPSHOT.itemsize)[0]
+
+    def _write_snapshot(self, username, writer):
+        """Bring the index up to the writer's last row: extend the latest snapshot or start a new one"""
+        entry = np.zeros(1, dtype=SNAPSHOT)
+        entry['time'] = writer['last_time']
+        entry['rows'] = writer['rows']
+        for position, field in enumerate(COUNT_FIELDS):
+            entry[field] = writer['totals'][position]
+        entry['posts'] = writer['posts']
+        path = self.path(username, '.snap')
+        last = self._last_snapshot(username)
+        if last is not None and last['time'] == writer['last_time']:
+            with open(path, 'r+b') as f:
+                f.seek(-SNAPSHOT.itemsize, os.SEEK_END)
+                f.write(entry.tobytes())
+        else:
+            with open(path, 'ab') as f:
+                f.write(entry.tobytes())
+
+    def _rewrite_index(self, username, count):
+        path = self.path(username, '.snap')
+        index = build_index(np.fromfile(self.path(username), dtype=RECORD, count=count) if count else
+                            np.zeros(0, dtype=RECORD))
+        with open(path + '.tmp', 'wb') as f:
+            f.write(index.tobytes())
+        os.replace(path + '.tmp', path)
+
+    def _trim_partial_write(self, path, itemsize):
+        # A crash mid-append leaves part of a row; drop it so rows line up again
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        if size % itemsize:
+            self._maps.pop(path, None)
+            with open(path, 'r+b') as f:
+                f.truncate(size - size % itemsize)
+
+
+def _format_time(seconds):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(seconds))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tea.history', description="Query engagement history")
+    parser.add_argument('--dir', default=DEFAULT_HISTORY_DIR, help="history directory (default: ~/.tea/history)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('profiles', help="list profiles with history")
+    trend = commands.add_parser('trend', help="a profile's totals and ER at each snapshot")
+    trend.add_argument('username')
+    post = commands.add_parser('post', help="a post's counts and ER at each snapshot")
+    post.add_argument('video_url')
+    top = commands.add_parser('top', help="fastest-growing posts")
+    top.add_argument('usernames', nargs='*', help="profiles to compare (default: all)")
+    top.add_argument('--days', type=float, default=7, help="look back this many days (default: 7)")
+    top.add_argument('-k', type=int, default=10, help="how many posts (default: 10)")
+    top.add_argument('--by', choices=COUNT_FIELDS, default='views', help="count to rank by (default: views)")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.dir)
+    if args.command == 'profiles':
+        for username in store.profiles():
+            print(f"{username}  {len(store.snapshots(username))} snapshots")
+    elif args.command in ('trend', 'post'):
+        try:
+            series = store.profile_trend(args.username) if args.command == 'trend' else store.post_trend(args.video_url)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        if not len(series['time']):
+            print("No history recorded", file=sys.stderr)
+            return 1
+        for index in range(len(series['time'])):
+            print(f"{_format_time(series['time'][index])}  {series['views'][index]:>12,} views  "
+                  f"{series['likes'][index]:>11,} likes  ER {series['er_rate'][index]:.2f}%")
+    else:
+        end = time.time()
+        for post_data in store.top_growth(args.usernames or None, end - args.days * 86400, end, args.k, args.by):
+            print(f"{post_data['gained']:>12,} {args.by} ({post_data['per_hour']:,.1f}/h)  {post_data['url']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import json
+import re
+import threading
+
+from tea.pacing import Pacer
+from tea.telemetry import METRICS
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Script tags TikTok has used to ship the page's hydration state
+HYDRATION_SCRIPT_IDS = ('__UNIVERSAL_DATA_FOR_REHYDRATION__', 'SIGI_STATE', '__NEXT_DATA__')
+HYDRATION_RE = re.compile(
+    r'<script[^>]*\bid="(%s)"[^>]*>(.*?)</script>' % '|'.join(HYDRATION_SCRIPT_IDS),
+    re.S
+)
+VIDEO_PATH_RE = re.compile(r'/@([\w.-]+)/video/(\d+)')
+
+# Hydration stats key -> post_data field
+STAT_FIELDS = {
+    'diggCount': 'likes',
+    'commentCount': 'comments',
+    'shareCount': 'shares',
+    'collectCount': 'saves',
+    'playCount': 'views',
+}
+
+
+def parse_hydration(html):
+    """Return the decoded hydration JSON embedded in a page, or None"""
+    for match in HYDRATION_RE.finditer(html):
+        try:
+            return json.loads(match.group(2))
+        except ValueError:
+            continue
+    return None
+
+
+def iter_item_structs(data):
+    """Yield every video item struct found in a hydration payload, in page order"""
+    if not isinstance(data, dict):
+        return
+
+    # __UNIVERSAL_DATA_FOR_REHYDRATION__
+    scope = data.get('__DEFAULT_SCOPE__', {})
+    detail = scope.get('webapp.video-detail', {}).get('itemInfo', {}).get('itemStruct')
+    if detail:
+        yield detail
+    for item in scope.get('webapp.user-detail', {}).get('itemList', []):
+        yield item
+
+    # SIGI_STATE
+    for item in data.get('ItemModule', {}).values():
+        yield item
+
+    # __NEXT_DATA__
+    page_props = data.get('props', {}).get('pageProps', {})
+    detail = page_props.get('itemInfo', {}).get('itemStruct')
+    if detail:
+        yield detail
+    for item in page_props.get('items', []):
+        yield item
+
+
+def parse_video_metrics(html):
+    """Read counts and caption from a video page's hydration JSON.
+
+    Returns the same shape as tea.extract.extract_video_metrics: raw values
+    as strings (None when absent) plus a 'missing' list.
+    """
+    item = next(iter_item_structs(parse_hydration(html)), None)
+    if item is None:
+        raise ValueError("no hydration data in page")
+
+    stats = item.get('stats') or {}
+    # statsV2 carries the same counters as strings, and is the only one
+    # that stays exact above 2^31
+    stats = dict(stats, **(item.get('statsV2') or {}))
+    metrics = {field: None for field in STAT_FIELDS.values()}
+    for key, field in STAT_FIELDS.items():
+        if stats.get(key) is not None:
+            metrics[field] = str(stats[key])
+    metrics['caption'] = item.get('desc') or None
+    metrics['missing'] = [field for field, value in metrics.items() if value is None]
+    return metrics
+
+
+def parse_profile_links(html, base_url):
+    """List a profile's video URLs, from hydration JSON or raw hrefs as a fallback"""
+    links = []
+    seen = set()
+    for item in iter_item_structs(parse_hydration(html)):
+        author = item.get('author')
+        if isinstance(author, dict):
+            author = author.get('uniqueId')
+        video_id = item.get('id')
+        if author and video_id and video_id not in seen:
+            seen.add(video_id)
+            links.append(f"{base_url}/@{author}/video/{video_id}")
+
+    if not links:
+        for author, video_id in VIDEO_PATH_RE.findall(html):
+            if video_id not in seen:
+                seen.add(video_id)
+                links.append(f"{base_url}/@{author}/video/{video_id}")
+    return links
+
+
+# Responses that mean the host wants us to back off; retried after the pacer's cooldown
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpFetcher:
+    """Browser-free page fetcher over a keep-alive connection pool"""
+
+    def __init__(self, base_url="https://www.tiktok.com", maxsize=8, timeout=10.0,
+                 user_agent=DEFAULT_USER_AGENT, pacer=None, max_attempts=3):
+        self.base_url = base_url.rstrip('/')
+        self.pacer = pacer or Pacer()
+        self.max_attempts = max_attempts
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._http = None
+        self._http_lock = threading.Lock()
+
+    @property
+    def http(self):
+        """The connection pool, created on first use so importing and constructing stay cheap"""
+        if self._http is None:
+            # urllib3 is already installed as a Selenium dependency
+            import urllib3
+            with self._http_lock:
+                if self._http is None:
+                    self._http = urllib3.PoolManager(
+                        num_pools=4,
+                        maxsize=self.maxsize,
+                        headers={
+                            'User-Agent': self.user_agent,
+                            'Accept': 'text/html,application/xhtml+xml',
+                            'Accept-Language': 'en-US,en;q=0.9',
+                        },
+                        timeout=urllib3.Timeout(total=self.timeout),
+                        # Connection errors only; throttling responses are retried through the pacer
+                        retries=urllib3.Retry(total=2, backoff_factor=0.5, status_forcelist=()),
+                    )
+        return self._http
+
+    def request(self, url, headers=None, cancel_event=None):
+        """GET through the pacer, retrying throttling responses after its cooldown"""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                METRICS.count('http.retries')
+            with self.pacer.request(url, cancel_event) as paced, METRICS.timer('http.request'):
+                response = self.http.request('GET', url, headers=headers)
+                if response.status in THROTTLE_STATUSES:
+                    METRICS.count('http.throttled')
+                    paced.throttled()
+            if response.status not in THROTTLE_STATUSES:
+                break
+        return response
+
+    def get_html(self, url, cancel_event=None):
+        response = self.request(url, cancel_event=cancel_event)
+        if response.status != 200:
+            raise Exception(f"HTTP {response.status} for {url}")
+        return response.data.decode('utf-8', 'replace')
+
+    def fetch_profile_links(self, username, limit=None, cancel_event=None):
+        """Video URLs listed in the profile page's embedded data"""
+        links = parse_profile_links(self.get_html(f"{self.base_url}/@{username}", cancel_event), self.base_url)
+        return links[:limit] if limit is not None else links
+
+    def fetch_video_metrics(self, video_url, cancel_event=None):
+        """Raw metrics for one video, parsed from its page without rendering it"""
+        return parse_video_metrics(self.get_html(video_url, cancel_event))
+
+    def fetch_comment_page(self, video_id, cursor=0, count=50, cancel_event=None):
+        """One page of the comment list API: (comments, next_cursor, has_more)"""
+        url = f"{self.base_url}/api/comment/list/?aweme_id={video_id}&count={count}&cursor={cursor}"
+        response = self.request(url, {'Accept': 'application/json', 'Referer': self.base_url + '/'}, cancel_event)
+        if response.status != 200:
+            raise Exception(f"HTTP {response.status} for {url}")
+        data = json.loads(response.data.decode('utf-8'))
+        if data.get('status_code', 0) != 0:
+            raise Exception(f"Comment API error {data.get('status_code')} for video {video_id}")
+        comments = [
+            {
+                'id': comment.get('cid'),
+                'text': comment.get('text', ''),
+                'likes': comment.get('digg_count', 0),
+                'create_time': comment.get('create_time', 0),
+                'author': (comment.get('user') or {}).get('unique_id', ''),
+            }
+            for comment in data.get('comments') or []
+        ]
+        return comments, int(data.get('cursor', cursor + len(comments))), bool(data.get('has_more'))
+
+    def close(self):
+        if self._http is not None:
+            self._http.clear()
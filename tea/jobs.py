@@ -0,0 +1,385 @@
+"""Durable job queue for analysing many profiles across worker processes.
+
+    python -m tea.jobs add usernames.txt --posts 50
+    python -m tea.jobs work --workers 4 --fetch-mode http
+    python -m tea.jobs status
+    python -m tea.jobs export -o results.jsonl
+
+Jobs live in SQLite (~/.tea/jobs.sqlite3). A 'profile' job lists a
+profile's videos and queues one 'video' job per link; a video job fetches
+one post into the shared post cache. Workers claim a job under a lease and
+keep renewing it while they work, so when a worker dies its leases run out
+and the next claim picks the job up again. A job that fails is retried with
+exponential backoff until it runs out of attempts.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+from tea.analyzer import FETCH_MODE_NAMES, ProfileAnalyzer, setup_browser
+from tea.browser_sessions import LazySession
+from tea.cli import read_usernames
+from tea.export import FORMATS, open_writer
+from tea.pacing import Pacer, PacingCancelled
+from tea.post_cache import PostCache
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.expanduser("~"), ".tea", "jobs.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, available_at);
+"""
+
+# Chrome profile dirs are per session index, so each worker process gets its own range
+SESSIONS_PER_WORKER = 100
+
+
+class JobQueue:
+    """SQLite-backed queue shared by any number of worker processes"""
+
+    def __init__(self, path=DEFAULT_JOBS_PATH, max_attempts=5, backoff_base=30.0, backoff_max=3600.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def enqueue(self, kind, key, payload):
+        self.enqueue_many(kind, [(key, payload)])
+
+    def enqueue_many(self, kind, jobs):
+        """Queue (key, payload) jobs; finished or failed jobs with the same key run again"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO jobs (kind, key, payload, max_attempts, available_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (kind, key) DO UPDATE SET payload = excluded.payload, state = 'pending', "
+                    "attempts = 0, available_at = excluded.available_at, last_error = NULL, "
+                    "updated_at = excluded.updated_at WHERE state IN ('done', 'failed')",
+                    [(kind, key, json.dumps(payload), self.max_attempts, now, now) for key, payload in jobs]
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker_id, lease_seconds=120):
+        """Lease the next runnable job to a worker, or return None.
+
+        Video jobs go first so profiles that are under way finish before new
+        ones start. Jobs whose lease has run out are taken over as if pending.
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self.conn.execute(
+                        "SELECT id, kind, key, payload, state, attempts, max_attempts FROM jobs "
+                        "WHERE (state = 'pending' AND available_at <= ?) OR (state = 'leased' AND lease_expires <= ?) "
+                        "ORDER BY kind != 'video', available_at, id LIMIT 1",
+                        (now, now)
+                    ).fetchone()
+                    if row is None:
+                        self.conn.execute("COMMIT")
+                        return None
+                    job_id, kind, key, payload, state, attempts, max_attempts = row
+                    if state == 'leased' and attempts >= max_attempts:
+                        # Its last attempt died with the worker
+                        self.conn.execute(
+                            "UPDATE jobs SET state = 'failed', lease_owner = NULL, last_error = ?, updated_at = ? "
+                            "WHERE id = ?", ("Worker lease expired", now, job_id)
+                        )
+                        continue
+                    self.conn.execute(
+                        "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                        "lease_expires = ?, updated_at = ? WHERE id = ?",
+                        (worker_id, now + lease_seconds, now, job_id)
+                    )
+                    self.conn.execute("COMMIT")
+                    return {'id': job_id, 'kind': kind, 'key': key, 'payload': json.loads(payload),
+                            'attempts': attempts + 1, 'max_attempts': max_attempts, 'worker_id': worker_id}
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, job, lease_seconds=120):
+        """Extend a job's lease; False if another worker has taken it over"""
+        return self._update_leased(job, "lease_expires = ?", (time.time() + lease_seconds,))
+
+    def complete(self, job):
+        return self._update_leased(job, "state = 'done', lease_owner = NULL, last_error = NULL", ())
+
+    def fail(self, job, error):
+        """Record a failed attempt and schedule a retry with backoff, or give up"""
+        # The job's own limit: it may have been queued under a different max_attempts
+        if job['attempts'] >= job['max_attempts']:
+            return self._update_leased(job, "state = 'failed', lease_owner = NULL, last_error = ?", (error,))
+        delay = min(self.backoff_base * 2 ** (job['attempts'] - 1), self.backoff_max) * random.uniform(0.8, 1.2)
+        return self._update_leased(job, "state = 'pending', lease_owner = NULL, available_at = ?, last_error = ?",
+                                   (time.time() + delay, error))
+
+    def release(self, job):
+        """Hand a job back untouched, e.g. when a worker is shutting down"""
+        return self._update_leased(job, "state = 'pending', lease_owner = NULL, attempts = attempts - 1", ())
+
+    def _update_leased(self, job, assignments, params):
+        with self._lock:
+            cursor = self.conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                params + (time.time(), job['id'], job['worker_id'])
+            )
+        return cursor.rowcount == 1
+
+    def has_work(self):
+        """True while any job is pending or leased (leased ones may still queue more)"""
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM jobs WHERE state IN ('pending', 'leased') LIMIT 1").fetchone()
+        return row is not None
+
+    def counts(self):
+        """{kind: {state: count}}"""
+        counts = {}
+        with self._lock:
+            for kind, state, count in self.conn.execute("SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state"):
+                counts.setdefault(kind, {})[state] = count
+        return counts
+
+    def jobs(self, kind=None, state=None):
+        query = "SELECT id, kind, key, payload, state, attempts, last_error FROM jobs WHERE 1 = 1"
+        params = []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if state:
+            query += " AND state = ?"
+            params.append(state)
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY id", params).fetchall()
+        return [{'id': job_id, 'kind': kind, 'key': key, 'payload': json.loads(payload), 'state': state,
+                 'attempts': attempts, 'last_error': last_error}
+                for job_id, kind, key, payload, state, attempts, last_error in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class JobWorker:
+    """Claims and runs jobs until stopped or, with idle_exit, until the queue is drained"""
+
+    def __init__(self, job_queue, analyzer, worker_id, fetch_mode='auto', headless=True, lease_seconds=120,
+                 poll_interval=2.0):
+        self.queue = job_queue
+        self.analyzer = analyzer
+        self.worker_id = worker_id
+        self.fetch_mode = fetch_mode
+        self.headless = headless
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.session = LazySession(analyzer.browser_sessions, headless)
+
+    def run(self, stop_event, idle_exit=False):
+        try:
+            while not stop_event.is_set():
+                job = self.queue.claim(self.worker_id, self.lease_seconds)
+                if job is None:
+                    if idle_exit and not self.queue.has_work():
+                        return
+                    stop_event.wait(self.poll_interval)
+                    continue
+                self.run_job(job, stop_event)
+        finally:
+            self.session.release()
+
+    def run_job(self, job, stop_event):
+        renewing = threading.Event()
+        def renew():
+            while not renewing.wait(self.lease_seconds / 3):
+                if not self.queue.heartbeat(job, self.lease_seconds):
+                    print(f"{self.worker_id}: lost the lease on {job['kind']} {job['key']}")
+                    return
+        threading.Thread(target=renew, daemon=True).start()
+        try:
+            if job['kind'] == 'profile':
+                finished = self.run_profile_job(job, stop_event)
+            else:
+                finished = self.run_video_job(job, stop_event)
+            if finished:
+                self.queue.complete(job)
+            else:
+                self.queue.release(job)
+        except KeyboardInterrupt:
+            self.queue.release(job)
+            raise
+        except Exception as e:
+            print(f"{self.worker_id}: {job['kind']} {job['key']} failed (attempt {job['attempts']}): {str(e)}")
+            self.queue.fail(job, str(e))
+        finally:
+            renewing.set()
+
+    def run_profile_job(self, job, stop_event):
+        """List a profile's videos and queue one job per video; False if stopped"""
+        username = job['key']
+        posts_to_analyze = job['payload'].get('posts', 20)
+        quiet = lambda kind, payload: None
+        links = list(self.analyzer.iter_video_links(username, posts_to_analyze, self.fetch_mode, self.session,
+                                                    quiet, stop_event))
+        if stop_event.is_set():
+            return False
+        self.queue.enqueue_many('video', [(url, {'username': username, 'position': position})
+                                          for position, url in enumerate(links)])
+        self.analyzer.post_cache.set_profile_order(username, links)
+        print(f"{self.worker_id}: queued {len(links)} videos for @{username}")
+        return True
+
+    def run_video_job(self, job, stop_event):
+        """Fetch one post into the shared cache and its history, unless a fresh copy is already there"""
+        video_url = job['key']
+        post_cache = self.analyzer.post_cache
+        cached = post_cache.get_many([video_url]).get(video_url)
+        if cached and post_cache.is_fresh(cached):
+            return True
+        try:
+            post_data = self.analyzer.fetch_post(self.session, video_url, self.fetch_mode, stop_event)
+        except PacingCancelled:
+            return False
+        username = job['payload']['username']
+        post_cache.put(username, post_data, job['payload']['position'])
+        self.analyzer.history.record(username, [post_data])
+        return True
+
+
+def worker_main(path, number, fetch_mode, headless, cache_hours, lease_seconds, lean=True, rate=3.0):
+    """Entry point of one worker process"""
+    offset = number * SESSIONS_PER_WORKER
+    driver_factory = lambda headless, index: setup_browser(headless, index + offset, lean=lean)
+    analyzer = ProfileAnalyzer(driver_factory, pacer=Pacer(rate=rate))
+    analyzer.post_cache.ttl_seconds = cache_hours * 3600
+    job_queue = JobQueue(path)
+    worker = JobWorker(job_queue, analyzer, f"worker-{number}@{os.getpid()}", fetch_mode, headless, lease_seconds)
+    try:
+        worker.run(threading.Event(), idle_exit=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analyzer.close()
+        job_queue.close()
+        pacing = analyzer.pacer.describe()
+        if pacing:
+            print(f"worker-{number} pacing: {pacing}")
+
+
+def run_workers(path, count, fetch_mode='auto', headless=True, cache_hours=6, lease_seconds=120, lean=True,
+                rate=3.0):
+    """Run count worker processes until the queue is drained"""
+    # Every worker hits the same host, so they split one request budget
+    processes = [multiprocessing.Process(target=worker_main,
+                                         args=(path, number, fetch_mode, headless, cache_hours, lease_seconds,
+                                               lean, rate / count),
+                                         name=f"tea-worker-{number}")
+                 for number in range(count)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Workers got the interrupt too and hand their jobs back
+        for process in processes:
+            process.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tea.jobs', description="Queue and run profile analysis jobs")
+    parser.add_argument('--db', default=DEFAULT_JOBS_PATH, help="job database (default: ~/.tea/jobs.sqlite3)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="queue one job per username in a file")
+    add.add_argument('usernames', help="file with one username per line")
+    add.add_argument('-n', '--posts', type=int, default=20, help="posts to analyse per profile (default: 20)")
+
+    work = commands.add_parser('work', help="run workers until the queue is drained")
+    work.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    work.add_argument('--fetch-mode', choices=FETCH_MODE_NAMES, default='auto')
+    work.add_argument('--show-browser', action='store_true', help="run Chrome with a window instead of headless")
+    work.add_argument('--full-pages', action='store_true', help="let Chrome load video, images and fonts")
+    work.add_argument('--cache-hours', type=float, default=6,
+                      help="skip posts fetched within this many hours (default: 6, 0 disables)")
+    work.add_argument('--rate', type=float, default=3.0,
+                      help="starting requests per second per host, shared by all workers (default: 3)")
+    work.add_argument('--lease', type=float, default=120, help="seconds before a silent worker's job is retaken")
+
+    commands.add_parser('status', help="show job counts and failures")
+
+    export = commands.add_parser('export', help="write the results of finished profiles")
+    export.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    export.add_argument('-f', '--format', choices=FORMATS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    job_queue = JobQueue(args.db)
+    try:
+        if args.command == 'add':
+            usernames = read_usernames(args.usernames)
+            job_queue.enqueue_many('profile', [(username, {'posts': args.posts}) for username in usernames])
+            print(f"Queued {len(usernames)} profiles")
+        elif args.command == 'work':
+            run_workers(args.db, max(1, args.workers), args.fetch_mode, not args.show_browser,
+                        args.cache_hours, args.lease, not args.full_pages, args.rate)
+            return 1 if job_queue.counts().get('profile', {}).get('failed') else 0
+        elif args.command == 'status':
+            for kind, states in sorted(job_queue.counts().items()):
+                print(f"{kind}: " + ", ".join(f"{count} {state}" for state, count in sorted(states.items())))
+            for job in job_queue.jobs(state='failed')[:20]:
+                print(f"  failed {job['kind']} {job['key']} after {job['attempts']} attempts: {job['last_error']}")
+        elif args.command == 'export':
+            writer, out = open_writer(args.output, 'posts', args.format)
+            post_cache = PostCache()
+            try:
+                for job in job_queue.jobs(kind='profile', state='done'):
+                    for post_data in post_cache.load_profile(job['key'], job['payload'].get('posts')):
+                        writer.write(job['key'], post_data)
+                writer.close()
+            finally:
+                post_cache.close()
+                if args.output != '-':
+                    out.close()
+    finally:
+        job_queue.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Batch count parsing, engagement rates and benchmark statistics.
+
+Counts are float64 numpy arrays in which NaN marks a value the page didn't
+show, so "missing" never gets confused with a real 0.
+"""
+import re
+
+import numpy as np
+
+SUFFIXES = {'k': 1e3, 'm': 1e6, 'b': 1e9}
+NUMBER_RE = re.compile(r'^(\d+(?:\.\d+)?)([kmb]?)$')
+
+# Views aren't always shown, so they are estimated from likes when missing
+VIEWS_PER_LIKE = 1.5
+
+
+def _normalize(text):
+    text = text.strip().lower().replace(' ', '').replace(' ', '')
+    suffix = text[-1:] if text[-1:] in SUFFIXES else ''
+    number = text[:-1] if suffix else text
+    # "1,2K" is a decimal comma, "12,345" a thousands separator
+    if suffix and ',' in number and '.' not in number and len(number.rsplit(',', 1)[1]) <= 2:
+        number = number.replace(',', '.')
+    return number.replace(',', '') + suffix
+
+
+def parse_count(value):
+    """Parse one displayed count ("1.2K", "12,345", "3M", "1.2B") to a float; NaN if missing or unparseable"""
+    if value is None:
+        return np.nan
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    match = NUMBER_RE.match(_normalize(str(value)))
+    if not match:
+        return np.nan
+    number, suffix = match.groups()
+    return float(number) * SUFFIXES.get(suffix, 1)
+
+
+def parse_counts(values):
+    """Parse a batch of displayed counts into a float64 array (NaN = missing).
+
+    Each value comes out the same as parse_count would make it, whatever
+    else is in the batch.
+    """
+    values = list(values)
+    if not values:
+        return np.empty(0, dtype=np.float64)
+
+    # Plain numbers (hydration JSON, stored ints) convert in one go; strings
+    # never do, since float() takes forms like "1e3" and "inf" that parse_count doesn't
+    is_number = [isinstance(v, (int, float, np.number)) for v in values]
+    if all(is_number[i] or values[i] is None for i in range(len(values))):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    text = np.char.lower(np.char.strip(np.array(['' if v is None or number else str(v)
+                                                 for v, number in zip(values, is_number)])))
+    text = np.char.replace(np.char.replace(text, ' ', ''), ' ', '')
+    multiplier = np.ones(len(values))
+    for suffix, factor in SUFFIXES.items():
+        multiplier[np.char.endswith(text, suffix)] = factor
+    # Drop exactly one suffix character ("1kk" stays malformed); numpy strings
+    # end at trailing NULs, so zeroing the last code point cuts it off
+    codes = text.view(np.uint32).reshape(len(text), -1)
+    suffixed = np.flatnonzero(multiplier > 1)
+    codes[suffixed, np.char.str_len(text)[suffixed] - 1] = 0
+
+    # Thousands separators are the common case; anything else goes the slow way
+    plain = np.char.replace(text, ',', '')
+    digits = np.char.replace(plain, '.', '', count=1)
+    # isdigit() also takes non-ASCII digits, and "1." or ".5" aren't counts
+    numeric = (np.char.isdigit(digits) & (codes < 128).all(axis=1)
+               & ~np.char.startswith(plain, '.') & ~np.char.endswith(plain, '.'))
+    # A comma next to a suffix may be a decimal comma ("1,2K"); parse_count decides
+    numeric &= ~((multiplier > 1) & (np.char.count(text, ',') > 0))
+    result = np.full(len(values), np.nan)
+    result[numeric] = plain[numeric].astype(np.float64) * multiplier[numeric]
+    for i in np.flatnonzero(~numeric):
+        if values[i] is not None:
+            result[i] = parse_count(values[i])
+    return result
+
+
+def estimate_views(likes, views):
+    """Fill missing view counts with the likes-based estimate"""
+    likes = np.asarray(likes, dtype=np.float64)
+    views = np.asarray(views, dtype=np.float64)
+    return np.where(np.isnan(views), np.nan_to_num(likes) * VIEWS_PER_LIKE, views)
+
+
+def engagement_rates(likes, comments, shares, views):
+    """ER % = (likes + comments + shares) / views; 0 where there are no views"""
+    likes, comments, shares = (np.nan_to_num(np.asarray(a, dtype=np.float64)) for a in (likes, comments, shares))
+    views = estimate_views(likes, views)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = (likes + comments + shares) / views * 100
+    return np.where(views > 0, rates, 0.0)
+
+
+def moving_average(values, window=5):
+    """Trailing mean over the last `window` posts (shorter at the start)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return values
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, values.size + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumsum[ends] - cumsum[starts]) / (ends - starts)
+
+
+def outliers(values, k=1.5):
+    """Indexes of values outside the Tukey fences (k * IQR beyond the quartiles)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 4:
+        return np.empty(0, dtype=np.intp)
+    q1, q3 = np.nanpercentile(values, [25, 75])
+    spread = k * (q3 - q1)
+    return np.flatnonzero((values < q1 - spread) | (values > q3 + spread))
+
+
+def profile_stats(er_rates, desired_rate, window=5):
+    """Benchmark statistics for a whole profile's ER values in one pass"""
+    er = np.asarray(er_rates, dtype=np.float64)
+    if er.size == 0:
+        return {'count': 0}
+    p10, p25, p50, p75, p90 = np.percentile(er, [10, 25, 50, 75, 90])
+    return {
+        'count': int(er.size),
+        'mean': float(er.mean()),
+        'median': float(p50),
+        'percentiles': {10: float(p10), 25: float(p25), 50: float(p50), 75: float(p75), 90: float(p90)},
+        'at_or_above': int(np.count_nonzero(er >= desired_rate)),
+        'share_at_or_above': float(np.count_nonzero(er >= desired_rate) / er.size),
+        'moving_average': moving_average(er, window),
+        'outliers': outliers(er),
+    }
+
+
+def score_posts(posts_data, desired_rate, window=5):
+    """profile_stats over a PostStore or a list of post_data dicts"""
+    if hasattr(posts_data, 'column'):
+        return profile_stats(posts_data.column('er_rate'), desired_rate, window)
+    return profile_stats([post_data['er_rate'] for post_data in posts_data], desired_rate, window)
@@ -0,0 +1,172 @@
+"""One pacing budget per host, shared by every fetch path.
+
+Each host gets a token bucket. A request takes `cost` tokens (a rendered
+page costs more than a plain HTTP fetch), waiting only as long as the
+bucket needs to refill. The refill rate adapts AIMD-style: every healthy
+response nudges it up towards max_rate, a slow one trims it, and an error
+or throttling response halves it and pauses the host for a short,
+growing cooldown.
+
+    with pacer.request(url, cancel_event) as request:
+        response = http.request('GET', url)
+        if response.status == 429:
+            request.throttled()
+"""
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from tea.telemetry import METRICS
+
+# Token cost of loading a page in Chrome vs. one HTTP request
+BROWSER_PAGE_COST = 3
+
+
+class PacingCancelled(Exception):
+    """Raised by Pacer.request when the cancel event fires while waiting"""
+
+
+class _HostBudget:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.resume_at = 0.0  # cooldown after errors
+        self.consecutive_errors = 0
+        self.requests = 0
+        self.errors = 0
+        self.slow = 0
+        self.waited = 0.0
+        self.latency_total = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _Request:
+    def __init__(self):
+        self.healthy = True
+
+    def throttled(self):
+        """Mark the response as the host pushing back (429, 5xx, captcha...)"""
+        self.healthy = False
+
+
+class Pacer:
+    """Adaptive per-host request budget; safe to share between threads"""
+
+    def __init__(self, rate=3.0, burst=5.0, min_rate=0.2, max_rate=None, increase=0.1, slow_after=5.0,
+                 max_cooldown=60.0, verbose=True):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 2
+        self.increase = increase
+        self.slow_after = slow_after
+        self.max_cooldown = max_cooldown
+        self.verbose = verbose
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, host):
+        budget = self._hosts.get(host)
+        if budget is None:
+            budget = self._hosts[host] = _HostBudget(self.rate, self.burst)
+        return budget
+
+    def acquire(self, url, cost=1, cancel_event=None):
+        """Wait for cost tokens from the URL's host; False if cancelled first"""
+        host = urlsplit(url).netloc or url
+        cost = min(cost, self.burst)
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                budget = self._budget(host)
+                now = time.monotonic()
+                budget.refill(now)
+                if now >= budget.resume_at and budget.tokens >= cost:
+                    budget.tokens -= cost
+                    budget.waited += now - started
+                    break
+                delay = max(budget.resume_at - now, (cost - budget.tokens) / budget.rate)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        METRICS.observe('pacer.wait', now - started)
+        return True
+
+    @contextmanager
+    def request(self, url, cancel_event=None, cost=1):
+        """Pace a request and learn from how it went; see the module docstring"""
+        if not self.acquire(url, cost, cancel_event):
+            raise PacingCancelled(url)
+        request = _Request()
+        started = time.monotonic()
+        try:
+            yield request
+        except Exception:
+            self.record(url, time.monotonic() - started, ok=False)
+            raise
+        self.record(url, time.monotonic() - started, ok=request.healthy)
+
+    def record(self, url, latency, ok=True):
+        """Adapt the host's rate to one response"""
+        host = urlsplit(url).netloc or url
+        with self._lock:
+            budget = self._budget(host)
+            budget.requests += 1
+            budget.latency_total += latency
+            old_rate = budget.rate
+            if not ok:
+                budget.errors += 1
+                budget.consecutive_errors += 1
+                budget.rate = max(self.min_rate, budget.rate / 2)
+                cooldown = min(self.max_cooldown, 2 ** budget.consecutive_errors)
+                budget.resume_at = max(budget.resume_at, time.monotonic() + cooldown)
+                budget.tokens = min(budget.tokens, 0)
+            elif latency > self.slow_after:
+                budget.slow += 1
+                budget.consecutive_errors = 0
+                budget.rate = max(self.min_rate, budget.rate * 0.8)
+            else:
+                budget.consecutive_errors = 0
+                budget.rate = min(self.max_rate, budget.rate + self.increase)
+            backing_off = budget.rate < old_rate
+        if self.verbose and backing_off:
+            reason = "an error" if not ok else f"a slow response ({latency:.1f}s)"
+            print(f"Pacing {host}: slowing to {budget.rate:.2f} requests/s after {reason}")
+
+    def snapshot(self):
+        """Per-host state and counters, for status displays and metrics"""
+        with self._lock:
+            return {
+                host: {
+                    'rate': budget.rate,
+                    'tokens': budget.tokens,
+                    'requests': budget.requests,
+                    'errors': budget.errors,
+                    'slow': budget.slow,
+                    'waited_seconds': budget.waited,
+                    'mean_latency_ms': budget.latency_total / budget.requests * 1000 if budget.requests else 0.0,
+                    'cooling_down': budget.resume_at > time.monotonic(),
+                }
+                for host, budget in self._hosts.items()
+            }
+
+    def gauges(self):
+        """Per-host (name, labels, value) gauges, for tea.telemetry collectors"""
+        for host, stats in self.snapshot().items():
+            for key in ('rate', 'requests', 'errors', 'slow', 'waited_seconds'):
+                yield f"pacer.{key}", {'host': host}, stats[key]
+
+    def describe(self):
+        return "; ".join(
+            f"{host}: {stats['requests']} requests, {stats['errors']} errors, now {stats['rate']:.2f}/s, "
+            f"{stats['waited_seconds']:.1f}s waiting"
+            for host, stats in self.snapshot().items()
+        )
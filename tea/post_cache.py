@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".tea", "posts.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    url TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_by_profile ON posts (username, position);
+"""
+
+
+class PostCache:
+    """On-disk store of the last fetched metrics for each video URL.
+
+    Entries older than ttl_seconds are stale and get re-fetched; fresh ones
+    are served straight from disk. Safe to share between the GUI thread and
+    the scrape workers.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=6 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def is_fresh(self, post_data, now=None):
+        now = time.time() if now is None else now
+        return now - post_data.get('fetched_at', 0) < self.ttl_seconds
+
+    def get_many(self, urls):
+        """Cached post_data for each known URL, keyed by URL"""
+        found = {}
+        urls = list(urls)
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT url, fetched_at, data FROM posts WHERE url IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for url, fetched_at, data in rows:
+                    found[url] = self._decode(fetched_at, data)
+        return found
+
+    def load_profile(self, username, limit=None):
+        """A profile's cached posts in their last known grid order"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT fetched_at, data FROM posts WHERE username = ? ORDER BY position LIMIT ?",
+                (username.lower(), -1 if limit is None else limit)
+            ).fetchall()
+        return [self._decode(fetched_at, data) for fetched_at, data in rows]
+
+    def profiles(self):
+        """Usernames with cached posts"""
+        with self._lock:
+            return [username for (username,) in
+                    self.conn.execute("SELECT DISTINCT username FROM posts ORDER BY username")]
+
+    def put(self, username, post_data, position=0):
+        """Store a freshly fetched post"""
+        data = {k: v for k, v in post_data.items() if k not in ('comments_data', 'fetched_at')}
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO posts (url, username, position, fetched_at, data) VALUES (?, ?, ?, ?, ?)",
+                (post_data['url'], username.lower(), position,
+                 post_data.get('fetched_at', time.time()), json.dumps(data))
+            )
+
+    def set_profile_order(self, username, urls):
+        """Record the current grid position of each of a profile's cached posts"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE posts SET position = ? WHERE url = ? AND username = ?",
+                [(position, url, username.lower()) for position, url in enumerate(urls)]
+            )
+
+    def _decode(self, fetched_at, data):
+        post_data = json.loads(data)
+        post_data['fetched_at'] = fetched_at
+        post_data['comments_data'] = []
+        return post_data
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,319 @@
+"""Columnar storage for analysed posts.
+
+Counts live in int64 numpy columns, ER and fetch times in float64 columns,
+and URLs are split into an interned prefix ("https://www.tiktok.com/@user/video/")
+plus an int64 video id, so a post costs a few dozen bytes instead of a dict.
+"""
+import re
+import sys
+
+import numpy as np
+
+COUNT_COLUMNS = ('views', 'likes', 'comments', 'saves', 'shares')
+FLOAT_COLUMNS = ('er_rate', 'fetched_at')
+# Filled in later by comment analytics: NaN until scored, and kept when a
+# refreshed post comes in without them
+ANALYTICS_COLUMNS = ('sentiment',)
+# Fields that can be reported missing, one bit each in the missing mask
+MISSING_FIELDS = COUNT_COLUMNS + ('caption',)
+
+# Ids that fit an int64 and print back the same (no leading zeros); anything
+# else is kept as a whole URL
+VIDEO_URL_RE = re.compile(r'^(.*/video/)([1-9]\d{0,17}|[1-8]\d{18})$')
+
+
+class _IdIndex:
+    """Open-addressing int64 -> row hash table kept in numpy arrays.
+
+    A dict keyed by video id would cost ~100 bytes per post in boxed ints
+    alone; this costs 24 bytes at the worst load factor.
+    """
+
+    def __init__(self, capacity=128):
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.rows = np.full(capacity, -1, dtype=np.int32)
+        self.mask = capacity - 1
+        self.count = 0
+
+    def _slot(self, key):
+        # Fibonacci hashing spreads sequential ids across the table
+        slot = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32 & self.mask
+        while self.rows[slot] != -1 and self.keys[slot] != key:
+            slot = (slot + 1) & self.mask
+        return slot
+
+    def _home_slots(self, keys):
+        # _slot()'s hash for a whole array; uint64 arithmetic wraps like the & above
+        hashed = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        return ((hashed >> np.uint64(32)) & np.uint64(self.mask)).astype(np.int64)
+
+    def get(self, key):
+        row = self.rows[self._slot(key)]
+        return None if row == -1 else int(row)
+
+    def put(self, key, row):
+        if (self.count + 1) * 2 > len(self.rows):
+            self._grow()
+        slot = self._slot(key)
+        if self.rows[slot] == -1:
+            self.count += 1
+        self.keys[slot] = key
+        self.rows[slot] = row
+
+    def get_many(self, keys):
+        """get() for an array of keys, probing them all in lockstep; -1 where missing"""
+        keys = np.asarray(keys, dtype=np.int64)
+        found = np.full(len(keys), -1, dtype=np.int32)
+        pending = np.arange(len(keys))
+        slots = self._home_slots(keys)
+        while len(pending):
+            rows = self.rows[slots]
+            hit = (rows != -1) & (self.keys[slots] == keys[pending])
+            found[pending[hit]] = rows[hit]
+            probing = (rows != -1) & ~hit
+            pending, slots = pending[probing], (slots[probing] + 1) & self.mask
+        return found
+
+    def put_many(self, keys, rows):
+        """put() for arrays of distinct keys that aren't in the table yet"""
+        keys = np.asarray(keys, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int32)
+        while (self.count + len(keys)) * 2 > len(self.rows):
+            self._grow()
+        pending = np.arange(len(keys))
+        slots = self._home_slots(keys)
+        while len(pending):
+            free = np.flatnonzero(self.rows[slots] == -1)
+            # Keys landing on the same free slot: the first takes it, the rest probe on
+            _, first = np.unique(slots[free], return_index=True)
+            placed = free[first]
+            self.keys[slots[placed]] = keys[pending[placed]]
+            self.rows[slots[placed]] = rows[pending[placed]]
+            left = np.ones(len(pending), dtype=bool)
+            left[placed] = False
+            pending, slots = pending[left], (slots[left] + 1) & self.mask
+        self.count += len(keys)
+
+    def _grow(self):
+        keys, rows = self.keys, self.rows
+        self.__init__(len(rows) * 2)
+        used = rows != -1
+        self.put_many(keys[used], rows[used])
+
+
+class PostStore:
+    """Append-friendly, URL-indexed table of posts with typed columns.
+
+    Behaves like the old list of post_data dicts where the GUI needs it
+    (len, iteration, store[row]) while column() hands out zero-copy,
+    read-only numpy views for the table and the metrics code.
+    """
+
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._capacity = max(1, capacity)
+        self._columns = {name: np.zeros(self._capacity, dtype=np.int64) for name in COUNT_COLUMNS}
+        self._columns.update({name: np.zeros(self._capacity, dtype=np.float64)
+                              for name in FLOAT_COLUMNS + ANALYTICS_COLUMNS})
+        self._columns['video_id'] = np.zeros(self._capacity, dtype=np.int64)
+        self._columns['missing'] = np.zeros(self._capacity, dtype=np.uint8)
+        self._prefixes = []  # interned URL prefixes, shared by every post of a profile
+        self._prefix_ids = {}
+        self._prefix_of = np.zeros(self._capacity, dtype=np.int32)
+        self._captions = []
+        self._odd_urls = {}  # row -> URL that doesn't fit prefix + id
+        self._odd_index = {}  # URL -> row for those
+        self._comments = {}  # row -> comments_data, only for posts that have any
+        self._index = _IdIndex()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, url):
+        return self.row_of(url) is not None
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield self[row]
+
+    def __getitem__(self, row):
+        """The post at a row as a post_data dict"""
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError(row)
+        post_data = {'url': self.url(row), 'caption': self._captions[row]}
+        for name in COUNT_COLUMNS:
+            post_data[name] = int(self._columns[name][row])
+        for name in FLOAT_COLUMNS + ANALYTICS_COLUMNS:
+            post_data[name] = float(self._columns[name][row])
+        mask = int(self._columns['missing'][row])
+        post_data['missing_fields'] = [field for bit, field in enumerate(MISSING_FIELDS) if mask & (1 << bit)]
+        post_data['comments_data'] = self._comments.get(row, [])
+        return post_data
+
+    def row_of(self, url):
+        """Row holding a URL, or None"""
+        match = VIDEO_URL_RE.match(url)
+        if not match:
+            return self._odd_index.get(url)
+        row = self._index.get(int(match.group(2)))
+        if row is None:
+            return None
+        # Same id under another prefix (e.g. a fixture server) is a different
+        # post, filed by _set_url under its whole URL
+        if self._prefixes[self._prefix_of[row]] != match.group(1):
+            return self._odd_index.get(url)
+        return row
+
+    def get(self, url, default=None):
+        row = self.row_of(url)
+        return default if row is None else self[row]
+
+    def url(self, row):
+        if row in self._odd_urls:
+            return self._odd_urls[row]
+        return f"{self._prefixes[self._prefix_of[row]]}{self._columns['video_id'][row]}"
+
+    def upsert(self, post_data):
+        """Store a post, replacing any row with the same URL; returns (row, is_new)"""
+        url = post_data['url']
+        row = self.row_of(url)
+        is_new = row is None
+        if is_new:
+            row = self._size
+            if row == self._capacity:
+                self._grow()
+            self._size += 1
+            self._captions.append('')
+            self._set_url(row, url)
+
+        self._captions[row] = sys.intern(post_data.get('caption') or '')
+        for name in COUNT_COLUMNS:
+            self._columns[name][row] = post_data.get(name, 0)
+        for name in FLOAT_COLUMNS:
+            self._columns[name][row] = post_data.get(name, 0.0)
+        for name in ANALYTICS_COLUMNS:
+            if post_data.get(name) is not None:
+                self._columns[name][row] = post_data[name]
+            elif is_new:
+                self._columns[name][row] = np.nan
+        mask = 0
+        for bit, field in enumerate(MISSING_FIELDS):
+            if field in post_data.get('missing_fields', ()):
+                mask |= 1 << bit
+        self._columns['missing'][row] = mask
+        if post_data.get('comments_data'):
+            self._comments[row] = post_data['comments_data']
+        else:
+            self._comments.pop(row, None)
+        return row, is_new
+
+    def append(self, post_data):
+        return self.upsert(post_data)[0]
+
+    def extend(self, posts):
+        for post_data in posts:
+            self.upsert(post_data)
+
+    def extend_columns(self, urls, captions, columns, missing=None):
+        """extend() from columns rather than dicts, for loading saved runs.
+
+        columns maps names from COUNT_COLUMNS, FLOAT_COLUMNS and
+        ANALYTICS_COLUMNS to arrays (absent ones are zero, or NaN for
+        analytics); missing holds each post's MISSING_FIELDS bitmask. New
+        posts are stored with array operations; URLs the store already has,
+        or that repeat within the batch, go through upsert() one at a time.
+        """
+        count = len(urls)
+        matches = [VIDEO_URL_RE.match(url) for url in urls]
+        video_ids = np.array([int(match.group(2)) if match else -1 for match in matches], dtype=np.int64)
+        known = self._index.get_many(video_ids)
+        _, first = np.unique(video_ids, return_index=True)
+        unique = np.zeros(count, dtype=bool)
+        unique[first] = True
+        bulk = np.flatnonzero((video_ids != -1) & (known == -1) & unique)
+
+        start = self._size
+        while self._capacity < start + len(bulk):
+            self._grow()
+        rows = np.arange(start, start + len(bulk))
+        for name in COUNT_COLUMNS + FLOAT_COLUMNS + ANALYTICS_COLUMNS:
+            if name in columns:
+                self._columns[name][rows] = np.asarray(columns[name])[bulk]
+            else:
+                self._columns[name][rows] = np.nan if name in ANALYTICS_COLUMNS else 0
+        self._columns['missing'][rows] = 0 if missing is None else np.asarray(missing)[bulk]
+        self._columns['video_id'][rows] = video_ids[bulk]
+        prefix_of = []
+        for index in bulk.tolist():
+            prefix = matches[index].group(1)
+            if prefix not in self._prefix_ids:
+                self._prefix_ids[prefix] = len(self._prefixes)
+                self._prefixes.append(sys.intern(prefix))
+            prefix_of.append(self._prefix_ids[prefix])
+        self._prefix_of[rows] = prefix_of
+        self._captions.extend(sys.intern(captions[index] or '') for index in bulk.tolist())
+        self._index.put_many(video_ids[bulk], rows)
+        self._size += len(bulk)
+
+        # The rest one by one, in their original order
+        rest = np.ones(count, dtype=bool)
+        rest[bulk] = False
+        for index in np.flatnonzero(rest).tolist():
+            post_data = {'url': urls[index], 'caption': captions[index]}
+            for name, values in columns.items():
+                post_data[name] = values[index].item() if hasattr(values[index], 'item') else values[index]
+            if missing is not None:
+                post_data['missing_fields'] = [field for bit, field in enumerate(MISSING_FIELDS)
+                                               if int(missing[index]) & (1 << bit)]
+            self.upsert(post_data)
+
+    def column(self, name):
+        """Zero-copy read-only view of a numeric column ('views', 'er_rate', ...)"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def captions(self):
+        return self._captions
+
+    def urls(self):
+        return [self.url(row) for row in range(self._size)]
+
+    def clear(self):
+        self.__init__(self._capacity)
+
+    def nbytes(self):
+        """Approximate memory used by the store, strings included"""
+        total = sum(column.nbytes for column in self._columns.values()) + self._prefix_of.nbytes
+        total += self._index.keys.nbytes + self._index.rows.nbytes
+        total += sum(sys.getsizeof(prefix) for prefix in self._prefixes)
+        total += sum(sys.getsizeof(caption) for caption in set(self._captions))
+        total += sys.getsizeof(self._captions)
+        return total
+
+    def _set_url(self, row, url):
+        match = VIDEO_URL_RE.match(url)
+        video_id = int(match.group(2)) if match else None
+        if not match or self._index.get(video_id) is not None:
+            self._odd_urls[row] = url
+            self._odd_index[url] = row
+            return
+        prefix = match.group(1)
+        if prefix not in self._prefix_ids:
+            self._prefix_ids[prefix] = len(self._prefixes)
+            self._prefixes.append(sys.intern(prefix))
+        self._prefix_of[row] = self._prefix_ids[prefix]
+        self._columns['video_id'][row] = video_id
+        self._index.put(video_id, row)
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.zeros(self._capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        grown = np.zeros(self._capacity, dtype=np.int32)
+        grown[:self._size] = self._prefix_of[:self._size]
+        self._prefix_of = grown
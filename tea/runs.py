@@ -0,0 +1,206 @@
+"""Checkpointed analysis runs that can be resumed after a crash.
+
+Each run gets an ID and a directory under ~/.tea/runs/<run_id>:
+
+    run.json        username, settings and status (running/complete/partial/cancelled/failed)
+    links.txt       video links in grid order, appended as the crawl finds them
+    posts.jsonl     completed posts with their grid position
+    failures.jsonl  posts that errored, with the error
+
+The .txt/.jsonl files are append-only and written as results arrive, so a
+run that dies at post 180 of 200 resumes with the 180 already done.
+
+    python -m tea.runs list
+    python -m tea.runs report <run_id>
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+DEFAULT_RUNS_DIR = os.path.join(os.path.expanduser("~"), ".tea", "runs")
+
+FINISHED = 'complete'
+
+
+class RunCheckpoint:
+    """On-disk progress of one analysis run"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.run_id = os.path.basename(directory)
+        self._lock = threading.Lock()
+        with open(self._path('run.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.links = [line.strip() for line in self._lines('links.txt') if line.strip()]
+        self.posts = {}
+        for record in self._records('posts.jsonl'):
+            self.posts[record['position']] = record['post']
+        self.failures = {}
+        for record in self._records('failures.jsonl'):
+            self.failures[record['position']] = record
+        # A post that failed and then succeeded on resume isn't a failure any more
+        for position in self.posts:
+            self.failures.pop(position, None)
+
+    @classmethod
+    def create(cls, username, posts_to_analyze, fetch_mode='auto', root=DEFAULT_RUNS_DIR):
+        safe_name = re.sub(r'[^\w.-]', '_', username)
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}"
+        directory = os.path.join(root, run_id)
+        suffix = 1
+        while os.path.exists(directory):
+            suffix += 1
+            directory = os.path.join(root, f"{run_id}-{suffix}")
+        os.makedirs(directory)
+        now = time.time()
+        meta = {'username': username, 'posts_to_analyze': posts_to_analyze, 'fetch_mode': fetch_mode,
+                'status': 'running', 'crawl_complete': False, 'error': None, 'started_at': now, 'updated_at': now}
+        with open(os.path.join(directory, 'run.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return cls(directory)
+
+    @classmethod
+    def open(cls, run_id, root=DEFAULT_RUNS_DIR):
+        return cls(os.path.join(root, run_id))
+
+    @property
+    def username(self):
+        return self.meta['username']
+
+    @property
+    def finished(self):
+        return self.meta['status'] == FINISHED
+
+    def add_link(self, video_url):
+        with self._lock:
+            self.links.append(video_url)
+            self._append('links.txt', video_url + '\n')
+
+    def add_post(self, position, post_data):
+        record = {'position': position, 'post': {k: v for k, v in post_data.items() if k != 'comments_data'}}
+        with self._lock:
+            self.posts[position] = record['post']
+            self.failures.pop(position, None)
+            self._append('posts.jsonl', json.dumps(record) + '\n')
+
+    def add_failure(self, position, video_url, error):
+        record = {'position': position, 'url': video_url, 'error': str(error), 'at': time.time()}
+        with self._lock:
+            self.failures[position] = record
+            self._append('failures.jsonl', json.dumps(record) + '\n')
+
+    def mark_running(self):
+        self._update(status='running', error=None)
+
+    def mark_crawled(self):
+        self._update(crawl_complete=True)
+
+    def finish(self, status, error=None):
+        self._update(status=status, error=error)
+
+    def completed_posts(self):
+        """Posts done so far, in grid order"""
+        return [self.posts[position] for position in sorted(self.posts)]
+
+    def report(self):
+        """Plain-text summary of the run and every post that failed"""
+        lines = [f"Run {self.run_id}: @{self.username}, {self.meta['status']}",
+                 f"{len(self.posts)} of {len(self.links)} posts analyzed, {len(self.failures)} failed"]
+        if self.meta.get('error'):
+            lines.append(f"Run error: {self.meta['error']}")
+        for position in sorted(self.failures):
+            failure = self.failures[position]
+            lines.append(f"  #{position + 1} {failure['url']}: {failure['error']}")
+        return "\n".join(lines)
+
+    def _update(self, **changes):
+        with self._lock:
+            self.meta.update(changes, updated_at=time.time())
+            tmp_path = self._path('run.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.meta, f)
+            os.replace(tmp_path, self._path('run.json'))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _append(self, name, text):
+        with open(self._path(name), 'a', encoding='utf-8') as f:
+            f.write(text)
+
+    def _lines(self, name):
+        try:
+            with open(self._path(name), 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return []
+        # A crash mid-write leaves a partial last line; it gets redone on resume
+        if lines and not lines[-1].endswith('\n'):
+            lines.pop()
+        return lines
+
+    def _records(self, name):
+        for line in self._lines(name):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def list_runs(root=DEFAULT_RUNS_DIR, username=None):
+    """Every run, newest first, optionally only one profile's"""
+    try:
+        names = sorted(os.listdir(root), reverse=True)
+    except OSError:
+        return []
+    runs = []
+    for name in names:
+        directory = os.path.join(root, name)
+        try:
+            if username is not None:
+                # Check the small run.json before loading a run's posts
+                with open(os.path.join(directory, 'run.json'), 'r', encoding='utf-8') as f:
+                    if json.load(f)['username'].lower() != username.lower():
+                        continue
+            runs.append(RunCheckpoint(directory))
+        except (OSError, ValueError, KeyError):
+            continue
+    return runs
+
+
+def latest_unfinished_run(username, root=DEFAULT_RUNS_DIR):
+    """The profile's most recent run if it never finished, else None"""
+    runs = list_runs(root, username)
+    if runs and not runs[0].finished:
+        return runs[0]
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tea.runs', description="Inspect checkpointed analysis runs")
+    parser.add_argument('--dir', default=DEFAULT_RUNS_DIR, help="runs directory (default: ~/.tea/runs)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="list runs, newest first")
+    report = commands.add_parser('report', help="show a run's failures")
+    report.add_argument('run_id')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for run in list_runs(args.dir):
+            print(f"{run.run_id}  {run.meta['status']:<9}  {len(run.posts)}/{len(run.links)} posts  "
+                  f"{len(run.failures)} failed")
+    else:
+        try:
+            print(RunCheckpoint.open(args.run_id, args.dir).report())
+        except OSError:
+            print(f"No run {args.run_id} in {args.dir}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Timers, counters and latency histograms for each phase of a scrape.
+
+Everything records into one process-wide registry, METRICS:
+
+    with METRICS.timer('post.navigate'):
+        driver.get(video_url)
+    METRICS.count('cache.hits')
+
+Timers keep a histogram of seconds (count, sum, min, max and buckets, so
+p50/p99 can be estimated); counters only count. Gauges that belong to some
+other object, like the pacer's per-host rates, are read at export time
+from collectors registered with add_collector(). The registry exports as
+JSON, as Prometheus text exposition format, or as a plain-text report.
+
+profiled() wraps a run in cProfile and dumps the stats to a .prof file.
+"""
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed durations"""
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, in_bucket in enumerate(self.buckets):
+            if in_bucket and seen + in_bucket >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                # The observed extremes are tighter than the bucket edges
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min or 0.0,
+            'max': self.max or 0.0,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(bound) for bound in self.bounds] + ['+Inf'], self.buckets)),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, timers and gauge collectors"""
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Time the block into the name histogram, failures included"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def add_collector(self, collector):
+        """Register collector() -> iterable of (name, labels, value) gauges read at export time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Plain-dict copy of everything recorded so far"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: histogram.as_dict() for name, histogram in self._histograms.items()}
+            collectors = list(self._collectors)
+        gauges = []
+        for collector in collectors:
+            try:
+                gauges.extend({'name': name, 'labels': labels, 'value': value}
+                              for name, labels, value in collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+        return {'started_at': self.started_at, 'uptime_seconds': time.time() - self.started_at,
+                'counters': counters, 'timers': histograms, 'gauges': gauges}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='tea'):
+        """Prometheus text exposition format; timers become *_seconds histograms"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = _metric_name(prefix, name) + '_total'
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, stats in sorted(snapshot['timers'].items()):
+            metric = _metric_name(prefix, name) + '_seconds'
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, in_bucket in stats['buckets'].items():
+                cumulative += in_bucket
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{metric}_sum {stats['sum']!r}", f"{metric}_count {stats['count']}"]
+        typed = set()
+        for gauge in sorted(snapshot['gauges'], key=lambda gauge: gauge['name']):
+            metric = _metric_name(prefix, gauge['name'])
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            labels = ",".join(f'{key}="{_escape_label(value)}"' for key, value in sorted(gauge['labels'].items()))
+            lines.append(f"{metric}{{{labels}}} {float(gauge['value'])!r}" if labels
+                         else f"{metric} {float(gauge['value'])!r}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Human-readable summary for the debug panel and the CLI"""
+        snapshot = self.snapshot()
+        lines = [f"{'timer':<28}{'count':>8}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, stats in sorted(snapshot['timers'].items()):
+            lines.append(f"{name:<28}{stats['count']:>8}{stats['sum']:>10.2f}{stats['mean'] * 1000:>10.1f}"
+                         f"{stats['p50'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+        if snapshot['counters']:
+            lines += ["", f"{'counter':<28}{'value':>8}"]
+            lines += [f"{name:<28}{value:>8}" for name, value in sorted(snapshot['counters'].items())]
+        if snapshot['gauges']:
+            lines += ["", "gauges"]
+            for gauge in snapshot['gauges']:
+                labels = " ".join(f"{key}={value}" for key, value in sorted(gauge['labels'].items()))
+                lines.append(f"  {gauge['name']} {labels}: {gauge['value']:g}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Export to path: Prometheus text for .prom/.txt, JSON otherwise"""
+        text = self.to_prometheus() if path.lower().endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def _metric_name(prefix, name):
+    return f"{prefix}_" + "".join(c if c.isalnum() else '_' for c in name)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def profiled(path, top=25):
+    """cProfile the block and dump its stats to path (view with pstats or snakeviz).
+
+    Before Python 3.12 cProfile only sees the thread the block runs on, so
+    work done on the fetch pool's threads shows up as time spent waiting.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        if top:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+            print(out.getvalue())
@@ -0,0 +1,371 @@
+"""Watch mode: keep many profiles' posts up to date with few requests.
+
+    python -m tea.watch usernames.txt --budget 600 --fetch-mode http
+    python -m tea.watch usernames.txt -o changes.jsonl --min-interval 10
+
+Instead of re-scraping every profile on a timer, each post is re-fetched on
+its own schedule. A post whose counts moved is polled again sooner (aiming
+for about TARGET_CHANGE growth between polls) and one that didn't move is
+left for twice as long, within --min-interval and --max-interval. Fresh
+posts that are still climbing get watched closely, and old ones that have
+settled cost almost nothing. Profiles are re-listed every
+--profile-interval to pick up new posts.
+
+Everything due sits on one min-heap keyed by due time. A global budget of
+--budget requests an hour caps the total; when it runs short, the most
+overdue work goes first. Changed posts go to the post cache, the
+engagement history (see tea.history) and the output. Unchanged ones are
+counted and only refresh the cache's fetch time. The schedule is saved to
+~/.tea/watch.json, so a restarted watcher carries on where it stopped.
+"""
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from tea.analyzer import FETCH_MODE_NAMES, ProfileAnalyzer
+from tea.browser_pool import BrowserPool
+from tea.browser_sessions import LazySession
+from tea.cli import read_usernames
+from tea.export import JsonlWriter
+from tea.history import COUNT_FIELDS
+from tea.pacing import Pacer, PacingCancelled
+from tea.telemetry import METRICS
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".tea", "watch.json")
+
+# Poll a moving post about as often as it takes to grow this much (1%)
+TARGET_CHANGE = 0.01
+# How far one poll can move a post's interval either way
+MAX_SPEEDUP = 4.0
+MAX_SLOWDOWN = 2.0
+SAVE_EVERY = 60.0  # seconds between schedule saves
+MAX_SLEEP = 5.0  # longest the loop sleeps before re-checking for a stop
+
+
+def post_counts(post_data):
+    return tuple(int(post_data.get(field) or 0) for field in COUNT_FIELDS)
+
+
+def relative_change(previous, current):
+    """Largest relative change in views or likes between two count tuples"""
+    change = 0.0
+    for index in (COUNT_FIELDS.index('views'), COUNT_FIELDS.index('likes')):
+        change = max(change, abs(current[index] - previous[index]) / max(previous[index], 1))
+    return change
+
+
+def next_interval(interval, previous, current, min_interval, max_interval):
+    """Seconds until a post's next poll, given what its last poll found"""
+    if previous is None:
+        return min_interval
+    change = relative_change(previous, current)
+    if change == 0:
+        interval *= MAX_SLOWDOWN
+    else:
+        interval *= min(MAX_SLOWDOWN, max(1 / MAX_SPEEDUP, TARGET_CHANGE / change))
+    return min(max_interval, max(min_interval, interval))
+
+
+class RequestBudget:
+    """Global cap of per_hour requests, refilled continuously, with up to a minute's worth banked"""
+
+    def __init__(self, per_hour):
+        self.rate = per_hour / 3600
+        self.capacity = max(1.0, per_hour / 60)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        """Seconds until a request can be afforded"""
+        with self._lock:
+            self._refill()
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class Watcher:
+    """Re-polls the posts of a set of profiles on an adaptive schedule"""
+
+    def __init__(self, analyzer, usernames, posts_per_profile=30, fetch_mode='auto', budget_per_hour=600,
+                 min_interval=15 * 60, max_interval=7 * 24 * 3600, profile_interval=6 * 3600, workers=4,
+                 headless=True, state_path=DEFAULT_STATE_PATH, on_change=None):
+        self.analyzer = analyzer
+        self.usernames = list(usernames)
+        self.posts_per_profile = posts_per_profile
+        self.fetch_mode = fetch_mode
+        self.budget = RequestBudget(budget_per_hour)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.profile_interval = profile_interval
+        self.workers = max(1, workers)
+        self.headless = headless
+        self.state_path = state_path
+        self.on_change = on_change
+        self.heap = []  # (due, sequence, kind, key); the sequence keeps ties in push order
+        self._sequence = itertools.count()
+        self.posts = {}  # url -> username, position, counts, interval, due, checked_at
+        self.profiles = {}  # username -> when its next re-listing is due
+        self.started_at = time.time()
+        self.saved_at = 0.0
+        self.stats = {'polls': 0, 'changed': 0, 'unchanged': 0, 'failed': 0, 'profile_scans': 0}
+        self.sessions = [LazySession(analyzer.browser_sessions, headless) for _ in range(self.workers)]
+        self.crawl_session = LazySession(analyzer.browser_sessions, headless)
+
+    def gauges(self):
+        """Metrics collector: how much work is queued and how much budget is left"""
+        yield 'watch.scheduled', {}, len(self.heap)
+        yield 'watch.budget_tokens', {}, self.budget.tokens
+
+    def run(self, stop_event, duration=None):
+        """Poll until stop_event is set (or for duration seconds), saving the schedule as it goes"""
+        self.load_state()
+        ends_at = None if duration is None else time.time() + duration
+        METRICS.add_collector(self.gauges)
+        try:
+            while not stop_event.is_set() and (ends_at is None or time.time() < ends_at):
+                batch = self.take_due(stop_event)
+                if batch:
+                    self.run_batch(batch, stop_event)
+                if time.time() - self.saved_at >= SAVE_EVERY:
+                    self.save_state()
+        finally:
+            METRICS.remove_collector(self.gauges)
+            self.save_state()
+            self.crawl_session.release()
+            for session in self.sessions:
+                session.release()
+
+    def take_due(self, stop_event):
+        """Pop the work that is due and affordable, most overdue first; waits and returns [] if there is none"""
+        now = time.time()
+        if not self.heap:
+            stop_event.wait(MAX_SLEEP)
+            return []
+        if self.heap[0][0] > now:
+            stop_event.wait(min(self.heap[0][0] - now, MAX_SLEEP))
+            return []
+        wait = self.budget.wait_time()
+        if wait > 0:
+            METRICS.count('watch.budget_waits')
+            stop_event.wait(min(wait, MAX_SLEEP))
+            return []
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch) < self.workers * 2 and self.budget.try_take():
+            due, _, kind, key = heapq.heappop(self.heap)
+            batch.append((kind, key))
+        return batch
+
+    def run_batch(self, batch, stop_event):
+        for kind, key in batch:
+            if kind == 'profile':
+                self.scan_profile(key, stop_event)
+        urls = [key for kind, key in batch if kind == 'post']
+        if not urls:
+            return
+        pool = BrowserPool(self.sessions)
+        fetch = lambda session, video_url: self.analyzer.fetch_post(session, video_url, self.fetch_mode, stop_event)
+        polled_at = time.time()  # one snapshot time for the batch
+        for _, video_url, post_data, error in pool.map_ordered(fetch, urls, stop_event):
+            if isinstance(error, PacingCancelled):
+                break
+            if error is not None:
+                self.post_failed(video_url, error)
+            elif post_data is not None:  # None: skipped because we're stopping
+                self.post_polled(video_url, post_data, polled_at)
+        # Anything a stop left unfetched goes back on the heap as it was
+        for video_url in urls:
+            state = self.posts[video_url]
+            if state['due'] <= polled_at:
+                self.schedule('post', video_url, state['due'])
+
+    def scan_profile(self, username, stop_event):
+        """Re-list a profile's newest posts and start watching any we haven't seen"""
+        quiet = lambda kind, payload: None
+        try:
+            links = list(self.analyzer.iter_video_links(username, self.posts_per_profile, self.fetch_mode,
+                                                        self.crawl_session, quiet, stop_event))
+        except Exception as e:
+            METRICS.count('watch.errors')
+            print(f"Error listing @{username}: {str(e)}")
+            links = None
+        finally:
+            self.crawl_session.release()
+        self.stats['profile_scans'] += 1
+        METRICS.count('watch.profile_scans')
+        self.profiles[username] = time.time() + self.profile_interval
+        self.schedule('profile', username, self.profiles[username])
+        if not links:
+            return
+        # A post fetched recently elsewhere (a run, the GUI, an earlier watch) starts from that fetch
+        new = [video_url for video_url in links if video_url not in self.posts]
+        cached = self.analyzer.post_cache.get_many(new)
+        now = time.time()
+        for position, video_url in enumerate(links):
+            if video_url in self.posts:
+                self.posts[video_url]['position'] = position
+                continue
+            post_data = cached.get(video_url)
+            checked_at = post_data['fetched_at'] if post_data else 0.0
+            self.posts[video_url] = {'username': username, 'position': position,
+                                     'counts': post_counts(post_data) if post_data else None,
+                                     'interval': self.min_interval, 'checked_at': checked_at,
+                                     'due': max(now, checked_at + self.min_interval)}
+            self.schedule('post', video_url, self.posts[video_url]['due'])
+        self.analyzer.post_cache.set_profile_order(username, links)
+        if new:
+            print(f"@{username}: watching {len(new)} new posts")
+
+    def post_polled(self, video_url, post_data, polled_at):
+        state = self.posts[video_url]
+        counts = post_counts(post_data)
+        previous = state['counts']
+        state['interval'] = next_interval(state['interval'], previous, counts, self.min_interval, self.max_interval)
+        state['counts'] = counts
+        state['checked_at'] = polled_at
+        self.stats['polls'] += 1
+        METRICS.count('watch.polls')
+        # The cache always learns the post is fresh; only a change is recorded and reported
+        self.analyzer.post_cache.put(state['username'], post_data, state['position'])
+        if counts == previous:
+            self.stats['unchanged'] += 1
+            METRICS.count('watch.unchanged')
+        else:
+            self.stats['changed'] += 1
+            METRICS.count('watch.changed')
+            self.analyzer.history.record(state['username'], [post_data], polled_at)
+            if self.on_change:
+                self.on_change(state['username'], post_data)
+        self.schedule('post', video_url, polled_at + state['interval'])
+
+    def post_failed(self, video_url, error):
+        state = self.posts[video_url]
+        self.stats['failed'] += 1
+        METRICS.count('watch.errors')
+        print(f"Error polling {video_url}: {str(error)}")
+        # Try again after the post's usual interval rather than hammering a failing page
+        self.schedule('post', video_url, time.time() + state['interval'])
+
+    def schedule(self, kind, key, due):
+        if kind == 'post':
+            self.posts[key]['due'] = due
+        heapq.heappush(self.heap, (due, next(self._sequence), kind, key))
+
+    def load_state(self):
+        """Start from the saved schedule for the profiles being watched; any others are dropped"""
+        state = {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            pass
+        watched = set(self.usernames)
+        now = time.time()
+        for video_url, post in state.get('posts', {}).items():
+            if post['username'] in watched:
+                post['counts'] = tuple(post['counts']) if post['counts'] is not None else None
+                self.posts[video_url] = post
+                self.schedule('post', video_url, post['due'])
+        for username in self.usernames:
+            self.profiles[username] = state.get('profiles', {}).get(username, now)
+            self.schedule('profile', username, self.profiles[username])
+        if self.posts:
+            print(f"Resuming the schedule of {len(self.posts)} posts")
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        state = {'profiles': self.profiles, 'posts': self.posts, 'saved_at': time.time()}
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(self.state_path + '.tmp', self.state_path)
+        self.saved_at = time.time()
+
+    def summary(self):
+        """What the watch did, next to what re-scanning every profile on the same timer would have cost"""
+        hours = (time.time() - self.started_at) / 3600
+        stats = self.stats
+        requests = stats['polls'] + stats['failed'] + stats['profile_scans']
+        rescans = max(1, round(hours * 3600 / self.profile_interval)) * len(self.usernames)
+        full = rescans * (1 + self.posts_per_profile)
+        return (f"{len(self.posts)} posts on {len(self.usernames)} profiles over {hours:.2f} h: {requests} requests "
+                f"({stats['polls']} polls, {stats['changed']} changed, {stats['unchanged']} unchanged, "
+                f"{stats['failed']} failed, {stats['profile_scans']} profile scans); re-scanning every profile "
+                f"every {self.profile_interval / 3600:g} h would have taken about {full}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tea.watch',
+                                     description="Keep profiles' posts up to date on an adaptive schedule")
+    parser.add_argument('usernames', help="file with one username per line")
+    parser.add_argument('-o', '--output', default='-',
+                        help="append changed posts as JSON lines here (default: stdout)")
+    parser.add_argument('-n', '--posts', type=int, default=30, help="newest posts to watch per profile (default: 30)")
+    parser.add_argument('--budget', type=float, default=600, help="requests per hour across everything (default: 600)")
+    parser.add_argument('--min-interval', type=float, default=15,
+                        help="minutes between polls of the fastest-moving posts (default: 15)")
+    parser.add_argument('--max-interval', type=float, default=7 * 24 * 60,
+                        help="minutes between polls of posts that have stopped moving (default: 10080, a week)")
+    parser.add_argument('--profile-interval', type=float, default=6 * 60,
+                        help="minutes between re-listing a profile for new posts (default: 360)")
+    parser.add_argument('--duration', type=float, help="stop after this many minutes (default: run until stopped)")
+    parser.add_argument('--fetch-mode', choices=FETCH_MODE_NAMES, default='auto',
+                        help="auto: HTTP with browser fallback; http: never start Chrome; browser: always render")
+    parser.add_argument('--workers', type=int, default=4, help="posts fetched at once (default: 4)")
+    parser.add_argument('--show-browser', action='store_true', help="run Chrome with a window instead of headless")
+    parser.add_argument('--rate', type=float, default=3.0,
+                        help="starting requests per second per host; adapts to how the site responds (default: 3)")
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help="schedule file (default: ~/.tea/watch.json)")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write timings and counters at the end: Prometheus text for .prom, else JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    usernames = read_usernames(args.usernames)
+    out = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    writer = JsonlWriter(out)
+    analyzer = ProfileAnalyzer(pacer=Pacer(rate=args.rate))
+    watcher = Watcher(analyzer, usernames, args.posts, args.fetch_mode, args.budget, args.min_interval * 60,
+                      args.max_interval * 60, args.profile_interval * 60, args.workers, not args.show_browser,
+                      args.state, on_change=writer.write)
+    stop_event = threading.Event()
+    # Progress and per-post warnings go to stderr so stdout stays pure output
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            watcher.run(stop_event, None if args.duration is None else args.duration * 60)
+    except KeyboardInterrupt:
+        stop_event.set()
+        print("Stopped", file=sys.stderr)
+    finally:
+        if args.metrics:
+            METRICS.write(args.metrics)
+        analyzer.close()
+        if out is not sys.stdout:
+            out.close()
+        print(watcher.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
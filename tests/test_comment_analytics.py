@@ -0,0 +1,60 @@
+import os
+
+from tea.comment_analytics import TOP_N, CommentAnalyzer, counts_path
+from tea.comments import CommentSpool
+
+# 'late' is seen once in the first page, below the top TOP_N keywords, and
+# twice more in the second; only the full counts put it on top with 3
+WORDS = ['kw' + chr(97 + i // 26) + chr(97 + i % 26) for i in range(TOP_N + 50)]
+FIRST_PAGE = ['late'] + [word + ' 🔥' for word in WORDS] * 2
+SECOND_PAGE = ['late', 'late love']
+
+
+def make_spool(directory, *pages):
+    os.makedirs(directory, exist_ok=True)
+    spool = CommentSpool(str(directory), '1')
+    for texts in pages:
+        spool.append_page([{'id': len(spool) + i + 1, 'text': text, 'author': 'a', 'likes': 0}
+                           for i, text in enumerate(texts)], 0, True)
+    return spool
+
+
+def score(spool):
+    analyzer = CommentAnalyzer(processes=1, batch_size=100)
+    try:
+        return [result for _, result in analyzer.analyze([spool])][0]
+    finally:
+        analyzer.shutdown()
+
+
+def test_incremental_totals_match_a_full_rescore(tmp_path):
+    spool = make_spool(tmp_path / 'inc', FIRST_PAGE)
+    assert 'late' not in dict(score(spool)['keywords'])
+    spool.append_page([{'id': 10 ** 6 + i, 'text': text} for i, text in enumerate(SECOND_PAGE)], 0, False)
+    incremental = score(spool)
+
+    full = score(make_spool(tmp_path / 'full', FIRST_PAGE, SECOND_PAGE))
+    assert incremental == full
+    assert tuple(incremental['keywords'][0]) == ('late', 3)
+    assert incremental['analyzed'] == len(FIRST_PAGE) + len(SECOND_PAGE)
+
+
+def test_missing_counts_rescore_from_the_start(tmp_path):
+    spool = make_spool(tmp_path, FIRST_PAGE)
+    score(spool)
+    os.remove(counts_path(spool))
+    spool.append_page([{'id': 10 ** 6 + i, 'text': text} for i, text in enumerate(SECOND_PAGE)], 0, False)
+    result = score(spool)
+    assert tuple(result['keywords'][0]) == ('late', 3)
+    assert dict(result['emoji'])['🔥'] == 2 * (TOP_N + 50)
+
+
+def test_shrunken_spool_is_rescored(tmp_path):
+    score(make_spool(tmp_path / 'spool', FIRST_PAGE, SECOND_PAGE))
+    # Deleted and fetched again, with fewer comments so far
+    for name in os.listdir(tmp_path / 'spool'):
+        if not name.endswith('analytics.json') and not name.endswith('counts.json'):
+            os.remove(tmp_path / 'spool' / name)
+    result = score(make_spool(tmp_path / 'spool', SECOND_PAGE))
+    assert (result['comments'], result['analyzed']) == (2, 2)
+    assert [tuple(keyword) for keyword in result['keywords']] == [('late', 2), ('love', 1)]
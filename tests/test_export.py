@@ -0,0 +1,124 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from tea import export
+from tea.comments import CommentSpool
+from tea.export import (BLOCK_ROWS, ColumnarReader, ColumnarWriter, convert, export_comments, export_posts,
+                        iter_posts, iter_rows, load_posts)
+from tea.post_store import PostStore
+
+
+def make_store(count=5):
+    store = PostStore()
+    for i in range(count):
+        store.upsert({'url': f'https://www.tiktok.com/@user{i % 2}/video/{7400000000000000000 + i}',
+                      'caption': f'caption, "quoted" ✨ {i}', 'views': 1000 + i, 'likes': 10 * i, 'comments': i,
+                      'saves': 2, 'shares': 3, 'er_rate': 1.5 + i, 'fetched_at': 1700000000.25 + i,
+                      'missing_fields': ['saves'] if i % 2 else [], 'sentiment': 0.25 * i if i % 3 else None})
+    store.upsert({'url': 'http://127.0.0.1:8000/@user0/video/7400000000000000001', 'caption': '', 'views': 1})
+    return store
+
+
+def same_posts(store, expected):
+    assert store.urls() == expected.urls()
+    for row in range(len(expected)):
+        got, want = store[row], expected[row]
+        got.pop('sentiment'), want.pop('sentiment')
+        assert got == want
+    # NaN (unscored) compares equal here
+    np.testing.assert_array_equal(store.column('sentiment'), expected.column('sentiment'))
+
+
+@pytest.fixture
+def comments_export(tmp_path):
+    spool = CommentSpool(str(tmp_path), '7400000000000000001')
+    spool.append_page([{'id': 1, 'create_time': 100, 'likes': 2, 'author': 'a', 'text': 'hi'}], 1, False)
+    return spool
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl', 'tcol'])
+def test_loading_a_comments_export_as_posts_fails_cleanly(tmp_path, comments_export, extension):
+    path = str(tmp_path / f'comments.{extension}')
+    export_comments([comments_export], path)
+    with pytest.raises(ValueError):
+        load_posts(path, PostStore())
+
+
+def test_file_without_post_columns_is_not_a_posts_export(tmp_path):
+    path = tmp_path / 'other.csv'
+    path.write_text('name,score\nx,1\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='not a posts export'):
+        load_posts(str(path), PostStore())
+    with pytest.raises(ValueError, match='not a posts export'):
+        convert(str(path), str(tmp_path / 'other.jsonl'))
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl', 'tcol'])
+def test_posts_round_trip(tmp_path, extension):
+    expected = make_store()
+    path = str(tmp_path / f'posts.{extension}')
+    assert export_posts(expected, path) == len(expected)
+    store = PostStore()
+    assert load_posts(path, store) == len(expected)
+    same_posts(store, expected)
+    assert [username for username, _ in iter_posts(path)] == ['user0', 'user1', 'user0', 'user1', 'user0', 'user0']
+
+
+@pytest.mark.parametrize('source, destination', [('csv', 'tcol'), ('tcol', 'jsonl'), ('jsonl', 'csv')])
+def test_convert_keeps_posts(tmp_path, source, destination):
+    expected = make_store()
+    export_posts(expected, str(tmp_path / f'posts.{source}'))
+    assert convert(str(tmp_path / f'posts.{source}'), str(tmp_path / f'copy.{destination}')) == len(expected)
+    store = PostStore()
+    load_posts(str(tmp_path / f'copy.{destination}'), store)
+    same_posts(store, expected)
+
+
+def test_columnar_blocks_and_truncation(tmp_path):
+    expected = PostStore()
+    expected.extend({'url': f'https://www.tiktok.com/@u/video/{7400000000000000000 + i}', 'views': i,
+                     'caption': str(i)} for i in range(BLOCK_ROWS + 10))
+    path = str(tmp_path / 'posts.tcol')
+    export_posts(expected, path)
+    with ColumnarReader(path) as reader:
+        assert [descriptor['rows'] for _, descriptor in reader.blocks] == [BLOCK_ROWS, 10]
+        views = np.concatenate([block['views'] for block in reader.iter_blocks(['views'])])
+        assert views.tolist() == list(range(BLOCK_ROWS + 10))
+        del views
+    # A file cut off mid-write keeps its whole blocks
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)
+    store = PostStore()
+    assert load_posts(path, store) == BLOCK_ROWS
+    assert store[BLOCK_ROWS - 1]['caption'] == str(BLOCK_ROWS - 1)
+
+
+def test_columnar_without_sentiment_loads_unscored(tmp_path, monkeypatch):
+    # As written before sentiment was exported
+    monkeypatch.setitem(export.KIND_COLUMNS, 'posts',
+                        tuple(column for column in export.POST_COLUMNS if column[0] != 'sentiment'))
+    path = str(tmp_path / 'old.tcol')
+    with open(path, 'wb') as f:
+        writer = ColumnarWriter(f)
+        writer.write('u', {'url': 'https://www.tiktok.com/@u/video/1', 'views': 5, 'missing_fields': []})
+        writer.close()
+    store = PostStore()
+    assert load_posts(path, store) == 1
+    assert store[0]['views'] == 5 and math.isnan(store[0]['sentiment'])
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl', 'tcol'])
+def test_comments_round_trip(tmp_path, comments_export, extension):
+    comments_export.append_page([{'id': 2, 'create_time': 200, 'likes': 0, 'author': 'b', 'text': 'line\nbreak, "q"'}],
+                                2, False)
+    path = str(tmp_path / f'comments.{extension}')
+    assert export_comments([comments_export], path) == 2
+    copy = str(tmp_path / 'copy.jsonl')
+    assert convert(path, copy) == 2
+    rows = list(iter_rows(copy))
+    assert [(row['video_id'], row['id'], row['create_time'], row['likes'], row['author'], row['text'])
+            for row in rows] == [(7400000000000000001, 1, 100, 2, 'a', 'hi'),
+                                 (7400000000000000001, 2, 200, 0, 'b', 'line\nbreak, "q"')]
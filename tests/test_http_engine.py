@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from fixture_server import FIXTURES_DIR, SYNTHETIC_VIDEO_BASE, FixtureServer, synthetic_stats
+from tea.analyzer import ProfileAnalyzer
+from tea.history import HistoryStore
+from tea.http_engine import STAT_FIELDS, HttpFetcher, parse_video_metrics
+from tea.pacing import Pacer
+from tea.post_cache import PostCache
+
+
+def no_browser(*args, **kwargs):
+    pytest.fail("http mode started a browser")
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as server:
+        yield server
+
+
+@pytest.fixture
+def analyzer(server, tmp_path):
+    analyzer = ProfileAnalyzer(no_browser, http_fetcher=HttpFetcher(base_url=server.url, pacer=Pacer(rate=200)),
+                               post_cache=PostCache(':memory:'), history=HistoryStore(str(tmp_path)))
+    yield analyzer
+    analyzer.close()
+
+
+def test_synthetic_profile_counts(server, analyzer):
+    posts = analyzer.analyze_profile('synth25', 25, fetch_mode='http')
+    assert [post_data['url'] for post_data in posts] == [f"{server.url}/@synth25/video/{SYNTHETIC_VIDEO_BASE + index}"
+                                                         for index in range(25)]
+    for index, post_data in enumerate(posts):
+        stats = synthetic_stats(str(SYNTHETIC_VIDEO_BASE + index))
+        assert {field: post_data[field] for field in STAT_FIELDS.values()} == {
+            field: stats[key] for key, field in STAT_FIELDS.items()}
+        assert post_data['caption'] == f"Synthetic post {index + 1} #bench"
+        assert post_data['missing_fields'] == []
+        assert post_data['er_rate'] == pytest.approx(
+            (stats['diggCount'] + stats['commentCount'] + stats['shareCount']) / stats['playCount'] * 100)
+    # Fetched posts land in the cache and the history like browser ones
+    assert len(analyzer.post_cache.load_profile('synth25')) == 25
+    assert len(analyzer.history.rows('synth25')) == 25
+
+
+def test_saved_fixture_pages(server, analyzer):
+    posts = analyzer.analyze_profile('example', 3, fetch_mode='http')
+    assert [(post_data['views'], post_data['likes'], post_data['comments'], post_data['saves'], post_data['shares'])
+            for post_data in posts[:2]] == [(98000, 12500, 340, 800, 120), (9800000, 1200000, 8100, 64000, 25000)]
+    assert posts[1]['caption'] == 'Trying the new trend'
+    # The last page has no caption, saves or views
+    assert (posts[2]['likes'], posts[2]['comments'], posts[2]['shares']) == (430, 12, 3)
+    assert sorted(posts[2]['missing_fields']) == ['caption', 'saves', 'views']
+
+
+def test_post_count_limit(analyzer):
+    links = analyzer.http_fetcher.fetch_profile_links('synth300', 40)
+    assert len(links) == 40 and len(set(links)) == 40
+    assert len(analyzer.analyze_profile('synth300', 7, fetch_mode='http')) == 7
+
+
+def test_parse_video_metrics_prefers_exact_stats():
+    with open(os.path.join(FIXTURES_DIR, 'video_7300000000000000002.html'), encoding='utf-8') as f:
+        html = f.read()
+    metrics = parse_video_metrics(html)
+    assert metrics['likes'] == '1200000' and metrics['views'] == '9800000'
+    # Above 2^31 only statsV2 is exact
+    big = json.dumps({'__DEFAULT_SCOPE__': {'webapp.video-detail': {'itemInfo': {'itemStruct': {
+        'desc': 'x', 'stats': {'playCount': 2 ** 31 - 1}, 'statsV2': {'playCount': '5000000000'}}}}}})
+    page = f'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{big}</script>'
+    metrics = parse_video_metrics(page)
+    assert metrics['views'] == '5000000000'
+    assert sorted(metrics['missing']) == ['comments', 'likes', 'saves', 'shares']
+    with pytest.raises(ValueError):
+        parse_video_metrics('<html></html>')
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from fixture_server import SYNTHETIC_VIDEO_BASE, FixtureServer, synthetic_stats
+from tea.analyzer import ProfileAnalyzer
+from tea.history import HistoryStore
+from tea.http_engine import HttpFetcher
+from tea.jobs import JobQueue, JobWorker
+from tea.pacing import Pacer
+from tea.post_cache import PostCache
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+def state_of(job_queue, key):
+    return [job for job in job_queue.jobs() if job['key'] == key][0]
+
+
+def test_failed_job_retries_with_backoff_then_gives_up(db_path):
+    job_queue = JobQueue(db_path, max_attempts=3, backoff_base=60.0)
+    job_queue.enqueue('video', 'a', {'position': 0})
+    job = job_queue.claim('w1')
+    assert job['attempts'] == 1
+    assert job_queue.fail(job, 'boom')
+    # Backing off: not runnable yet
+    assert job_queue.claim('w1') is None
+    assert state_of(job_queue, 'a')['state'] == 'pending'
+
+    job_queue.backoff_base = 0.0
+    job_queue.conn.execute("UPDATE jobs SET available_at = 0")
+    for attempt in (2, 3):
+        job = job_queue.claim('w1')
+        assert job['attempts'] == attempt
+        job_queue.fail(job, f'boom {attempt}')
+    failed = state_of(job_queue, 'a')
+    assert (failed['state'], failed['attempts'], failed['last_error']) == ('failed', 3, 'boom 3')
+    assert not job_queue.has_work()
+    job_queue.close()
+
+
+def test_fail_uses_the_jobs_own_max_attempts(db_path):
+    JobQueue(db_path, max_attempts=2).enqueue('video', 'a', {})
+    # A worker opened with a different default must still stop at the job's limit
+    job_queue = JobQueue(db_path, max_attempts=5, backoff_base=0.0)
+    for _ in range(2):
+        job_queue.fail(job_queue.claim('w1'), 'boom')
+    assert state_of(job_queue, 'a')['state'] == 'failed'
+    assert job_queue.claim('w1') is None
+    job_queue.close()
+
+
+def test_expired_lease_is_taken_over(db_path):
+    job_queue = JobQueue(db_path)
+    job_queue.enqueue('video', 'a', {})
+    first = job_queue.claim('w1', lease_seconds=60)
+    assert job_queue.claim('w2') is None
+    assert job_queue.heartbeat(first, lease_seconds=-1)  # w1 goes silent
+
+    second = job_queue.claim('w2')
+    assert (second['key'], second['attempts']) == ('a', 2)
+    # The old owner can no longer touch it
+    assert not job_queue.heartbeat(first)
+    assert not job_queue.complete(first)
+    assert job_queue.complete(second)
+    assert state_of(job_queue, 'a')['state'] == 'done'
+    job_queue.close()
+
+
+def test_expired_last_attempt_fails(db_path):
+    job_queue = JobQueue(db_path, max_attempts=1)
+    job_queue.enqueue('video', 'a', {})
+    job_queue.claim('w1', lease_seconds=-1)
+    assert job_queue.claim('w2') is None
+    failed = state_of(job_queue, 'a')
+    assert (failed['state'], failed['last_error']) == ('failed', 'Worker lease expired')
+    job_queue.close()
+
+
+def test_release_hands_the_attempt_back(db_path):
+    job_queue = JobQueue(db_path)
+    job_queue.enqueue_many('profile', [('p', {})])
+    job_queue.enqueue_many('video', [('v', {})])
+    job = job_queue.claim('w1')
+    assert job['kind'] == 'video'  # videos go first
+    assert job_queue.release(job)
+    assert job_queue.claim('w2')['attempts'] == 1
+    job_queue.close()
+
+
+def test_requeue_restarts_only_finished_jobs(db_path):
+    job_queue = JobQueue(db_path)
+    job_queue.enqueue('video', 'a', {'position': 0})
+    job = job_queue.claim('w1')
+    job_queue.enqueue('video', 'a', {'position': 5})
+    assert state_of(job_queue, 'a')['payload'] == {'position': 0}
+    job_queue.complete(job)
+    job_queue.enqueue('video', 'a', {'position': 5})
+    requeued = state_of(job_queue, 'a')
+    assert (requeued['state'], requeued['attempts'], requeued['payload']) == ('pending', 0, {'position': 5})
+    job_queue.close()
+
+
+def test_video_job_fills_cache_and_history(db_path, tmp_path):
+    with FixtureServer() as server:
+        analyzer = ProfileAnalyzer(http_fetcher=HttpFetcher(base_url=server.url, pacer=Pacer(rate=200)),
+                                   post_cache=PostCache(':memory:'), history=HistoryStore(str(tmp_path / 'history')))
+        job_queue = JobQueue(db_path)
+        video_id = str(SYNTHETIC_VIDEO_BASE + 1)
+        video_url = f"{server.url}/@synth3/video/{video_id}"
+        job_queue.enqueue('video', video_url, {'username': 'synth3', 'position': 1})
+        try:
+            JobWorker(job_queue, analyzer, 'w1', fetch_mode='http').run(threading.Event(), idle_exit=True)
+            assert state_of(job_queue, video_url)['state'] == 'done'
+            views = synthetic_stats(video_id)['playCount']
+            assert analyzer.post_cache.get_many([video_url])[video_url]['views'] == views
+            rows = analyzer.history.rows('synth3')
+            assert list(rows['video_id']) == [int(video_id)]
+            assert rows['views'][0] == views
+        finally:
+            job_queue.close()
+            analyzer.close()
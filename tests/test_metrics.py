@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from tea.metrics import engagement_rates, estimate_views, moving_average, outliers, parse_count, parse_counts
+
+SUFFIXED = ['1.2K', '12.5k', '3M', '1.2B', ' 7 K ', '1,2K', '12,5M', '0K']
+SEPARATED = ['12,345', '1,234,567', '1 234', '1 234', '999', '0', '007']
+MISSING = [None, '', '   ']
+MALFORMED = ['1kk', '1mk', 'k', '1.2.3', '1.', '.5', '1,2,3K', '-5', '+5', 'inf', 'nan', '1e3', '1_000', '１２',
+             '١٢', '²', '12.5KB', 'N/A', '1K views']
+NUMBERS = [0, 12, 2 ** 40, 1.5, np.int64(7), np.float32(2.5), float('nan'), -3]
+
+
+def same(left, right):
+    np.testing.assert_array_equal(np.asarray(left, dtype=np.float64), np.asarray(right, dtype=np.float64))
+
+
+def test_scalar_values():
+    assert parse_count('1.2K') == 1200
+    assert parse_count('1,2K') == 1200
+    assert parse_count('12,345') == 12345
+    assert parse_count('3M') == 3000000
+    assert parse_count(5) == 5.0
+    assert np.isnan(parse_count(None))
+    assert np.isnan(parse_count('1kk'))
+
+
+@pytest.mark.parametrize('values', [SUFFIXED, SEPARATED, MISSING, MALFORMED, NUMBERS,
+                                    SUFFIXED + SEPARATED + MISSING + MALFORMED + NUMBERS])
+def test_batch_matches_scalar(values):
+    same(parse_counts(values), [parse_count(value) for value in values])
+
+
+@pytest.mark.parametrize('value', SUFFIXED + SEPARATED + MISSING + MALFORMED + NUMBERS)
+def test_value_does_not_depend_on_the_batch(value):
+    expected = parse_count(value)
+    # Alone, among plain numbers and among display strings
+    for batch in ([value], [value, 1, None], [value, '1K', '12,345']):
+        same(parse_counts(batch)[:1], [expected])
+
+
+def test_float_only_forms_are_missing_in_a_batch():
+    same(parse_counts(['inf', '-5', '1e3', 'nan', '1_000']), [np.nan] * 5)
+    same(parse_counts(['inf', '-5', '1e3', 'nan', '1_000', '1K']), [np.nan] * 5 + [1000])
+
+
+def test_empty_batch():
+    assert parse_counts([]).shape == (0,)
+
+
+def test_engagement_rates_estimate_missing_views():
+    same(estimate_views([100, np.nan], [np.nan, 50]), [150, 50])
+    same(engagement_rates([10, 30, 5], [5, np.nan, 0], [5, 0, 0], [100, np.nan, 0]), [20, 30 / 45 * 100, 0])
+
+
+def test_moving_average_and_outliers():
+    same(moving_average([1, 2, 3, 4], window=2), [1, 1.5, 2.5, 3.5])
+    assert moving_average([]).size == 0
+    assert outliers([1, 2, 2, 3, 2, 50]).tolist() == [5]
+    assert outliers([1, 50]).size == 0
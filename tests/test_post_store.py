@@ -0,0 +1,73 @@
+import numpy as np
+
+from tea.post_store import PostStore
+
+
+def make_post(url, views=100, **fields):
+    post_data = {'url': url, 'caption': 'caption', 'views': views, 'likes': 10, 'comments': 1, 'saves': 2,
+                 'shares': 3, 'er_rate': 16.0, 'fetched_at': 1.0, 'missing_fields': []}
+    post_data.update(fields)
+    return post_data
+
+
+def test_upsert_updates_in_place():
+    store = PostStore()
+    url = 'https://www.tiktok.com/@a/video/7400000000000000001'
+    row, is_new = store.upsert(make_post(url))
+    assert (row, is_new) == (0, True)
+    assert store.upsert(make_post(url, views=500)) == (0, False)
+    assert len(store) == 1
+    assert store[0]['views'] == 500
+    assert store.row_of(url) == 0
+
+
+def test_same_id_under_two_prefixes_are_two_posts():
+    store = PostStore()
+    tiktok = 'https://www.tiktok.com/@a/video/123'
+    fixture = 'http://127.0.0.1:8000/@a/video/123'
+    store.upsert(make_post(tiktok))
+    store.upsert(make_post(fixture, views=1))
+    assert store.upsert(make_post(fixture, views=2)) == (1, False)
+    assert store.upsert(make_post(tiktok, views=3)) == (0, False)
+    assert len(store) == 2
+    assert store.row_of(fixture) == 1
+    assert store[1]['views'] == 2 and store[0]['views'] == 3
+    assert store.urls() == [tiktok, fixture]
+
+
+def test_odd_and_19_digit_urls():
+    store = PostStore()
+    urls = ['https://www.tiktok.com/@a/video/7400000000000000000', 'https://example.com/not-a-video',
+            'https://www.tiktok.com/@a/video/9400000000000000000']
+    for url in urls:
+        store.upsert(make_post(url))
+    assert [store.row_of(url) for url in urls] == [0, 1, 2]
+    assert store.urls() == urls
+    assert store.row_of('https://www.tiktok.com/@a/video/7400000000000000009') is None
+
+
+def test_extend_columns_matches_upsert():
+    posts = [make_post(f'https://www.tiktok.com/@u{i % 3}/video/{7400000000000000000 + i * 7919}', views=i,
+                       missing_fields=['saves'] if i % 2 else []) for i in range(5000)]
+    posts.append(make_post(posts[5]['url'], views=-1))  # repeated within the batch
+    posts.append(make_post('http://127.0.0.1:8000/@u/video/' + posts[7]['url'].rsplit('/', 1)[1]))
+    expected = PostStore()
+    expected.extend(posts)
+
+    store = PostStore()
+    store.extend(posts[:10])
+    rest = posts[10:]
+    columns = {name: np.array([post_data[name] for post_data in rest])
+               for name in ('views', 'likes', 'comments', 'saves', 'shares', 'er_rate', 'fetched_at')}
+    missing = np.array([8 if post_data['missing_fields'] else 0 for post_data in rest], dtype=np.uint8)
+    store.extend_columns([post_data['url'] for post_data in rest], [post_data['caption'] for post_data in rest],
+                         columns, missing)
+
+    assert len(store) == len(expected)
+    for post_data in posts:
+        row = store.row_of(post_data['url'])
+        assert row == expected.row_of(post_data['url'])
+        got, want = store[row], expected[row]
+        got.pop('sentiment'), want.pop('sentiment')
+        assert got == want
+    assert store[5]['views'] == -1
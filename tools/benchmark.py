@@ -0,0 +1,427 @@
+"""Offline benchmarks for scraping, count parsing and the posts table.
+
+    python tools/benchmark.py                    run every case, compare with the baseline
+    python tools/benchmark.py --save-baseline    record this machine's results as the baseline
+    python tools/benchmark.py --only scrape_http --posts 2000 --latency 0.05
+
+Scrape cases drive ProfileAnalyzer.analyze_profile against a synthetic
+profile on a local fixture server (see fixture_server.py), so nothing
+touches TikTok. Each case runs in a fresh process, which keeps its peak
+RSS its own. Reported per case: items per second, p50/p99 latency per item
+and peak RSS. The startup case times cold starts of the GUI to an
+interactive window, the history case times trend queries over a year
+of hourly snapshots, and the export case reloads a saved run of 100k posts
+into the posts table.
+
+Baselines are machine-specific, so none ship with the repo; save one on the
+machine that runs the comparison. A run exits with status 1 when a result
+is more than --tolerance worse than the baseline recorded with the same
+settings.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_server import FixtureServer, format_count, synthetic_video_html  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Metric -> True if higher is better
+METRIC_DIRECTIONS = {'per_sec': True, 'p50_ms': False, 'p99_ms': False, 'peak_rss_mb': False}
+
+# Latencies this small are mostly timer noise, so they are never called regressions
+MIN_COMPARED_MS = 1.0
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil reports the peak working set
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(items, seconds, latencies):
+    latencies_ms = np.asarray(latencies, dtype=np.float64) * 1000
+    return {
+        'items': items,
+        'seconds': seconds,
+        'per_sec': items / seconds if seconds else 0.0,
+        'p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+        'p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_scrape(base_url, options):
+    """Scrape a synthetic profile over HTTP with the pacer out of the way"""
+    from tea.analyzer import ProfileAnalyzer
+    from tea.history import HistoryStore
+    from tea.http_engine import HttpFetcher
+    from tea.pacing import Pacer
+    from tea.post_cache import PostCache
+    from tea.telemetry import METRICS
+
+    # A fixed, very high rate: this measures the fetch path, not the pacing policy
+    pacer = Pacer(rate=100000, burst=1000, min_rate=100000, max_cooldown=0.05, verbose=False)
+    history_dir = tempfile.mkdtemp(prefix='tea-bench-')
+    analyzer = ProfileAnalyzer(http_fetcher=HttpFetcher(base_url=base_url, maxsize=options['workers'], pacer=pacer),
+                               post_cache=PostCache(':memory:'), history=HistoryStore(history_dir))
+    latencies = []
+    fetch_post = analyzer.fetch_post
+
+    def timed_fetch_post(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fetch_post(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+    analyzer.fetch_post = timed_fetch_post
+
+    try:
+        # Per-post warnings would only measure the terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            posts = analyzer.analyze_profile(f"synth{options['posts']}", options['posts'], fetch_mode='http',
+                                             browser_sessions=options['workers'])
+            seconds = time.perf_counter() - started
+    finally:
+        analyzer.close()
+        shutil.rmtree(history_dir, ignore_errors=True)
+    result = summarize(len(posts), seconds, latencies)
+    result['failed'] = METRICS.snapshot()['counters'].get('posts.failed', 0)
+    return result
+
+
+def bench_parse_pages(base_url, options):
+    """Read counts out of video pages and build their post_data, no network"""
+    from tea.analyzer import build_post_data
+    from tea.http_engine import parse_video_metrics
+
+    pages = [synthetic_video_html('synth', str(7400000000000000000 + index), options['page_bytes'])
+             for index in range(options['posts'])]
+    latencies = []
+    started = time.perf_counter()
+    for index, html in enumerate(pages):
+        page_started = time.perf_counter()
+        build_post_data(f"https://www.tiktok.com/@synth/video/{index}", parse_video_metrics(html))
+        latencies.append(time.perf_counter() - page_started)
+    return summarize(len(pages), time.perf_counter() - started, latencies)
+
+
+def bench_parse_counts(base_url, options, batch=10000):
+    """Vectorized count parsing over display strings like 12.5K and 1,234"""
+    from tea.metrics import parse_counts
+
+    rng = random.Random(0)
+    values = []
+    for _ in range(options['counts']):
+        value = int(rng.lognormvariate(8, 3))
+        style = rng.random()
+        values.append(f"{value:,}" if style < 0.2 else str(value) if style < 0.4 else format_count(value))
+    latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(values), batch):
+        batch_started = time.perf_counter()
+        parse_counts(values[start:start + batch])
+        # Per-item latency, so the figure doesn't depend on the batch size
+        latencies.append((time.perf_counter() - batch_started) / len(values[start:start + batch]))
+    return summarize(len(values), time.perf_counter() - started, latencies)
+
+
+def _synthetic_posts(count):
+    rng = random.Random(0)
+    for index in range(count):
+        views = int(rng.lognormvariate(10, 2))
+        likes = int(views * rng.uniform(0.02, 0.15))
+        yield {'url': f"https://www.tiktok.com/@synth/video/{7400000000000000000 + index}",
+               'caption': f"Synthetic post {index + 1} #bench", 'views': views, 'likes': likes,
+               'comments': likes // 50, 'saves': likes // 20, 'shares': likes // 30,
+               'er_rate': 100.0 * (likes + likes // 50 + likes // 30) / max(views, 1),
+               'comments_data': [], 'missing_fields': [], 'fetched_at': time.time()}
+
+
+def bench_table_store(base_url, options):
+    """Insert every post into the table's PostStore, then refresh each one in place"""
+    from tea.post_store import PostStore
+
+    posts = list(_synthetic_posts(options['posts']))
+    store = PostStore()
+    latencies = []
+    started = time.perf_counter()
+    for post_data in posts + posts:
+        row_started = time.perf_counter()
+        store.upsert(post_data)
+        latencies.append(time.perf_counter() - row_started)
+    return summarize(len(latencies), time.perf_counter() - started, latencies)
+
+
+def bench_table_render(base_url, options):
+    """The GUI's add_post_to_table into a real Treeview; skipped without a display"""
+    import importlib.util
+    import tkinter as tk
+
+    spec = importlib.util.spec_from_file_location('tea_app', os.path.join(ROOT, 'tt-analytics-backup.py'))
+    app_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app_module)
+    try:
+        app = app_module.TikTokAnalyzer()
+    except tk.TclError as e:
+        return {'skipped': f"no display ({str(e)})"}
+    try:
+        app.root.withdraw()
+        app.posts_tree.delete(*app.posts_tree.get_children())
+        app.posts_data.clear()
+        latencies = []
+        started = time.perf_counter()
+        for post_data in _synthetic_posts(options['posts']):
+            row_started = time.perf_counter()
+            app.add_post_to_table(post_data)
+            latencies.append(time.perf_counter() - row_started)
+        app.root.update_idletasks()
+        return summarize(len(latencies), time.perf_counter() - started, latencies)
+    finally:
+        app.on_close()
+
+
+def bench_startup(base_url, options):
+    """Cold start of the GUI, from process start to an interactive window; skipped without a display"""
+    seconds = []
+    for _ in range(options['startups']):
+        completed = subprocess.run([sys.executable, os.path.join(ROOT, 'tt-analytics-backup.py'), '--measure-startup'],
+                                   capture_output=True, text=True, timeout=60)
+        match = re.search(r"Process start to window: (\d+) ms", completed.stdout)
+        if not match:
+            return {'skipped': (completed.stderr.strip().splitlines() or ["no window"])[-1]}
+        seconds.append(int(match.group(1)) / 1000)
+    result = summarize(len(seconds), sum(seconds), seconds)
+    result['peak_rss_mb'] = None  # the GUI's memory isn't this process's
+    return result
+
+
+def bench_history(base_url, options, posts=200, hours=365 * 24, queries=200):
+    """Trend, growth and top-k queries over a year of hourly snapshots of `posts` posts"""
+    from tea.history import COUNT_FIELDS, FIRST_SEEN, RECORD, HistoryStore, build_index
+
+    directory = tempfile.mkdtemp(prefix='tea-bench-')
+    try:
+        # Written straight in the on-disk format: recording 1.75M rows post by post would take a while
+        rows = np.zeros(posts * hours, dtype=RECORD)
+        rows['video_id'] = np.tile(7400000000000000000 + np.arange(posts), hours)
+        started_at = int(time.time()) - hours * 3600
+        rows['time'] = np.repeat(started_at + np.arange(hours) * 3600, posts)
+        rng = np.random.default_rng(0)
+        for field in COUNT_FIELDS:
+            rows[field] = rng.integers(0, 1000, len(rows))
+        rows['flags'][:posts] = FIRST_SEEN
+        store = HistoryStore(directory)
+        rows.tofile(store.path('synth'))
+        build_index(rows).tofile(store.path('synth', '.snap'))
+        # Every profile is a hard link to the same data, so "hundreds of profiles" costs no disk
+        usernames = ['synth']
+        for index in range(1, options['profiles']):
+            try:
+                os.link(store.path('synth'), store.path(f"synth{index}"))
+                os.link(store.path('synth', '.snap'), store.path(f"synth{index}", '.snap'))
+                usernames.append(f"synth{index}")
+            except OSError:
+                break
+
+        end = started_at + hours * 3600
+        calls = [
+            lambda: store.profile_trend('synth'),
+            lambda: store.post_trend(f"https://www.tiktok.com/@synth/video/{7400000000000000000 + posts // 2}"),
+            lambda: store.growth('synth', end - 7 * 24 * 3600, end),
+            lambda: store.top_growth(usernames, end - 24 * 3600, end, 10),
+        ]
+        latencies = []
+        started = time.perf_counter()
+        for index in range(queries):
+            query_started = time.perf_counter()
+            calls[index % len(calls)]()
+            latencies.append(time.perf_counter() - query_started)
+        result = summarize(len(latencies), time.perf_counter() - started, latencies)
+        store.close()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# name -> (function, fixture server settings or None)
+def bench_export(base_url, options, posts=100000, reloads=5):
+    """Stream `posts` posts to a .tcol file, then load it into a PostStore `reloads` times"""
+    from tea.export import ColumnarWriter, load_posts
+    from tea.post_store import PostStore
+
+    directory = tempfile.mkdtemp(prefix='tea-bench-')
+    try:
+        path = os.path.join(directory, 'run.tcol')
+        with open(path, 'wb') as f:
+            writer = ColumnarWriter(f)
+            for post_data in _synthetic_posts(posts):
+                writer.write('synth', post_data)
+            writer.close()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(reloads):
+            load_started = time.perf_counter()
+            load_posts(path, PostStore())
+            latencies.append(time.perf_counter() - load_started)
+        # One item is one post loaded; p50/p99 are whole reloads
+        return summarize(posts * reloads, time.perf_counter() - started, latencies)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+CASES = {
+    'scrape_http': (bench_scrape, lambda options: {'latency': options['latency'], 'jitter': options['jitter'],
+                                                   'page_bytes': options['page_bytes']}),
+    'scrape_http_flaky': (bench_scrape, lambda options: {'latency': options['latency'], 'jitter': options['jitter'],
+                                                         'page_bytes': options['page_bytes'],
+                                                         'failure_rate': options['failure_rate']}),
+    'parse_pages': (bench_parse_pages, None),
+    'parse_counts': (bench_parse_counts, None),
+    'table_store': (bench_table_store, None),
+    'table_render': (bench_table_render, None),
+    'startup': (bench_startup, None),
+    'history': (bench_history, None),
+    'export': (bench_export, None),
+}
+
+
+def run_case(name, options):
+    function, server_settings = CASES[name]
+    if server_settings is None:
+        return _run_in_process(function, None, options)
+    # The server runs here, so its memory doesn't count towards the case's
+    with FixtureServer(**server_settings(options)) as server:
+        return _run_in_process(function, server.url, options)
+
+
+def _run_in_process(function, base_url, options):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, base_url, options).result()
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against baseline results, as readable lines"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'skipped' in result or 'skipped' in base:
+            continue
+        for metric, higher_is_better in METRIC_DIRECTIONS.items():
+            now, then = result.get(metric), base.get(metric)
+            if now is None or then is None:
+                continue
+            if metric.endswith('_ms') and max(now, then) < MIN_COMPARED_MS:
+                continue
+            worse = now < then * (1 - tolerance) if higher_is_better else now > then * (1 + tolerance)
+            if worse:
+                regressions.append(f"{name} {metric}: {now:.2f} vs baseline {then:.2f}")
+    return regressions
+
+
+def format_result(name, result):
+    if 'skipped' in result:
+        return f"{name:<20}skipped: {result['skipped']}"
+    p50 = '-' if result['p50_ms'] is None else f"{result['p50_ms']:.3f}"
+    p99 = '-' if result['p99_ms'] is None else f"{result['p99_ms']:.3f}"
+    peak = '-' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.1f}"
+    line = f"{name:<20}{result['items']:>9}{result['per_sec']:>12.0f}{p50:>10}{p99:>10}{peak:>10}"
+    if result.get('failed'):
+        line += f"  ({result['failed']} failed)"
+    return line
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run TEA's offline benchmarks")
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES), help="cases to run (default: all)")
+    parser.add_argument('--posts', type=int, default=500, help="posts per scrape/table case (default: 500)")
+    parser.add_argument('--counts', type=int, default=1000000, help="strings for parse_counts (default: 1M)")
+    parser.add_argument('--startups', type=int, default=5, help="GUI cold starts to time (default: 5)")
+    parser.add_argument('--profiles', type=int, default=300,
+                        help="profiles in the history case's top-k query (default: 300)")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent fetches when scraping (default: 8)")
+    parser.add_argument('--latency', type=float, default=0.02, help="server latency in seconds (default: 0.02)")
+    parser.add_argument('--jitter', type=float, default=0.01, help="extra random latency (default: 0.01)")
+    parser.add_argument('--failure-rate', type=float, default=0.05,
+                        help="share of requests failing in scrape_http_flaky (default: 0.05)")
+    parser.add_argument('--page-kb', type=float, default=100, help="size of generated pages (default: 100)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown before a result counts as a regression (default: 0.25)")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {'posts': args.posts, 'counts': args.counts, 'startups': args.startups, 'profiles': args.profiles,
+               'workers': args.workers, 'latency': args.latency,
+               'jitter': args.jitter, 'failure_rate': args.failure_rate, 'page_bytes': int(args.page_kb * 1024)}
+
+    print(f"{'case':<20}{'items':>9}{'per sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>10}")
+    results = {}
+    for name in args.only or CASES:
+        results[name] = run_case(name, options)
+        print(format_result(name, results[name]), flush=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': options, 'results': results}, f, indent=2)
+
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except OSError:
+        baseline = None
+
+    if args.save_baseline:
+        # Saving a few cases keeps the others' baselines if the settings match
+        if baseline and baseline['options'] == options:
+            results = dict(baseline['results'], **results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'options': options, 'results': results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    if baseline['options'] != options:
+        print("\nBaseline was recorded with different settings; not comparing")
+        return 0
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Serve saved TikTok pages locally so fetch engines can be exercised offline.
+
+    python tools/fixture_server.py --port 8765
+
+then point HttpFetcher(base_url="http://127.0.0.1:8765") at it. Profiles are
+served from fixtures/profile_<username>.html, videos from
+fixtures/video_<id>.html and the comment list API pages through
+fixtures/comments_<id>.json.
+
+Synthetic profiles of any size are generated on the fly: /@synth500 is a
+grid of 500 videos, each with its own page and stable pseudo-random counts,
+marked up with the same hydration JSON and data-e2e selectors as the real
+site. For benchmarks the server can also add latency, fail a share of
+requests with 503 and pad pages to a given size:
+
+    python tools/fixture_server.py --latency 0.05 --jitter 0.02 --failure-rate 0.01 --page-kb 200
+
+With --growth the newest GROWING_POSTS videos of every synthetic profile
+keep gaining views and likes while the server runs (the newest fastest),
+and the rest stay put, for exercising watch mode.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+PROFILE_RE = re.compile(r'^/@([\w.-]+)/?$')
+VIDEO_RE = re.compile(r'^/@([\w.-]+)/video/(\d+)/?$')
+COMMENT_API_PATH = '/api/comment/list/'
+
+# /@synth<count> profiles; their video IDs count up from here
+SYNTHETIC_PROFILE_RE = re.compile(r'^synth(\d+)$')
+SYNTHETIC_VIDEO_BASE = 7400000000000000000
+# With growth switched on, this many of the newest synthetic videos keep gaining counts
+GROWING_POSTS = 10
+
+
+def format_count(value):
+    """Counts as TikTok displays them: 999, 12.5K, 1.2M"""
+    for divisor, suffix in ((1000000000, 'B'), (1000000, 'M'), (1000, 'K')):
+        if value >= divisor:
+            return f"{value / divisor:.1f}".rstrip('0').rstrip('.') + suffix
+    return str(value)
+
+
+def synthetic_stats(video_id, elapsed=0.0, growth=0.0):
+    """Stable, roughly realistic counts for a synthetic video.
+
+    With growth, the newest GROWING_POSTS videos' views and likes grow by
+    that share per second of elapsed, divided by how far down the grid they are.
+    """
+    rng = random.Random(video_id)
+    views = int(rng.lognormvariate(10, 2))
+    likes = int(views * rng.uniform(0.02, 0.15))
+    position = int(video_id) - SYNTHETIC_VIDEO_BASE
+    if growth and 0 <= position < GROWING_POSTS:
+        factor = 1 + growth * elapsed / (position + 1)
+        views, likes = int(views * factor), int(likes * factor)
+    return {
+        'diggCount': likes,
+        'commentCount': int(likes * rng.uniform(0.005, 0.05)),
+        'shareCount': int(likes * rng.uniform(0.005, 0.08)),
+        'collectCount': int(likes * rng.uniform(0.01, 0.1)),
+        'playCount': views,
+    }
+
+
+def _padding(page_bytes, size):
+    # An HTML comment, so the padding only adds weight
+    missing = page_bytes - size
+    return f"<!-- {'x' * (missing - 9)} -->" if missing > 9 else ""
+
+
+def synthetic_profile_html(username, count, page_bytes=0, elapsed=0.0, growth=0.0):
+    items = []
+    grid = []
+    for index in range(count):
+        video_id = str(SYNTHETIC_VIDEO_BASE + index)
+        stats = synthetic_stats(video_id, elapsed, growth)
+        items.append({'id': video_id, 'desc': f"Synthetic post {index + 1} #bench",
+                      'author': {'uniqueId': username}, 'stats': stats})
+        grid.append(f'<div data-e2e="user-post-item"><a href="https://www.tiktok.com/@{username}/video/{video_id}">'
+                    f'<strong data-e2e="video-views">{format_count(stats["playCount"])}</strong></a></div>')
+    data = {'__DEFAULT_SCOPE__': {'webapp.user-detail': {
+        'userInfo': {'user': {'uniqueId': username}, 'stats': {'videoCount': count}},
+        'itemList': items,
+    }}}
+    html = ('<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+            f'<title>{username} (@{username}) | TikTok</title>\n'
+            f'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{json.dumps(data)}</script>\n'
+            '</head>\n<body>\n<div data-e2e="user-post-item-list">\n' + "\n".join(grid) + '\n</div>\n')
+    return html + _padding(page_bytes, len(html) + 16) + '</body>\n</html>\n'
+
+
+def synthetic_video_html(username, video_id, page_bytes=0, elapsed=0.0, growth=0.0):
+    stats = synthetic_stats(video_id, elapsed, growth)
+    caption = f"Synthetic post {int(video_id) - SYNTHETIC_VIDEO_BASE + 1} #bench"
+    item = {'id': video_id, 'desc': caption, 'author': {'uniqueId': username}, 'stats': stats,
+            'statsV2': {key: str(value) for key, value in stats.items()}}
+    data = {'__DEFAULT_SCOPE__': {'webapp.video-detail': {'itemInfo': {'itemStruct': item}}}}
+    html = ('<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+            f'<title>{caption} | TikTok</title>\n'
+            f'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{json.dumps(data)}</script>\n'
+            '</head>\n<body>\n'
+            f'<h1 data-e2e="browse-video-desc">{caption}</h1>\n'
+            '<div class="action-bar">\n'
+            f'<strong data-e2e="like-count">{format_count(stats["diggCount"])}</strong>\n'
+            f'<strong data-e2e="comment-count">{format_count(stats["commentCount"])}</strong>\n'
+            f'<strong data-e2e="undefined-count">{format_count(stats["collectCount"])}</strong>\n'
+            f'<strong data-e2e="share-count">{format_count(stats["shareCount"])}</strong>\n'
+            '</div>\n')
+    return html + _padding(page_bytes, len(html) + 16) + '</body>\n</html>\n'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the connection pooling in HttpFetcher is exercised too
+    protocol_version = 'HTTP/1.1'
+    fixtures_dir = FIXTURES_DIR
+    latency = 0.0  # seconds added to every response
+    jitter = 0.0  # up to this much more, at random
+    failure_rate = 0.0  # share of requests answered with a 503
+    page_bytes = 0  # generated pages are padded to at least this size
+    growth = 0.0  # see synthetic_stats
+    started = 0.0  # when the server started, for growth
+    rng = random.Random(0)
+
+    def do_GET(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            self.send_body(503, b"service unavailable")
+            return
+
+        path, _, query = self.path.partition('?')
+        if path == COMMENT_API_PATH:
+            self.send_comment_page(parse_qs(query))
+            return
+
+        name = None
+        match = PROFILE_RE.match(path)
+        if match:
+            synthetic = SYNTHETIC_PROFILE_RE.match(match.group(1))
+            if synthetic:
+                html = synthetic_profile_html(match.group(1), int(synthetic.group(1)), self.page_bytes,
+                                              time.time() - self.started, self.growth)
+                self.send_body(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+                return
+            name = f"profile_{match.group(1)}.html"
+        match = VIDEO_RE.match(path)
+        if match:
+            if int(match.group(2)) >= SYNTHETIC_VIDEO_BASE:
+                html = synthetic_video_html(match.group(1), match.group(2), self.page_bytes,
+                                            time.time() - self.started, self.growth)
+                self.send_body(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+                return
+            name = f"video_{match.group(2)}.html"
+
+        file_path = os.path.join(self.fixtures_dir, name) if name else None
+        if not file_path or not os.path.exists(file_path):
+            self.send_body(404, b"not found")
+            return
+        with open(file_path, 'rb') as f:
+            self.send_body(200, f.read(), 'text/html; charset=utf-8')
+
+    def send_comment_page(self, params):
+        video_id = params.get('aweme_id', [''])[0]
+        cursor = int(params.get('cursor', ['0'])[0])
+        count = int(params.get('count', ['20'])[0])
+        file_path = os.path.join(self.fixtures_dir, f"comments_{video_id}.json")
+        if not video_id.isdigit() or not os.path.exists(file_path):
+            comments = []
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                comments = json.load(f)
+        page = comments[cursor:cursor + count]
+        body = json.dumps({
+            'status_code': 0,
+            'comments': page,
+            'cursor': cursor + len(page),
+            'has_more': int(cursor + len(page) < len(comments)),
+            'total': len(comments),
+        }).encode('utf-8')
+        self.send_body(200, body, 'application/json')
+
+    def send_body(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Runs the fixture HTTP server on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=0, handler=FixtureHandler, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, page_bytes=0, seed=0, growth=0.0):
+        # Each server gets its own settings and random stream
+        handler = type(handler.__name__, (handler,), {
+            'latency': latency, 'jitter': jitter, 'failure_rate': failure_rate, 'page_bytes': page_bytes,
+            'growth': growth, 'started': time.time(), 'rng': random.Random(seed),
+        })
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved TikTok pages for offline testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to delay every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of requests to fail with 503")
+    parser.add_argument('--page-kb', type=float, default=0, help="pad synthetic pages to this size")
+    parser.add_argument('--growth', type=float, default=0.0,
+                        help="share per second the newest synthetic videos' counts grow by")
+    args = parser.parse_args()
+
+    server = FixtureServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                           failure_rate=args.failure_rate, page_bytes=int(args.page_kb * 1024), growth=args.growth)
+    print(f"Serving fixtures from {FIXTURES_DIR} at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measure what lean page loading saves per video page.
+
+    python tools/measure_lean.py https://www.tiktok.com/@user/video/123 [more URLs...]
+
+Loads each URL once in a normal browser and once in a lean one (media
+blocked, eager page-load strategy) and reports, per page and on average,
+the bytes transferred and the time until the counters could be read.
+Bytes come from Chrome's network log, so they include cross-origin media
+that the page's own performance API can't see. Each pass gets a fresh
+temporary Chrome profile, so neither is served from the other's disk cache.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tea.analyzer import setup_browser  # noqa: E402
+from tea.extract import extract_video_metrics  # noqa: E402
+
+
+def page_weight(driver):
+    """Bytes received and requests finished/blocked since the log was last read"""
+    received, finished, blocked = 0, 0, 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            received += message['params'].get('encodedDataLength', 0)
+            finished += 1
+        elif message['method'] == 'Network.loadingFailed' and message['params'].get('blockedReason'):
+            blocked += 1
+    return received, finished, blocked
+
+
+def measure(driver, url):
+    driver.get('about:blank')
+    page_weight(driver)  # drop whatever the previous page left in the log
+    started = time.perf_counter()
+    driver.get(url)
+    extract_video_metrics(driver)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # Give late media a moment to show up, so the full page isn't undercounted
+    time.sleep(2)
+    received, finished, blocked = page_weight(driver)
+    return {'ms': elapsed_ms, 'bytes': received, 'requests': finished, 'blocked': blocked}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare full and lean page loads")
+    parser.add_argument('urls', nargs='+', help="video URLs to load")
+    parser.add_argument('--show-browser', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for lean in (False, True):
+        user_data_dir = tempfile.mkdtemp(prefix='tea-measure-')
+        try:
+            driver = setup_browser(not args.show_browser, user_data_dir=user_data_dir, lean=lean, log_network=True)
+            try:
+                results[lean] = [measure(driver, url) for url in args.urls]
+            finally:
+                driver.quit()
+        finally:
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+
+    print(f"{'page':<6}{'full KB':>10}{'lean KB':>10}{'saved KB':>10}{'full ms':>10}{'lean ms':>10}{'saved ms':>10}")
+    for number, (full, lean) in enumerate(zip(results[False], results[True]), 1):
+        print(f"{number:<6}{full['bytes'] / 1024:>10.0f}{lean['bytes'] / 1024:>10.0f}"
+              f"{(full['bytes'] - lean['bytes']) / 1024:>10.0f}{full['ms']:>10.0f}{lean['ms']:>10.0f}"
+              f"{full['ms'] - lean['ms']:>10.0f}")
+    count = len(args.urls)
+    full_bytes = sum(r['bytes'] for r in results[False]) / count
+    lean_bytes = sum(r['bytes'] for r in results[True]) / count
+    full_ms = sum(r['ms'] for r in results[False]) / count
+    lean_ms = sum(r['ms'] for r in results[True]) / count
+    print(f"\nAverage per page: {(full_bytes - lean_bytes) / 1024:.0f} KB saved "
+          f"({1 - lean_bytes / max(full_bytes, 1):.0%}), {full_ms - lean_ms:.0f} ms saved "
+          f"({1 - lean_ms / max(full_ms, 1):.0%}); "
+          f"{sum(r['blocked'] for r in results[True]) / count:.0f} requests blocked per lean page")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,67 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 import time
-import random
-import psutil
+STARTUP_STARTED = time.perf_counter()  # startup is timed from here to the first drawn window
+import argparse
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import numpy as np
 import os
-from selenium.webdriver.common.keys import Keys
+import queue
+import threading
+from tea.analyzer import ProfileAnalyzer
+from tea.browser_sessions import LazySession
+from tea.comment_analytics import CommentAnalyzer, load_analytics
+from tea.comments import (CommentStore, collect_comments, iter_comment_pages_browser, iter_comment_pages_http,
+                          video_id_from_url)
+from tea.export import export_comments, export_posts, load_posts
+from tea.history import parse_video_url
+from tea.metrics import profile_stats
+from tea.pacing import PacingCancelled
+from tea.post_store import PostStore
+from tea.runs import RunCheckpoint, latest_unfinished_run
+from tea.telemetry import METRICS, profiled
+
+# Fetch mode label -> mode passed to the scrape worker
+FETCH_MODES = {
+    "Auto (HTTP, browser fallback)": 'auto',
+    "HTTP only": 'http',
+    "Browser only": 'browser',
+}
+
+# Comments are rendered a page at a time, keeping at most a window of them
+COMMENTS_PAGE_SIZE = 200
+COMMENTS_WINDOW_SIZE = 600
+
+# History tab: what to chart, how far back, and how many fast risers to list
+HISTORY_SERIES = {
+    "Engagement Rate (%)": 'er_rate',
+    "Views": 'views',
+    "Likes": 'likes',
+    "Comments": 'comments',
+    "Shares": 'shares',
+}
+HISTORY_PERIODS = {
+    "Last 24 hours": 24 * 3600,
+    "Last 7 days": 7 * 24 * 3600,
+    "Last 30 days": 30 * 24 * 3600,
+    "Last year": 365 * 24 * 3600,
+    "All time": None,
+}
+HISTORY_TOP_N = 20
+
+# Import/export file types; the format follows the extension
+RESULT_FILETYPES = [
+    ("CSV", "*.csv"),
+    ("JSON Lines", "*.jsonl"),
+    ("Columnar (memory-mappable)", "*.tcol"),
+    ("All files", "*.*"),
+]
+# Imported rows are added to the table this many per tick, so the window stays responsive
+TABLE_FILL_CHUNK = 2000
+# Seconds closing the window waits for the scrape and comment workers to stop
+SHUTDOWN_TIMEOUT = 5
 
 class TikTokAnalyzer:
-    def __init__(self):
+    def __init__(self, prewarm=False, exit_after_startup=False):
         # Initialize the main window
         self.root = tk.Tk()
         self.root.title("TikTok Engagement Analyzer")
@@ -36,12 +84,62 @@ class TikTokAnalyzer:
             5: 100,  # Comments
             6: 80,   # Saves
             7: 80,   # Shares
-            8: 80    # ER Rate
+            8: 80,   # ER Rate
+            9: 90    # Sentiment
         }
+        self.table_columns = ('index', 'caption', 'url', 'views', 'likes', 'comments', 'saves', 'shares', 'er_rate',
+                              'sentiment')
+        self.table_sort = (None, False)  # (column, descending)
         
         # Initialize variables
         self.headless_var = tk.BooleanVar(value=False)
-        self.posts_data = []
+        self.lean_var = tk.BooleanVar(value=True)
+        self.profile_run_var = tk.BooleanVar(value=False)
+        self.posts_data = PostStore()  # columnar, indexed by URL so refreshed posts update in place
+        
+        # Background scrape worker state
+        self.results_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.scrape_thread = None
+        self.posts_expected = 0
+        self.posts_processed = 0
+        self.current_run = None  # checkpoint of the latest run, for resuming and its failure report
+        self.table_fill = None  # pending after() adding imported rows to the table
+        self.table_filled = 0  # rows of the store already in the table while filling
+        
+        # Exported comments are streamed out on a worker
+        self.export_queue = queue.Queue()
+        self.export_thread = None
+        
+        # The scrape core: warm browser sessions, the pooled keep-alive HTTP
+        # client and the post cache, shared with the comment fetcher
+        self.analyzer = ProfileAnalyzer()
+        self.browser_sessions = self.analyzer.browser_sessions
+        self.http_fetcher = self.analyzer.http_fetcher
+        self.post_cache = self.analyzer.post_cache
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Comments are fetched on demand and spooled to disk per video
+        self.comment_store = CommentStore()
+        self.comments_queue = queue.Queue()
+        self.comments_cancel = threading.Event()
+        self.comments_thread = None
+        self.comments_post_url = None  # post whose comments are on screen
+        self.comments_view = None  # the window of comments currently rendered
+        self.comments_paging = False
+        
+        # Spooled comments are scored offline on a process pool, one batch of posts at a time
+        self.comment_analyzer = CommentAnalyzer()
+        self.analytics_requests = queue.Queue()
+        self.analytics_results = queue.Queue()
+        self.analytics_thread = None
+        self.analytics_announce = False  # report in the status bar when the current batch lands
+        self.debug_refresh = None  # pending Debug tab redraw
+        
+        # Every fetched post is kept as a snapshot; the History tab charts them
+        self.history = self.analyzer.history
+        self.history_post_url = None  # post charted on the History tab, None for the whole profile
+        self.history_series = None  # (times, values, title, value format) being charted
         
         # Configure ttk styles
         self.style = ttk.Style()
@@ -84,21 +182,35 @@ class TikTokAnalyzer:
         # Add hover style
         self.style.configure('Hover.TFrame', background=self.TIKTOK_LIGHT_GRAY)
         
+        # Posts table styles
+        self.style.configure("Treeview",
+                            background=self.TIKTOK_BLACK,
+                            fieldbackground=self.TIKTOK_BLACK,
+                            foreground=self.TIKTOK_WHITE,
+                            font=('Segoe UI', 10),
+                            rowheight=28)
+        self.style.configure("Treeview.Heading",
+                            background=self.TIKTOK_GRAY,
+                            foreground=self.TIKTOK_WHITE,
+                            font=('Segoe UI', 10, 'bold'),
+                            relief='solid')
+        self.style.map("Treeview",
+                      background=[('selected', self.TIKTOK_LIGHT_GRAY)])
+        self.style.map("Treeview.Heading",
+                      background=[('active', self.TIKTOK_RED)])
+        
         # Set window background
         self.root.configure(bg=self.TIKTOK_BLACK)
         
         # Setup GUI
         self.setup_gui()
         
-        # Add table styles
-        self.style.configure('Header.TFrame', 
-                            background=self.TIKTOK_GRAY,
-                            relief='solid',
-                            borderwidth=1)
-        self.style.configure('Cell.TFrame',
-                            background=self.TIKTOK_BLACK,
-                            relief='solid',
-                            borderwidth=1)
+        # Startup is measured to the first time the window is drawn; a browser
+        # is only pre-warmed after that, so it never delays the window
+        self.prewarm = prewarm
+        self.exit_after_startup = exit_after_startup
+        self.startup_seconds = None
+        self.root.bind('<Map>', self.on_window_mapped, add='+')
         
     def setup_gui(self):
         # Main frame
@@ -131,6 +243,20 @@ class TikTokAnalyzer:
         self.username_entry = create_entry_frame(input_frame, "TikTok Username:")
         self.engagement_entry = create_entry_frame(input_frame, "Desired Engagement Rate (%):", "13")
         self.posts_entry = create_entry_frame(input_frame, "Posts to Analyze:", "5")
+        self.sessions_entry = create_entry_frame(input_frame, "Browser Sessions:", "2")
+        self.cache_ttl_entry = create_entry_frame(input_frame, "Cache Freshness (hours):", "6")
+        
+        # Fetch mode selector
+        mode_frame = ttk.Frame(input_frame)
+        mode_frame.pack(fill=tk.X, pady=5)
+        mode_label = ttk.Label(mode_frame, text="Fetch Mode:")
+        mode_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.fetch_mode_combo = ttk.Combobox(mode_frame,
+                                            values=list(FETCH_MODES),
+                                            state='readonly',
+                                            width=30)
+        self.fetch_mode_combo.current(0)
+        self.fetch_mode_combo.pack(side=tk.LEFT)
         
         # Headless mode checkbox
         headless_frame = ttk.Frame(input_frame)
@@ -141,77 +267,161 @@ class TikTokAnalyzer:
                                         style="TCheckbutton")
         headless_check.pack(side=tk.LEFT)
         
-        # Analyze button
-        analyze_button = ttk.Button(main_frame,
-                                   text="Analyze Profile",
-                                   command=self.analyze_profile,
-                                   style="Accent.TButton")
-        analyze_button.pack(pady=(0, 15))
+        # Lean pages block video, images and fonts - only the counters are read
+        lean_check = ttk.Checkbutton(headless_frame,
+                                    text="Lean Pages (skip video & images)",
+                                    variable=self.lean_var,
+                                    command=lambda: self.analyzer.set_lean(self.lean_var.get()),
+                                    style="TCheckbutton")
+        lean_check.pack(side=tk.LEFT, padx=(15, 0))
+        
+        # Analyze / Cancel buttons
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(pady=(0, 10))
+        self.analyze_button = ttk.Button(buttons_frame,
+                                        text="Analyze Profile",
+                                        command=self.analyze_profile,
+                                        style="Accent.TButton")
+        self.analyze_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(buttons_frame,
+                                       text="Cancel",
+                                       command=self.cancel_analysis,
+                                       state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.import_button = ttk.Button(buttons_frame,
+                                       text="Import Results...",
+                                       command=self.import_results)
+        self.import_button.pack(side=tk.LEFT, padx=5)
+        export_button = ttk.Button(buttons_frame,
+                                   text="Export Results...",
+                                   command=self.export_results)
+        export_button.pack(side=tk.LEFT, padx=5)
+        
+        # Progress bar and status line
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill=tk.X, pady=(0, 5))
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=1)
+        self.progress_bar.pack(fill=tk.X)
+        self.status_label = ttk.Label(progress_frame, text="Ready")
+        self.status_label.pack(anchor='w', pady=(5, 0))
         
         # Notebook for tabs
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True, pady=15)
         
-        # Create tabs
+        # Create tabs; only the posts tab is filled in before the window
+        # shows, the others are built the first time they're opened
         posts_frame = ttk.Frame(self.notebook)
-        comments_frame = ttk.Frame(self.notebook)
+        self.comments_frame = ttk.Frame(self.notebook)
+        self.history_frame = ttk.Frame(self.notebook)
+        self.debug_frame = ttk.Frame(self.notebook)
+        self.pending_tabs = {
+            str(self.comments_frame): self.build_comments_tab,
+            str(self.history_frame): self.build_history_tab,
+            str(self.debug_frame): self.build_debug_tab,
+        }
         
         self.notebook.add(posts_frame, text="Posts Analysis")
-        self.notebook.add(comments_frame, text="Comments Analysis")
+        self.notebook.add(self.comments_frame, text="Comments Analysis")
+        self.notebook.add(self.history_frame, text="History")
+        self.notebook.add(self.debug_frame, text="Debug")
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
         
-        # Posts tab content - create table-like view
+        # Posts tab content - a Treeview only draws the rows in view, so it
+        # stays fast with tens of thousands of posts
         table_frame = ttk.Frame(posts_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(15,0))
         
+        # "EXAMPLE" label above the example row, hidden once an analysis starts
+        self.example_label = ttk.Label(
+            table_frame,
+            text="EXAMPLE DATA - Click 'Analyze Profile' to see real data",
+            font=('Segoe UI', 10, 'italic'),
+            foreground=self.TIKTOK_RED
+        )
+        self.example_label.pack(anchor='w', pady=(5,2), padx=5)
+        
+        # Profile-wide benchmark summary
+        self.summary_label = ttk.Label(table_frame, text="")
+        self.summary_label.pack(anchor='w', pady=(0, 5), padx=5)
+        
         # Headers
-        headers = ["#", "Caption", "URL", "👁️ Views", "❤️ Likes", "💬 Comments", "⭐ Saves", "↪️ Shares", "📊 ER Rate"]
+        headers = ["#", "Caption", "URL", "👁️ Views", "❤️ Likes", "💬 Comments", "⭐ Saves", "↪️ Shares", "📊 ER Rate",
+                   "🙂 Sentiment"]
         
-        # Create header cells
-        for i, header in enumerate(headers):
-            cell_frame = ttk.Frame(table_frame, style='Header.TFrame', width=self.column_widths[i])
-            cell_frame.grid(row=0, column=i, sticky='nsew', padx=1, pady=1)
-            cell_frame.grid_propagate(False)
-            
-            label = ttk.Label(cell_frame, 
-                             text=header,
-                             font=('Segoe UI', 10, 'bold'),
-                             foreground=self.TIKTOK_WHITE,
-                             anchor='center')
-            label.pack(expand=True, fill='both', padx=5, pady=5)
-        
-        # Configure grid weights
-        for i in range(len(headers)):
-            table_frame.grid_columnconfigure(i, weight=1, minsize=self.column_widths[i])
-        
-        # Create scrollable frame for posts
-        canvas = tk.Canvas(table_frame, bg=self.TIKTOK_BLACK, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=canvas.yview)
-        self.posts_container = ttk.Frame(canvas)
-        
-        # Configure scroll region
-        def configure_scroll_region(event):
-            canvas.configure(scrollregion=canvas.bbox("all"))
-        
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.grid(row=1, column=0, columnspan=len(headers), sticky='nsew')
-        scrollbar.grid(row=1, column=len(headers), sticky='ns')
-        
-        # Create a window inside the canvas for the posts container
-        canvas.create_window((0, 0), window=self.posts_container, anchor="nw")
-        self.posts_container.bind('<Configure>', configure_scroll_region)
-        
-        # Configure posts container grid
-        for i in range(len(headers)):
-            self.posts_container.grid_columnconfigure(i, weight=1, minsize=self.column_widths[i])
-        
-        # Comments tab - create split view
-        paned_window = ttk.PanedWindow(comments_frame, orient=tk.HORIZONTAL)
+        self.posts_tree = ttk.Treeview(table_frame,
+                                      columns=self.table_columns,
+                                      show='headings',
+                                      selectmode='browse')
+        for i, (column, header) in enumerate(zip(self.table_columns, headers)):
+            self.posts_tree.heading(column, text=header,
+                                    command=lambda c=column: self.sort_posts_table(c))
+            self.posts_tree.column(column,
+                                   width=self.column_widths[i],
+                                   minwidth=self.column_widths[i],
+                                   anchor='w' if column == 'caption' else 'center',
+                                   stretch=column == 'caption')
+        
+        # ER colouring against the desired rate
+        self.posts_tree.tag_configure('er_met', foreground="#4CAF50")
+        self.posts_tree.tag_configure('er_below', foreground=self.TIKTOK_RED)
+        
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.posts_tree.yview)
+        self.posts_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.posts_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # Clicking the URL cell copies it, clicking anywhere else opens the comments
+        self.posts_tree.bind('<ButtonRelease-1>', self.on_posts_table_click)
+        self.posts_tree.bind('<Control-c>', lambda e: self.copy_selected_post_url())
+        self.engagement_entry.bind('<Return>', lambda e: self.refresh_er_colors())
+        self.engagement_entry.bind('<FocusOut>', lambda e: self.refresh_er_colors())
+        
+        # Now add the example data after all widgets are created
+        example_post = {
+            'url': 'https://www.tiktok.com/@example/video/1234567890',
+            'caption': 'This is an example TikTok post! Click to see comments.',
+            'views': 100000,
+            'likes': 50000,
+            'comments': 500,
+            'saves': 1000,
+            'shares': 2500,
+            'er_rate': 53.50,
+            'comments_data': [
+                "This is example comment #1!",
+                "Here's another example comment!",
+                "Click Analyze Profile to see real comments!",
+                "Example comment #4 showing formatting",
+                "Last example comment demonstrating layout"
+            ]
+        }
+        
+        # Add the example row
+        self.add_post_to_table(example_post)
+
+    def on_tab_changed(self, event=None):
+        """Build a tab the first time it's opened, then refresh it"""
+        self.ensure_tab(self.notebook.select())
+        self.refresh_debug_panel()
+        if self.notebook.select() == str(self.history_frame):
+            self.show_history()
+
+    def ensure_tab(self, frame):
+        builder = self.pending_tabs.pop(str(frame), None)
+        if builder:
+            builder()
+
+    def build_comments_tab(self):
+        """Comments tab - split view of post details and the comment pane"""
+        paned_window = ttk.PanedWindow(self.comments_frame, orient=tk.HORIZONTAL)
         paned_window.pack(fill=tk.BOTH, expand=True)
         
         # Left side - Posts list
         posts_list_frame = ttk.Frame(paned_window)
         posts_label = ttk.Label(posts_list_frame, text="Posts", font=('Segoe UI', 11, 'bold'))
         posts_label.pack(pady=(0, 5))
+        ttk.Button(posts_list_frame, text="Score All Comments",
+                   command=self.score_all_comments).pack(fill=tk.X, pady=(0, 5))
         
         self.posts_list = tk.Text(posts_list_frame,
                                  height=20,
@@ -230,6 +440,17 @@ class TikTokAnalyzer:
         comments_label = ttk.Label(comments_view_frame, text="Comments", font=('Segoe UI', 11, 'bold'))
         comments_label.pack(pady=(0, 5))
         
+        # Search over the spooled comments
+        search_frame = ttk.Frame(comments_view_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+        self.comments_search_entry = ttk.Entry(search_frame, width=25)
+        self.comments_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=3)
+        self.comments_search_entry.bind('<Return>', lambda e: self.search_comments())
+        ttk.Button(search_frame, text="Search", command=self.search_comments).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(search_frame, text="Clear", command=self.clear_comment_search).pack(side=tk.LEFT, padx=(5, 0))
+        self.comments_status = ttk.Label(comments_view_frame, text="")
+        self.comments_status.pack(side=tk.BOTTOM, anchor='w', pady=(5, 0))
+        
         self.comments_text = tk.Text(comments_view_frame,
                                     height=20,
                                     width=35,
@@ -253,245 +474,246 @@ class TikTokAnalyzer:
             scrollbar.pack(side="right", fill="y")
             text_widget.configure(yscrollcommand=scrollbar.set)
         
-        # Now add the example data after all widgets are created
-        example_post = {
-            'url': 'https://www.tiktok.com/@example/video/1234567890',
-            'caption': 'This is an example TikTok post! Click to see comments.',
-            'views': 100000,
-            'likes': 50000,
-            'comments': 500,
-            'saves': 1000,
-            'shares': 2500,
-            'er_rate': 53.50,
-            'comments_data': [
-                "This is example comment #1!",
-                "Here's another example comment!",
-                "Click Analyze Profile to see real comments!",
-                "Example comment #4 showing formatting",
-                "Last example comment demonstrating layout"
-            ]
-        }
+        # The comments pane pages in more comments as it nears either end
+        comments_scrollbar = scrollbar
+        def on_comments_scroll(first, last):
+            comments_scrollbar.set(first, last)
+            self.on_comments_scroll(float(first), float(last))
+        self.comments_text.configure(yscrollcommand=on_comments_scroll)
+        self.comments_text.tag_configure('match', background=self.TIKTOK_RED, foreground=self.TIKTOK_WHITE)
+
+    def build_history_tab(self):
+        """History tab - a profile's or a post's trend over time, and its fastest-growing posts"""
+        controls = ttk.Frame(self.history_frame)
+        controls.pack(fill=tk.X, padx=15, pady=(15, 5))
+        ttk.Label(controls, text="Profile:").pack(side=tk.LEFT, padx=(0, 5))
+        self.history_user_entry = ttk.Entry(controls, width=20)
+        self.history_user_entry.pack(side=tk.LEFT, ipady=3)
+        self.history_user_entry.bind('<Return>', lambda e: self.show_history(profile=True))
+        self.history_series_combo = ttk.Combobox(controls, values=list(HISTORY_SERIES), state='readonly', width=20)
+        self.history_series_combo.current(0)
+        self.history_series_combo.pack(side=tk.LEFT, padx=(10, 0))
+        self.history_period_combo = ttk.Combobox(controls, values=list(HISTORY_PERIODS), state='readonly', width=14)
+        self.history_period_combo.current(1)
+        self.history_period_combo.pack(side=tk.LEFT, padx=(10, 0))
+        for combo in (self.history_series_combo, self.history_period_combo):
+            combo.bind('<<ComboboxSelected>>', lambda e: self.show_history())
+        ttk.Button(controls, text="Show Profile",
+                   command=lambda: self.show_history(profile=True)).pack(side=tk.LEFT, padx=(10, 0))
         
-        # Add "EXAMPLE" label above the example row
-        example_label = ttk.Label(
-            self.posts_container,
-            text="EXAMPLE DATA - Click 'Analyze Profile' to see real data",
-            font=('Segoe UI', 10, 'italic'),
-            foreground=self.TIKTOK_RED
-        )
-        example_label.grid(row=0, column=0, columnspan=len(headers), pady=(5,2), sticky='w', padx=5)
+        self.history_summary = ttk.Label(self.history_frame, text="")
+        self.history_summary.pack(anchor='w', padx=15)
+        self.history_canvas = tk.Canvas(self.history_frame,
+                                        height=260,
+                                        bg=self.TIKTOK_GRAY,
+                                        highlightthickness=0)
+        self.history_canvas.pack(fill=tk.BOTH, expand=True, padx=15, pady=(5, 10))
+        self.history_canvas.bind('<Configure>', lambda e: self.draw_history_chart())
         
-        # Add the example row
-        self.add_post_to_table(example_post)
+        # Fastest-growing posts in the period; selecting one charts it
+        ttk.Label(self.history_frame, text="Fastest growing posts (views per hour)",
+                  font=('Segoe UI', 11, 'bold')).pack(anchor='w', padx=15)
+        top_frame = ttk.Frame(self.history_frame)
+        top_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(5, 15))
+        self.history_tree = ttk.Treeview(top_frame,
+                                         columns=('url', 'gained', 'per_hour'),
+                                         show='headings',
+                                         selectmode='browse',
+                                         height=6)
+        for column, header, width in (('url', "Post", 400), ('gained', "👁️ Views Gained", 140),
+                                      ('per_hour', "Views / Hour", 120)):
+            self.history_tree.heading(column, text=header)
+            self.history_tree.column(column, width=width, anchor='w' if column == 'url' else 'center',
+                                     stretch=column == 'url')
+        scrollbar = ttk.Scrollbar(top_frame, orient="vertical", command=self.history_tree.yview)
+        self.history_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.history_tree.pack(fill=tk.BOTH, expand=True)
+        self.history_tree.bind('<<TreeviewSelect>>', self.on_history_post_selected)
 
-    def kill_chrome_processes(self):
-        try:
-            for proc in psutil.process_iter(['name']):
-                try:
-                    if proc.info['name'] and 'chrome' in proc.info['name'].lower():
-                        proc.kill()
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            time.sleep(2)  # Give more time for Chrome to fully close
-        except Exception as e:
-            print(f"Error killing Chrome processes: {str(e)}")
-
-    def setup_browser(self):
-        self.kill_chrome_processes()  # Make sure to close existing Chrome instances
-        
-        chrome_options = Options()
-        if self.headless_var.get():
-            chrome_options.add_argument('--headless=new')  # Updated headless argument
-        
-        # Your specific profile path
-        user_data_dir = r"C:\Users\xlkay\AppData\Local\Google\Chrome\User Data"
-        profile_directory = "Default"  # This is your Person 1 profile
-        
-        # Add profile arguments
-        chrome_options.add_argument(f'--user-data-dir={user_data_dir}')
-        chrome_options.add_argument(f'--profile-directory={profile_directory}')
-        
-        # Anti-detection measures
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-        chrome_options.add_argument('--disable-site-isolation-trials')
-        chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        # Additional preferences to maintain login state
-        prefs = {
-            "profile.default_content_setting_values.notifications": 2,
-            "credentials_enable_service": False,
-            "profile.password_manager_enabled": False,
-            "profile.default_content_settings.popups": 0,
-        }
-        chrome_options.add_experimental_option("prefs", prefs)
-        
-        try:
-            driver = webdriver.Chrome(options=chrome_options)
-            
-            # Execute CDP commands to prevent detection
-            driver.execute_cdp_cmd('Network.setUserAgentOverride', {
-                "userAgent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            })
-            
-            # Additional stealth scripts
-            driver.execute_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-                
-                // Overwrite the `plugins` property to use a custom getter.
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5]
-                });
-                
-                // Overwrite the `languages` property to use a custom getter.
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['en-US', 'en']
-                });
-                
-                // Pass the Permissions Test.
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-            """)
-            
-            return driver
-            
-        except Exception as e:
-            print(f"Error setting up browser: {str(e)}")
-            raise e
+    def build_debug_tab(self):
+        """Debug tab - live timings, counters and pacing, refreshed while it's open"""
+        debug_buttons = ttk.Frame(self.debug_frame)
+        debug_buttons.pack(fill=tk.X, padx=15, pady=(15, 5))
+        ttk.Button(debug_buttons, text="Refresh", command=self.refresh_debug_panel).pack(side=tk.LEFT)
+        ttk.Button(debug_buttons, text="Export...", command=self.export_metrics).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(debug_buttons, text="Reset", command=self.reset_metrics).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Checkbutton(debug_buttons,
+                        text="cProfile next run",
+                        variable=self.profile_run_var,
+                        style="TCheckbutton").pack(side=tk.LEFT, padx=(15, 0))
+        self.debug_text = tk.Text(self.debug_frame,
+                                 bg=self.TIKTOK_GRAY,
+                                 fg=self.TIKTOK_WHITE,
+                                 insertbackground=self.TIKTOK_WHITE,
+                                 font=('Consolas', 10),
+                                 relief="flat",
+                                 wrap=tk.NONE,
+                                 padx=15,
+                                 pady=15)
+        self.debug_text.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
 
     def analyze_profile(self):
+        """Validate the inputs and start the scrape worker in the background"""
+        if self.scrape_thread and self.scrape_thread.is_alive():
+            return
+        
         try:
             username = self.username_entry.get().strip()
             desired_rate = float(self.engagement_entry.get())
             posts_to_analyze = int(self.posts_entry.get())
-            
-            if not username:
-                messagebox.showerror("Error", "Please enter a username")
-                return
-            
-            # Clear existing posts
-            for widget in self.posts_container.winfo_children():
-                widget.destroy()
-            self.posts_data = []
-            
-            driver = self.setup_browser()
-            
+            browser_sessions = max(1, int(self.sessions_entry.get() or "1"))
+            cache_ttl_hours = float(self.cache_ttl_entry.get() or "0")
+        except ValueError as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        
+        if not username:
+            messagebox.showerror("Error", "Please enter a username")
+            return
+        
+        # Every run is checkpointed; offer to pick up one that didn't finish
+        fetch_mode = FETCH_MODES[self.fetch_mode_combo.get()]
+        run = latest_unfinished_run(username)
+        if run and (run.posts or run.links) and messagebox.askyesno(
+                "Resume Run",
+                f"Run {run.run_id} of @{username} stopped with {len(run.posts)} of "
+                f"{len(run.links)} posts analyzed.\n\nResume it instead of starting over?"):
+            # Carry on the way it started; the mode is shown so the switch isn't a surprise
+            posts_to_analyze = run.meta['posts_to_analyze']
+            fetch_mode = run.meta.get('fetch_mode', fetch_mode)
+            self.fetch_mode_combo.set(next(label for label, mode in FETCH_MODES.items() if mode == fetch_mode))
+        else:
             try:
-                # Add random delay before navigation
-                time.sleep(random.uniform(2, 4))
-                
-                # Navigate to profile
-                driver.get(f"https://www.tiktok.com/@{username}")
-                
-                # Wait for videos to load with retry
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_all_elements_located((By.CSS_SELECTOR, '[data-e2e="user-post-item"]'))
-                        )
-                        break
-                    except Exception:
-                        if attempt == max_retries - 1:
-                            raise
-                        time.sleep(2)
-                    
-                # Get video links first
-                video_links = []
-                video_elements = driver.find_elements(By.CSS_SELECTOR, '[data-e2e="user-post-item"] a')[:posts_to_analyze]
-                
-                for video in video_elements:
-                    try:
-                        href = video.get_attribute('href')
-                        if href:
-                            video_links.append(href)
-                    except:
-                        continue
-                    
-                # Now process each video URL directly
-                for idx, video_url in enumerate(video_links, 1):
-                    try:
-                        # Navigate directly to video URL
-                        driver.get(video_url)
-                        time.sleep(2)  # Wait for page load
-                        
-                        # Wait for and get engagement metrics with retry
-                        def get_metric(selector):
-                            for _ in range(3):
-                                try:
-                                    element = WebDriverWait(driver, 5).until(
-                                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                                    )
-                                    return element.text
-                                except:
-                                    time.sleep(1)
-                            return "0"
-                        
-                        likes = get_metric('[data-e2e="like-count"]')
-                        comments = get_metric('[data-e2e="comment-count"]')
-                        shares = get_metric('[data-e2e="share-count"]')
-                        
-                        # Convert metrics
-                        def convert_metric(metric):
-                            try:
-                                metric = metric.lower().strip()
-                                if not metric or metric == '':
-                                    return 0
-                                if 'k' in metric:
-                                    return float(metric.replace('k', '')) * 1000
-                                elif 'm' in metric:
-                                    return float(metric.replace('m', '')) * 1000000
-                                return float(metric)
-                            except:
-                                return 0
-                        
-                        likes_count = convert_metric(likes)
-                        comments_count = convert_metric(comments)
-                        shares_count = convert_metric(shares)
-                        saves_count = 0  # TikTok doesn't show saves publicly
-                        views_count = likes_count * 1.5  # Estimated views based on likes
-                        
-                        # Calculate engagement
-                        engagement = ((likes_count + comments_count + shares_count) / views_count) * 100 if views_count > 0 else 0
-                        
-                        # Create post data dictionary
-                        post_data = {
-                            'url': video_url,
-                            'views': int(views_count),
-                            'likes': int(likes_count),
-                            'comments': int(comments_count),
-                            'saves': int(saves_count),
-                            'shares': int(shares_count),
-                            'er_rate': engagement,
-                            'comments_data': []  # Will be populated when viewing comments
-                        }
-                        
-                        # Add to table
-                        self.add_post_to_table(post_data)
-                        
-                    except Exception as e:
-                        print(f"Error analyzing post {idx}: {str(e)}")
-                    
-                    # Small delay between videos
-                    time.sleep(random.uniform(1, 2))
-                
-            finally:
-                try:
-                    driver.quit()
-                except:
-                    pass
-                
+                run = RunCheckpoint.create(username, posts_to_analyze, fetch_mode)
+            except OSError as e:
+                messagebox.showerror("Error", f"An error occurred: {str(e)}")
+                return
+        self.current_run = run
+        
+        # Clear existing posts
+        self.stop_table_fill()
+        self.example_label.pack_forget()
+        self.posts_tree.delete(*self.posts_tree.get_children())
+        self.posts_data.clear()
+        
+        # Fill the table straight away from the cache; the worker then only
+        # fetches new and stale posts and updates their rows in place
+        self.post_cache.ttl_seconds = cache_ttl_hours * 3600
+        for post_data in self.post_cache.load_profile(username, posts_to_analyze):
+            self.add_post_to_table(post_data)
+        self.update_profile_summary()
+        
+        # Reset progress
+        self.posts_expected = posts_to_analyze
+        self.posts_processed = 0
+        self.progress_bar.configure(maximum=max(posts_to_analyze, 1), value=0)
+        if self.posts_data:
+            self.status_label.configure(text=f"Showing {len(self.posts_data)} cached posts, refreshing @{username}...")
+        else:
+            self.status_label.configure(text=f"Starting analysis of @{username}...")
+        self.analyze_button.configure(state=tk.DISABLED)
+        self.import_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        
+        # Tk is not thread-safe, so the worker only gets plain values and
+        # reports back through the results queue
+        self.cancel_event.clear()
+        profile_path = None
+        if self.profile_run_var.get():
+            profile_path = os.path.join(run.directory, 'profile.prof')
+            self.profile_run_var.set(False)
+        self.scrape_thread = threading.Thread(
+            target=self.scrape_profile,
+            args=(username, posts_to_analyze, self.headless_var.get(), browser_sessions, fetch_mode, run,
+                  profile_path),
+            daemon=True
+        )
+        self.scrape_thread.start()
+        self.root.after(100, self.process_results_queue)
+
+    def cancel_analysis(self):
+        """Ask the scrape worker to stop after the current video"""
+        self.cancel_event.set()
+        self.cancel_button.configure(state=tk.DISABLED)
+        self.status_label.configure(text="Cancelling...")
+
+    def scrape_profile(self, username, posts_to_analyze, headless, browser_sessions=1, fetch_mode='auto',
+                       checkpoint=None, profile_path=None):
+        """Scrape a profile on the worker thread, queueing each message for the GUI"""
+        emit = lambda kind, payload: self.results_queue.put((kind, payload))
+        try:
+            if profile_path:
+                with profiled(profile_path):
+                    self.analyzer.scrape_profile(username, posts_to_analyze, emit, self.cancel_event, headless,
+                                                 browser_sessions, fetch_mode, checkpoint)
+                print(f"Profile saved to {profile_path}")
+            else:
+                self.analyzer.scrape_profile(username, posts_to_analyze, emit, self.cancel_event, headless,
+                                             browser_sessions, fetch_mode, checkpoint)
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            self.results_queue.put(('error', str(e)))
+        finally:
+            self.results_queue.put(('done', self.cancel_event.is_set()))
+
+    def process_results_queue(self):
+        """Drain worker messages into the GUI; runs on the Tk main loop via root.after"""
+        finished = False
+        tick_started = time.perf_counter()
+        try:
+            # Cap the work per tick so a burst of results can't stall the window
+            for _ in range(50):
+                kind, payload = self.results_queue.get_nowait()
+                if kind == 'post':
+                    self.add_post_to_table(payload)
+                    self.posts_processed += 1
+                    self.progress_bar.configure(value=self.posts_processed)
+                    self.status_label.configure(
+                        text=f"Analyzed {self.posts_processed} of {self.posts_expected} posts")
+                elif kind == 'skipped':
+                    self.posts_processed += 1
+                    self.progress_bar.configure(value=self.posts_processed)
+                elif kind == 'total':
+                    self.posts_expected = payload
+                    self.progress_bar.configure(maximum=max(payload, 1))
+                elif kind == 'status':
+                    self.status_label.configure(text=payload)
+                elif kind == 'error':
+                    messagebox.showerror("Error", f"An error occurred: {payload}")
+                elif kind == 'done':
+                    finished = True
+                    cancelled = payload
+                    break
+        except queue.Empty:
+            pass
+        METRICS.observe('gui.results_tick', time.perf_counter() - tick_started)
+        
+        if not finished:
+            self.root.after(100, self.process_results_queue)
+            return
+        
+        # Worker has exited - restore the controls
+        self.analyze_button.configure(state=tk.NORMAL)
+        self.import_button.configure(state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.DISABLED)
+        verb = "Cancelled after" if cancelled else "Finished:"
+        self.status_label.configure(
+            text=f"{verb} {self.posts_processed} posts analyzed (run {self.current_run.run_id})")
+        self.update_profile_summary()
+        pacing = self.analyzer.pacer.describe()
+        if pacing:
+            print(f"Pacing: {pacing}")
+        if self.current_run.failures:
+            lines = self.current_run.report().splitlines()
+            if len(lines) > 15:
+                lines = lines[:15] + [f"...and {len(lines) - 15} more (python -m tea.runs report "
+                                      f"{self.current_run.run_id})"]
+            messagebox.showwarning("Some Posts Failed", "\n".join(lines))
+        
+        # Pick up saved comment scores (and score anything fetched since)
+        self.request_comment_analytics(self.posts_data.urls())
+        if self.notebook.select() == str(self.history_frame):
+            self.show_history()
 
     def show_comments_for_selected_post(self, event=None):
         try:
@@ -514,12 +736,39 @@ class TikTokAnalyzer:
     def show_comments_for_post(self, post_data):
         """Display comments for the selected post"""
         # Switch to comments tab
+        self.ensure_tab(self.comments_frame)
         self.notebook.select(1)  # Select the comments tab
         
         # Clear current comments
         self.comments_text.delete(1.0, tk.END)
         
         # Update posts list selection
+        self.show_post_details(post_data)
+        
+        # Show comments
+        self.comments_cancel.set()  # stop fetching the previous post's comments
+        self.comments_post_url = post_data['url']
+        self.comments_view = None
+        self.comments_status.configure(text="")
+        self.comments_search_entry.delete(0, tk.END)
+        if 'comments_data' in post_data and post_data['comments_data']:
+            self.comments_text.insert(tk.END, "".join(
+                f"{i}. {comment}\n" for i, comment in enumerate(post_data['comments_data'], 1)))
+            return
+        
+        try:
+            spool = self.comment_store.spool_for(post_data['url'])
+        except ValueError:
+            self.comments_text.insert(tk.END, "No comments available for this post.\n")
+            return
+        self.open_comment_view(spool)
+        self.show_comment_analytics(load_analytics(spool))
+        
+        # Fetch any pages we don't have yet in the background
+        if not spool.complete:
+            self.start_comment_fetch(post_data['url'], spool)
+
+    def show_post_details(self, post_data):
         self.posts_list.delete(1.0, tk.END)
         self.posts_list.insert(tk.END, f"Post URL: {post_data['url']}\n")
         self.posts_list.insert(tk.END, f"Views: {post_data['views']:,}\n")
@@ -528,71 +777,688 @@ class TikTokAnalyzer:
         self.posts_list.insert(tk.END, f"Saves: {post_data['saves']:,}\n")
         self.posts_list.insert(tk.END, f"Shares: {post_data['shares']:,}\n")
         self.posts_list.insert(tk.END, f"ER Rate: {post_data['er_rate']:.2f}%\n")
+        if post_data.get('missing_fields'):
+            self.posts_list.insert(tk.END, f"Not shown on page: {', '.join(post_data['missing_fields'])}\n")
+        self.posts_list.mark_set('analytics', tk.END)
+        self.posts_list.mark_gravity('analytics', tk.LEFT)
+
+    def show_comment_analytics(self, analytics):
+        """Replace the analytics section under the post details"""
+        self.posts_list.delete('analytics', tk.END)
+        if not analytics or not analytics['comments']:
+            return
+        comments = analytics['comments']
+        lines = [
+            "",
+            f"Comment analytics ({comments:,} scored)",
+            f"Sentiment: {analytics['sentiment']:+.2f}",
+            f"Positive {analytics['positive'] / comments:.0%}  ·  Negative {analytics['negative'] / comments:.0%}  ·  "
+            f"Neutral {analytics['neutral'] / comments:.0%}",
+            f"Questions: {analytics['questions']:,}",
+            f"Likely spam: {analytics['spam']:,}",
+            "Top keywords: " + ", ".join(word for word, _ in analytics['keywords'][:10]),
+            "Top emoji: " + " ".join(emoji for emoji, _ in analytics['emoji'][:10]),
+        ]
+        self.posts_list.insert(tk.END, "\n".join(lines) + "\n")
+
+    def start_comment_fetch(self, video_url, spool):
+        """Start paging a post's comments into its spool, stopping any previous fetch"""
+        self.comments_cancel.set()
+        self.comments_cancel = threading.Event()
+        self.comments_thread = threading.Thread(
+            target=self.fetch_comments,
+            args=(video_url, spool, FETCH_MODES[self.fetch_mode_combo.get()],
+                  self.headless_var.get(), self.comments_cancel),
+            daemon=True
+        )
+        self.comments_thread.start()
+        self.root.after(100, self.process_comments_queue)
+
+    def fetch_comments(self, video_url, spool, fetch_mode, headless, cancel_event):
+        """Worker: spool comment pages, resuming from wherever the last fetch stopped"""
+        on_page = lambda spool: self.comments_queue.put(('page', video_url))
+        session = LazySession(self.browser_sessions, headless)
+        try:
+            if fetch_mode != 'browser':
+                try:
+                    pages = iter_comment_pages_http(self.http_fetcher, video_url, spool.meta['cursor'],
+                                                    cancel_event=cancel_event)
+                    collect_comments(spool, pages, cancel_event, on_page=on_page)
+                    return
+                except PacingCancelled:
+                    raise
+                except Exception as e:
+                    if fetch_mode == 'http':
+                        raise
+                    print(f"HTTP comment fetch failed for {video_url}, falling back to browser: {str(e)}")
+            pages = iter_comment_pages_browser(session.driver, video_url, spool.meta['cursor'],
+                                               pacer=self.analyzer.pacer, cancel_event=cancel_event)
+            collect_comments(spool, pages, cancel_event, on_page=on_page)
+        except PacingCancelled:
+            pass
+        except Exception as e:
+            print(f"Error fetching comments for {video_url}: {str(e)}")
+            self.comments_queue.put(('error', video_url))
+        finally:
+            session.release()
+            # Scoring is started from the main loop when this lands; Tk isn't thread-safe
+            self.comments_queue.put(('done', video_url))
+
+    def request_comment_analytics(self, urls):
+        """Queue posts for scoring; only comments not scored before are read"""
+        for url in urls:
+            self.analytics_requests.put(url)
+        if self.analytics_thread is None:
+            self.analytics_thread = threading.Thread(target=self.comment_analytics_worker, daemon=True)
+            self.analytics_thread.start()
+            self.root.after(250, self.process_analytics_results)
+
+    def score_all_comments(self):
+        self.status_label.configure(text="Scoring comments...")
+        self.analytics_announce = True
+        self.request_comment_analytics(self.posts_data.urls())
+
+    def comment_analytics_worker(self):
+        """Worker: score queued posts, taking everything queued so far as one batch"""
+        while True:
+            urls = [self.analytics_requests.get()]
+            try:
+                while True:
+                    urls.append(self.analytics_requests.get_nowait())
+            except queue.Empty:
+                pass
+            if None in urls:
+                return
+            
+            spools = {}
+            for url in dict.fromkeys(urls):
+                try:
+                    spools[video_id_from_url(url)] = (url, self.comment_store.spool_for(url))
+                except ValueError:
+                    continue
+            try:
+                for spool, analytics in self.comment_analyzer.analyze(spool for _, spool in spools.values()):
+                    self.analytics_results.put((spools[spool.video_id][0], analytics))
+            except Exception as e:
+                print(f"Error scoring comments: {str(e)}")
+            self.analytics_results.put((None, len(spools)))
+
+    def process_analytics_results(self):
+        """Fill in the sentiment column and the analytics pane as scores arrive"""
+        try:
+            while True:
+                url, analytics = self.analytics_results.get_nowait()
+                if url is None:
+                    if self.analytics_announce:
+                        self.status_label.configure(text=f"Scored comments for {analytics} posts")
+                        self.analytics_announce = False
+                    continue
+                row = self.posts_data.row_of(url)
+                if row is not None and analytics['comments']:
+                    post_data = self.posts_data[row]
+                    post_data['sentiment'] = analytics['sentiment']
+                    self.add_post_to_table(post_data)
+                if url == self.comments_post_url:
+                    self.show_comment_analytics(analytics)
+        except queue.Empty:
+            pass
         
-        # Show comments
-        if 'comments_data' in post_data and post_data['comments_data']:
-            for i, comment in enumerate(post_data['comments_data'], 1):
-                self.comments_text.insert(tk.END, f"{i}. {comment}\n")
+        if self.analytics_thread.is_alive() or not self.analytics_results.empty():
+            self.root.after(250, self.process_analytics_results)
+
+    def process_comments_queue(self):
+        """Redraw the comments pane as pages for the post on screen arrive"""
+        refresh = False
+        finished = []
+        try:
+            while True:
+                kind, video_url = self.comments_queue.get_nowait()
+                if video_url == self.comments_post_url:
+                    refresh = True
+                if kind == 'done':
+                    finished.append(video_url)
+        except queue.Empty:
+            pass
+        if finished:
+            self.request_comment_analytics(finished)
+        
+        if refresh and self.comments_view is not None:
+            # Keep filling the window if the reader is at the end of it
+            if self.comments_view['positions'] is None:
+                self.load_next_comments()
+            self.update_comments_status()
+        if (self.comments_thread and self.comments_thread.is_alive()) or not self.comments_queue.empty():
+            self.root.after(250, self.process_comments_queue)
+
+    def open_comment_view(self, spool, positions=None, query=''):
+        """Render the first page of a spool (or of search hits in it)"""
+        self.comments_view = {'spool': spool, 'positions': positions, 'query': query, 'start': 0, 'end': 0}
+        self.comments_text.delete(1.0, tk.END)
+        self.load_next_comments()
+        self.update_comments_status()
+
+    def comment_view_total(self):
+        view = self.comments_view
+        return len(view['spool']) if view['positions'] is None else len(view['positions'])
+
+    def read_comment_view(self, start, end):
+        view = self.comments_view
+        if view['positions'] is None:
+            return range(start, end), view['spool'].read(start, end - start)
+        positions = view['positions'][start:end]
+        return positions, view['spool'].read_at(positions)
+
+    def format_comments(self, positions, comments):
+        """One line per comment, so text line N is always comment start + N - 1"""
+        lines = []
+        for position, comment in zip(positions, comments):
+            text = comment['text'].replace('\n', ' ')
+            author = f"@{comment['author']}: " if comment['author'] else ""
+            lines.append(f"{int(position) + 1}. {author}{text}\n")
+        return "".join(lines)
+
+    def load_next_comments(self):
+        """Append the next page below the window, dropping pages off the top"""
+        view = self.comments_view
+        if view is None or view['end'] >= self.comment_view_total():
+            return
+        end = min(view['end'] + COMMENTS_PAGE_SIZE, self.comment_view_total())
+        positions, comments = self.read_comment_view(view['end'], end)
+        self.comments_text.insert(tk.END, self.format_comments(positions, comments))
+        self.highlight_comment_matches(f"{view['end'] - view['start'] + 1}.0")
+        view['end'] = end
+        
+        overflow = view['end'] - view['start'] - COMMENTS_WINDOW_SIZE
+        if overflow > 0:
+            top_line = int(self.comments_text.index('@0,0').split('.')[0])
+            self.comments_text.delete('1.0', f"{overflow + 1}.0")
+            view['start'] += overflow
+            self.comments_text.yview(f"{max(top_line - overflow, 1)}.0")
+
+    def load_previous_comments(self):
+        """Prepend the page above the window, dropping pages off the bottom"""
+        view = self.comments_view
+        if view is None or view['start'] <= 0:
+            return
+        start = max(view['start'] - COMMENTS_PAGE_SIZE, 0)
+        added = view['start'] - start
+        top_line = int(self.comments_text.index('@0,0').split('.')[0])
+        positions, comments = self.read_comment_view(start, view['start'])
+        self.comments_text.insert('1.0', self.format_comments(positions, comments))
+        view['start'] = start
+        self.highlight_comment_matches('1.0', f"{added + 1}.0")
+        
+        overflow = view['end'] - view['start'] - COMMENTS_WINDOW_SIZE
+        if overflow > 0:
+            self.comments_text.delete(f"{COMMENTS_WINDOW_SIZE + 1}.0", tk.END)
+            view['end'] -= overflow
+        self.comments_text.yview(f"{top_line + added}.0")
+
+    def on_comments_scroll(self, first, last):
+        """Page in more comments when the view nears the top or bottom of the window"""
+        if self.comments_view is None or self.comments_paging:
+            return
+        if last > 0.95 and self.comments_view['end'] < self.comment_view_total():
+            direction = self.load_next_comments
+        elif first < 0.05 and self.comments_view['start'] > 0:
+            direction = self.load_previous_comments
         else:
-            self.comments_text.insert(tk.END, "No comments available for this post.\n")
+            return
+        
+        # Inserting text re-enters this callback, so page from the idle loop
+        def page():
+            try:
+                direction()
+                self.update_comments_status()
+            finally:
+                self.comments_paging = False
+        self.comments_paging = True
+        self.root.after_idle(page)
+
+    def update_comments_status(self):
+        view = self.comments_view
+        if view is None:
+            return
+        total = self.comment_view_total()
+        if view['positions'] is not None:
+            text = f"{total:,} comments match \"{view['query']}\""
+        elif total:
+            text = f"Showing {view['start'] + 1:,}-{view['end']:,} of {total:,} comments"
+        else:
+            text = "No comments available for this post." if view['spool'].complete else ""
+        if not view['spool'].complete:
+            text += " (loading more...)" if text else "Loading comments..."
+        self.comments_status.configure(text=text)
+
+    def highlight_comment_matches(self, start='1.0', end=tk.END):
+        """Mark the search words in a freshly inserted range"""
+        view = self.comments_view
+        if not view or not view['query']:
+            return
+        for word in view['query'].split():
+            index = start
+            while True:
+                index = self.comments_text.search(word, index, stopindex=end, nocase=True)
+                if not index:
+                    break
+                match_end = f"{index}+{len(word)}c"
+                self.comments_text.tag_add('match', index, match_end)
+                index = match_end
+
+    def search_comments(self):
+        """Filter the comments pane to comments containing every search word"""
+        query = self.comments_search_entry.get().strip()
+        view = self.comments_view
+        if view is None:
+            return
+        if not query:
+            self.clear_comment_search()
+            return
+        index = self.comment_store.index_for(view['spool'])
+        self.open_comment_view(view['spool'], index.search(query), query)
+
+    def clear_comment_search(self):
+        self.comments_search_entry.delete(0, tk.END)
+        if self.comments_view is not None:
+            self.open_comment_view(self.comments_view['spool'])
 
     def add_post_to_table(self, post_data):
-        """Add a post row to the table"""
-        row = len(self.posts_data)
-        self.posts_data.append(post_data)
-        
-        # Create cells for each column
-        cells = [
-            (f"#{row + 1}", 'center'),
-            (post_data.get('caption', '')[:30] + "..." if len(post_data.get('caption', '')) > 30 else post_data.get('caption', ''), 'w'),
-            ("Copy URL", 'center'),
-            (f"{post_data['views']:,}", 'center'),
-            (f"{post_data['likes']:,}", 'center'),
-            (f"{post_data['comments']:,}", 'center'),
-            (f"{post_data['saves']:,}", 'center'),
-            (f"{post_data['shares']:,}", 'center'),
-            (f"{post_data['er_rate']:.2f}%", 'center')
-        ]
+        """Add a post row to the table, or refresh the row if the post is already shown"""
+        with METRICS.timer('gui.add_post_to_table'):
+            self._add_post_to_table(post_data)
+
+    def _add_post_to_table(self, post_data):
+        row, is_new = self.posts_data.upsert(post_data)
+        values = self.table_values(row, post_data)
+        tags = (self.er_tag(post_data['er_rate'], self.get_desired_rate()),)
         
-        def copy_url():
-            self.root.clipboard_clear()
-            self.root.clipboard_append(post_data['url'])
+        # Rows are keyed by their PostStore row; an import may not have shown this one yet
+        if is_new:
+            self.posts_tree.insert('', tk.END, iid=str(row), values=values, tags=tags)
+        elif self.posts_tree.exists(str(row)):
+            self.posts_tree.item(str(row), values=values, tags=tags)
+
+    def table_values(self, row, post_data):
+        caption = post_data.get('caption', '')
+        return (
+            f"#{row + 1}",
+            caption[:30] + "..." if len(caption) > 30 else caption,
+            "Copy URL",
+            f"{post_data['views']:,}",
+            f"{post_data['likes']:,}",
+            f"{post_data['comments']:,}",
+            f"{post_data['saves']:,}",
+            f"{post_data['shares']:,}",
+            f"{post_data['er_rate']:.2f}%",
+            "" if np.isnan(post_data.get('sentiment', np.nan)) else f"{post_data['sentiment']:+.2f}"
+        )
+
+    def fill_table(self, start=0, chunk=TABLE_FILL_CHUNK):
+        """Add the store's rows from start on to the table, a chunk per tick"""
+        stop = min(len(self.posts_data), start + chunk)
+        desired_rate = self.get_desired_rate()
+        for row in range(start, stop):
+            post_data = self.posts_data[row]
+            self.posts_tree.insert('', tk.END, iid=str(row), values=self.table_values(row, post_data),
+                                   tags=(self.er_tag(post_data['er_rate'], desired_rate),))
+        self.table_filled = stop
+        self.table_fill = self.root.after(1, self.fill_table, stop) if stop < len(self.posts_data) else None
+
+    def stop_table_fill(self):
+        if self.table_fill is not None:
+            self.root.after_cancel(self.table_fill)
+            self.table_fill = None
+
+    def finish_table_fill(self):
+        """Add whatever an import hasn't shown yet, for code that walks every row"""
+        if self.table_fill is not None:
+            self.stop_table_fill()
+            self.fill_table(self.table_filled, len(self.posts_data))
+
+    def get_desired_rate(self):
+        try:
+            return float(self.engagement_entry.get() or "13")
+        except ValueError:
+            return 13.0
+
+    def er_tag(self, er_rate, desired_rate):
+        """Calculate if ER rate meets desired rate"""
+        return 'er_met' if er_rate >= desired_rate else 'er_below'
+
+    def refresh_er_colors(self):
+        """Recolour every row after the desired rate changes"""
+        self.finish_table_fill()
+        met = self.posts_data.column('er_rate') >= self.get_desired_rate()
+        for row, is_met in enumerate(met.tolist()):
+            self.posts_tree.item(str(row), tags=('er_met' if is_met else 'er_below',))
+        self.update_profile_summary()
+
+    def update_profile_summary(self):
+        """Show benchmark stats for every post in the table"""
+        desired_rate = self.get_desired_rate()
+        stats = profile_stats(self.posts_data.column('er_rate'), desired_rate)
+        if not stats['count']:
+            self.summary_label.configure(text="")
+            return
+        self.summary_label.configure(text=(
+            f"{stats['count']} posts  ·  mean ER {stats['mean']:.2f}%  ·  median {stats['median']:.2f}%  ·  "
+            f"p90 {stats['percentiles'][90]:.2f}%  ·  {stats['at_or_above']} ({stats['share_at_or_above']:.0%}) "
+            f"at or above {desired_rate:g}%  ·  {len(stats['outliers'])} outliers"
+        ))
+
+    def on_posts_table_click(self, event):
+        if self.posts_tree.identify_region(event.x, event.y) != 'cell':
+            return
+        iid = self.posts_tree.identify_row(event.y)
+        if not iid:
+            return
+        column = self.posts_tree.identify_column(event.x)
+        if column == f"#{self.table_columns.index('url') + 1}":
+            self.copy_url(self.posts_data.url(int(iid)))
+        else:
+            self.show_comments_for_post(self.posts_data[int(iid)])
+
+    def copy_url(self, url):
+        self.root.clipboard_clear()
+        self.root.clipboard_append(url)
+        self.status_label.configure(text=f"Copied {url}")
+
+    def copy_selected_post_url(self):
+        selection = self.posts_tree.selection()
+        if selection:
+            self.copy_url(self.posts_data.url(int(selection[0])))
+
+    def sort_posts_table(self, column):
+        """Sort the table by a column; clicking the same heading again reverses it"""
+        sort_column, descending = self.table_sort
+        descending = not descending if sort_column == column else column != 'caption'
+        self.table_sort = (column, descending)
+        self.finish_table_fill()
         
-        def view_comments(pd=post_data):
-            self.show_comments_for_post(pd)
+        # Numeric columns sort straight off the store's column views
+        if column == 'index':
+            order = np.arange(len(self.posts_data))
+        elif column == 'caption':
+            captions = self.posts_data.captions()
+            order = sorted(range(len(captions)), key=lambda row: captions[row].lower())
+        elif column == 'url':
+            urls = self.posts_data.urls()
+            order = sorted(range(len(urls)), key=urls.__getitem__)
+        else:
+            order = np.argsort(self.posts_data.column(column), kind='stable')
         
-        # Calculate if ER rate meets desired rate
-        desired_rate = float(self.engagement_entry.get() or "13")
-        er_color = "#4CAF50" if post_data['er_rate'] >= desired_rate else self.TIKTOK_RED
+        order = list(order)
+        if descending:
+            order.reverse()
+        for position, row in enumerate(order):
+            self.posts_tree.move(str(row), '', position)
+
+    def import_results(self):
+        """Replace the table with a saved run (CSV, JSONL or columnar), without scraping"""
+        if self.scrape_thread and self.scrape_thread.is_alive():
+            return
+        path = filedialog.askopenfilename(title="Import Results", filetypes=RESULT_FILETYPES)
+        if not path:
+            return
         
-        # Create cell frames with fixed widths
-        for i, (text, alignment) in enumerate(cells):
-            cell_frame = ttk.Frame(self.posts_container, style='Cell.TFrame', width=self.column_widths[i])
-            cell_frame.grid(row=row + 1, column=i, sticky='nsew', padx=1, pady=1)
-            cell_frame.grid_propagate(False)
-            
-            if i == 2:  # URL column
-                button = ttk.Button(cell_frame, text=text, command=copy_url, width=8)
-                button.pack(expand=True, padx=2, pady=1)
+        # Load into a fresh store so a bad file leaves the table as it was
+        posts_data = PostStore()
+        try:
+            with METRICS.timer('gui.import_results'):
+                loaded = load_posts(path, posts_data)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        self.stop_table_fill()
+        self.example_label.pack_forget()
+        self.posts_tree.delete(*self.posts_tree.get_children())
+        self.posts_data = posts_data
+        self.table_sort = (None, False)
+        self.fill_table()
+        self.update_profile_summary()
+        self.status_label.configure(text=f"Imported {loaded:,} posts from {os.path.basename(path)}")
+        
+        # Saved comment scores fill in the sentiment column
+        self.request_comment_analytics(self.spooled_urls())
+
+    def export_results(self):
+        """Save the table's posts, and the comments spooled for them next to it as <name>.comments.<ext>"""
+        path = filedialog.asksaveasfilename(title="Export Results",
+                                            defaultextension='.csv',
+                                            filetypes=RESULT_FILETYPES)
+        if not path:
+            return
+        try:
+            with METRICS.timer('gui.export_results'):
+                written = export_posts(self.posts_data, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        self.status_label.configure(text=f"Exported {written:,} posts to {path}")
+        
+        # Comments can run to gigabytes, so they're streamed out on a worker
+        urls = self.spooled_urls()
+        if not urls or (self.export_thread and self.export_thread.is_alive()):
+            return
+        base, extension = os.path.splitext(path)
+        self.export_thread = threading.Thread(target=self.export_comments_worker,
+                                              args=(urls, f"{base}.comments{extension}"),
+                                              daemon=True)
+        self.export_thread.start()
+        self.root.after(250, self.process_export_queue)
+
+    def spooled_urls(self):
+        """URLs of the table's posts that have comments spooled"""
+        spooled = set(self.comment_store.video_ids())
+        urls = []
+        for url in self.posts_data.urls():
+            try:
+                if video_id_from_url(url) in spooled:
+                    urls.append(url)
+            except ValueError:
+                continue
+        return urls
+
+    def export_comments_worker(self, urls, path):
+        try:
+            written = export_comments((self.comment_store.spool_for(url) for url in urls), path)
+            self.export_queue.put(('done', f"Exported {written:,} comments to {path}"))
+        except (OSError, ValueError) as e:
+            self.export_queue.put(('error', str(e)))
+
+    def process_export_queue(self):
+        try:
+            kind, message = self.export_queue.get_nowait()
+        except queue.Empty:
+            if self.export_thread.is_alive():
+                self.root.after(250, self.process_export_queue)
+            return
+        if kind == 'error':
+            messagebox.showerror("Error", f"An error occurred: {message}")
+        else:
+            self.status_label.configure(text=message)
+
+    def refresh_debug_panel(self):
+        """Redraw the metrics report; repeats every second while the Debug tab is showing"""
+        if self.notebook.select() != str(self.debug_frame):
+            return
+        position = self.debug_text.yview()[0]
+        self.debug_text.delete('1.0', tk.END)
+        self.debug_text.insert('1.0', METRICS.report())
+        self.debug_text.yview_moveto(position)
+        if self.debug_refresh:
+            self.root.after_cancel(self.debug_refresh)
+        self.debug_refresh = self.root.after(1000, self.refresh_debug_panel)
+
+    def export_metrics(self):
+        """Save the metrics as JSON or, for a .prom file, Prometheus text"""
+        path = filedialog.asksaveasfilename(
+            title="Export Metrics",
+            defaultextension='.json',
+            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            METRICS.write(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        self.status_label.configure(text=f"Metrics saved to {path}")
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.refresh_debug_panel()
+
+    def show_history(self, profile=False):
+        """Load the History tab's trend and fastest-growing posts; the queries take milliseconds"""
+        if profile:
+            self.history_post_url = None
+        username = self.history_user_entry.get().strip().lstrip('@')
+        if not username:
+            username = self.username_entry.get().strip().lstrip('@')
+            self.history_user_entry.insert(0, username)
+        if not username:
+            self.history_series = None
+            self.history_summary.configure(text="Enter a profile to see how its engagement has changed")
+            self.draw_history_chart()
+            return
+        
+        series_label = self.history_series_combo.get()
+        period = HISTORY_PERIODS[self.history_period_combo.get()]
+        end = time.time()
+        start = end - period if period else 0
+        try:
+            if self.history_post_url:
+                trend = self.history.post_trend(self.history_post_url)
+                subject = f"Post {parse_video_url(self.history_post_url)[1]}"
             else:
-                label = ttk.Label(
-                    cell_frame,
-                    text=text,
-                    foreground=er_color if i == 8 else self.TIKTOK_WHITE,
-                    font=('Segoe UI', 10),
-                    anchor=alignment
-                )
-                label.pack(expand=True, fill='both', padx=5, pady=2)
-            
-            # Make the entire row clickable for comments
-            cell_frame.bind('<Button-1>', lambda e, pd=post_data: view_comments(pd))
+                trend = self.history.profile_trend(username)
+                subject = f"@{username}"
+            top_posts = self.history.top_growth([username], start, end, HISTORY_TOP_N)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        
+        in_period = trend['time'] >= start
+        times = trend['time'][in_period]
+        values = trend[HISTORY_SERIES[series_label]][in_period]
+        value_format = "{:.2f}" if HISTORY_SERIES[series_label] == 'er_rate' else "{:,.0f}"
+        self.history_series = (times, values, f"{subject} - {series_label}", value_format)
+        if len(times):
+            since = time.strftime('%Y-%m-%d %H:%M', time.localtime(times[0]))
+            change = value_format.replace('{:', '{:+').format(values[-1] - values[0])
+            self.history_summary.configure(
+                text=f"{subject}: {len(times):,} snapshots since {since}, {series_label.lower()} {change}")
+        else:
+            self.history_summary.configure(
+                text=f"No history for {subject} in this period - each analysis records a snapshot")
+        self.draw_history_chart()
+        
+        self.history_tree.delete(*self.history_tree.get_children())
+        for post in top_posts:
+            self.history_tree.insert('', tk.END, iid=post['url'],
+                                     values=(post['url'], f"{post['gained']:,}", f"{post['per_hour']:,.1f}"))
+
+    def on_history_post_selected(self, event=None):
+        selection = self.history_tree.selection()
+        if selection and selection[0] != self.history_post_url:
+            self.history_post_url = selection[0]
+            self.show_history()
+
+    def draw_history_chart(self):
+        """Line chart of the History tab's series, thinned to the canvas width"""
+        canvas = self.history_canvas
+        canvas.delete('all')
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if not self.history_series or not len(self.history_series[0]):
+            canvas.create_text(width / 2, height / 2, text="No snapshots to chart yet", fill=self.TIKTOK_WHITE,
+                               font=('Segoe UI', 11))
+            return
+        times, values, title, value_format = self.history_series
+        left, right, top, bottom = 80, width - 20, 30, height - 30
+        if right - left < 10 or bottom - top < 10:
+            return
+        
+        # A year of hourly snapshots is far more points than pixels
+        if len(times) > 2 * (right - left):
+            keep = np.linspace(0, len(times) - 1, 2 * (right - left)).astype(np.intp)
+            times, values = times[keep], values[keep]
+        t0, t1 = float(times[0]), float(times[-1])
+        v0, v1 = float(values.min()), float(values.max())
+        if v1 == v0:
+            v0, v1 = v0 - 1, v1 + 1
+        xs = left + (times - t0) / (t1 - t0) * (right - left) if t1 > t0 else np.full(len(times), (left + right) / 2)
+        ys = bottom - (values - v0) / (v1 - v0) * (bottom - top)
+        
+        canvas.create_text(left, 15, text=title, anchor='w', fill=self.TIKTOK_WHITE, font=('Segoe UI', 10, 'bold'))
+        canvas.create_line(left, top, left, bottom, right, bottom, fill=self.TIKTOK_LIGHT_GRAY)
+        for value, y in ((v1, top), (v0, bottom)):
+            canvas.create_text(left - 8, y, text=value_format.format(value), anchor='e', fill=self.TIKTOK_WHITE,
+                               font=('Segoe UI', 9))
+        for moment, x, anchor in ((t0, left, 'w'), (t1, right, 'e')):
+            canvas.create_text(x, bottom + 15, text=time.strftime('%Y-%m-%d %H:%M', time.localtime(moment)),
+                               anchor=anchor, fill=self.TIKTOK_WHITE, font=('Segoe UI', 9))
+        if len(xs) == 1:
+            canvas.create_oval(xs[0] - 3, ys[0] - 3, xs[0] + 3, ys[0] + 3, fill=self.TIKTOK_RED, outline='')
+        else:
+            canvas.create_line(*np.column_stack((xs, ys)).ravel().tolist(), fill=self.TIKTOK_RED, width=2)
+
+    def on_window_mapped(self, event):
+        if event.widget is self.root and self.startup_seconds is None:
+            self.startup_seconds = 0.0
+            self.root.after_idle(self.startup_complete)
+
+    def startup_complete(self):
+        """Record how long it took to get an interactive window"""
+        self.startup_seconds = time.perf_counter() - STARTUP_STARTED
+        METRICS.observe('gui.startup', self.startup_seconds)
+        print(f"Window ready in {self.startup_seconds * 1000:.0f} ms")
+        if self.exit_after_startup:
+            # Include interpreter start-up, which happens before STARTUP_STARTED
+            import psutil
+            process_seconds = time.time() - psutil.Process().create_time()
+            print(f"Process start to window: {process_seconds * 1000:.0f} ms")
+            self.root.after(0, self.on_close)
+            return
+        if self.prewarm:
+            self.prewarm_browser()
+
+    def prewarm_browser(self):
+        """Launch a browser in the background so the first browser fetch doesn't wait for Chrome"""
+        headless = self.headless_var.get()
+        def warm():
+            try:
+                self.browser_sessions.release(self.browser_sessions.acquire(1, headless))
+            except Exception as e:
+                print(f"Error pre-warming browser: {str(e)}")
+        threading.Thread(target=warm, daemon=True).start()
+
+    def on_close(self):
+        """Stop any running analysis and shut down our browsers before exiting"""
+        self.cancel_event.set()
+        self.comments_cancel.set()
+        self.analytics_requests.put(None)
+        # They write to the post cache and history, so let them notice the cancel before those close
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for thread in (self.scrape_thread, self.comments_thread):
+            if thread is not None:
+                thread.join(max(0.0, deadline - time.monotonic()))
+        self.comment_analyzer.shutdown()
+        self.analyzer.close()
+        self.root.destroy()
 
     def run(self):
         """Start the application"""
         self.root.mainloop()
 
 def main():
-    app = TikTokAnalyzer()
+    parser = argparse.ArgumentParser(description="TikTok Engagement Analyzer")
+    parser.add_argument('--prewarm', action='store_true',
+                        help="start a browser in the background once the window is up")
+    parser.add_argument('--measure-startup', action='store_true',
+                        help="print how long it took to get to an interactive window, then exit")
+    args = parser.parse_args()
+    app = TikTokAnalyzer(prewarm=args.prewarm, exit_after_startup=args.measure_startup)
     app.run()
 
 if __name__ == "__main__":